@@ -0,0 +1,479 @@
+"""
+Offline backtester: replays the live Sid rules bar by bar over the local
+history store (history_store.py).
+
+At every bar close the cycle is applied in the live order:
+  1. stop-loss hits inside the bar (a gap through the stop fills at the open)
+  2. kill switch at MAX_DAILY_DRAWDOWN_LIMIT (main.market_monitor_task)
+  3. run_exit_scan: RSI reached 50 and momentum stalled
+  4. run_entry_scan: drawdown gate, best scores into free MAX_POSITIONS
+     slots, forex correlation BLOCK/REDUCE, execute_mt5_trade lot sizing
+  5. apply_trailing_stop: ATR trail, moved only by more than 10% of ATR
+
+Indicators are computed once up front over each symbol's full history with
+the vectorised kernel, so the loop only indexes arrays. The entry rules,
+stop distance, lot sizing, currency exposure count and trailing step are the
+live functions in trading_rules.py (sid_rules, lot_size,
+count_currency_exposure, trailed_stop). News and earnings filters have no
+history and are not replayed. Only resolve_instrument() talks to a terminal,
+and only if the MetaTrader5 package is installed, so backtests run from the
+store on any machine.
+
+Usage: python backtest.py [--symbols EURUSD XAUUSD] [--start 2015-01-01] [--balance 100000]
+"""
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+from config import *
+import history_store
+from indicators import compute_indicators, weekly_rsi_series
+from instruments import Instrument, classify_category, split_base_quote, get_watchlist_sector, get_instrument
+from prop_watchlist import WATCHLIST
+from trading_rules import (SignalParams, MIN_BARS, sid_rules, sid_score, stop_distance, lot_size,
+                           count_currency_exposure, trailed_stop)
+
+logger = logging.getLogger("MT5MasterControl")
+
+# mt5.TIMEFRAME_D1, the timeframe the store is keyed by for daily bars
+TIMEFRAME_D1 = 16408
+
+# Contract sizes assumed when the terminal is not available for symbol specs
+OFFLINE_CONTRACT_SIZE = {
+    "FOREX": 100000, "METALS": 100, "STOCKS": 1,
+    "INDICES": 1, "CRYPTO": 1, "COMMODITIES": 1000
+}
+
+
+@dataclass(frozen=True)
+class RiskSettings:
+    """Portfolio and sizing rules; defaults mirror config.py."""
+    risk_per_trade_pct: float = RISK_PER_TRADE_PCT
+    max_positions: int = MAX_POSITIONS
+    allow_shorts: bool = ALLOW_SHORTS
+    correlation_mode: str = CORRELATION_MODE
+    max_currency_exposure: int = MAX_CURRENCY_EXPOSURE
+    correlation_risk_modifier: float = CORRELATION_RISK_MODIFIER
+    max_daily_drawdown_pct: float = MAX_DAILY_DRAWDOWN_PCT
+    kill_drawdown_pct: float = MAX_DAILY_DRAWDOWN_LIMIT
+    max_spread_pips: float = MAX_SPREAD_PIPS
+
+
+@dataclass(frozen=True)
+class SymbolHistory:
+    """Bars plus every parameter-independent indicator for one symbol."""
+    instrument: Instrument
+    time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    spread: np.ndarray  # Ask - bid at the close, in price units
+    rsi: np.ndarray
+    macd: np.ndarray
+    atr: np.ndarray
+    weekly_prev: np.ndarray
+    weekly_curr: np.ndarray
+
+
+@dataclass(frozen=True)
+class MarketHistory:
+    symbols: Mapping[str, SymbolHistory]
+    # quote currency -> (times, quote-to-USD rate), from the stored conversion pairs
+    conversions: Mapping[str, tuple] = field(repr=False)
+
+    def conversion_rate(self, quote, when):
+        """Quote-to-USD rate at a bar time; None if it cannot be derived (trade is blocked)."""
+        if not quote or quote == "USD":
+            return 1.0
+        series = self.conversions.get(quote)
+        if series is None:
+            return None
+        times, rates = series
+        i = np.searchsorted(times, when, side='right') - 1
+        return float(rates[i]) if i >= 0 else None
+
+
+@dataclass
+class Position:
+    symbol: str
+    is_long: bool
+    volume: float
+    entry_time: int
+    entry_price: float
+    stop: float
+    initial_stop: float
+    risk_cash: float
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    equity: pd.DataFrame
+    trades: pd.DataFrame
+    initial_balance: float
+
+    def summary(self) -> dict:
+        equity = self.equity['equity']
+        peak = equity.cummax()
+        pnl = self.trades['pnl'] if len(self.trades) else pd.Series(dtype=float)
+        gross_loss = -pnl[pnl < 0].sum()
+        return {
+            'total_return': float(equity.iloc[-1] / self.initial_balance - 1) if len(equity) else 0.0,
+            'max_drawdown': float(((peak - equity) / peak).max()) if len(equity) else 0.0,
+            'max_daily_drawdown': float(self.equity['daily_drawdown'].max()) if len(equity) else 0.0,
+            'trades': int(len(pnl)),
+            'win_rate': float((pnl > 0).mean()) if len(pnl) else 0.0,
+            'profit_factor': float(pnl[pnl > 0].sum() / gross_loss) if gross_loss else float('inf'),
+        }
+
+
+# -------------------------------
+# Data Preparation
+# -------------------------------
+def offline_instrument(symbol):
+    """Instrument specs guessed from the symbol when MT5 is not connected."""
+    category = classify_category(symbol, None, get_watchlist_sector(symbol))
+    base, quote = split_base_quote(symbol, None, category)
+    if not quote.isalpha():
+        quote = "USD"
+    digits = (3 if quote == "JPY" else 5) if category == "FOREX" else 2
+    return Instrument(
+        symbol=symbol, category=category, base=base, quote=quote,
+        digits=digits, pip_unit=10 ** - (digits - 1),
+        contract_size=OFFLINE_CONTRACT_SIZE.get(category, 1), volume_step=0.01,
+        volume_min=0.01, volume_max=100.0, filling_type=0,
+    )
+
+
+def resolve_instrument(symbol):
+    """Broker specs when a terminal is reachable, offline assumptions otherwise."""
+    try:
+        from mt5_gateway import mt5
+    except ImportError:
+        return offline_instrument(symbol)
+    if mt5.terminal_info() is not None:
+        instrument = get_instrument(symbol)
+        if instrument is not None:
+            return instrument
+    return offline_instrument(symbol)
+
+
+def _load_conversions(quotes, timeframe):
+    conversions = {}
+    for quote in quotes:
+        direct = history_store.load_rates(f"{quote}USD", timeframe)
+        if direct is not None:
+            conversions[quote] = (direct['time'].copy(), direct['close'].copy())
+            continue
+        inverse = history_store.load_rates(f"USD{quote}", timeframe)
+        if inverse is not None:
+            conversions[quote] = (inverse['time'].copy(), 1.0 / inverse['close'])
+    return conversions
+
+
+def load_history(symbols, timeframe=TIMEFRAME_D1, instruments=None) -> MarketHistory:
+    """
+    Loads stored bars and computes RSI, MACD, ATR and per-bar weekly RSI for
+    every symbol in one vectorised pass. Symbols without MIN_BARS are dropped.
+    """
+    instruments = instruments or {}
+    rates = {}
+    for symbol in symbols:
+        series = history_store.load_rates(symbol, timeframe)
+        if series is None or len(series) < MIN_BARS:
+            logger.warning(f"⚠️ Backtest: not enough stored history for {symbol}")
+            continue
+        rates[symbol] = series
+
+    ind = compute_indicators(rates)
+    histories = {}
+    for symbol, series in rates.items():
+        instrument = instruments.get(symbol) or resolve_instrument(symbol)
+        weekly_prev, weekly_curr = weekly_rsi_series(series['time'], series['close'])
+        histories[symbol] = SymbolHistory(
+            instrument=instrument, time=series['time'].astype(np.int64),
+            open=series['open'].astype(np.float64), high=series['high'].astype(np.float64),
+            low=series['low'].astype(np.float64), close=series['close'].astype(np.float64),
+            spread=series['spread'] * 10.0 ** -instrument.digits,
+            rsi=ind.series('rsi', symbol), macd=ind.series('macd', symbol), atr=ind.series('atr', symbol),
+            weekly_prev=weekly_prev, weekly_curr=weekly_curr,
+        )
+
+    quotes = {h.instrument.quote for h in histories.values()} - {"USD", ""}
+    return MarketHistory(symbols=histories, conversions=_load_conversions(quotes, timeframe))
+
+
+# -------------------------------
+# Signals
+# -------------------------------
+def _window_any(mask, days):
+    """True where mask held on any of the last `days` bars (inclusive)."""
+    counts = np.concatenate(([0], np.cumsum(mask)))
+    idx = np.arange(1, len(mask) + 1)
+    return counts[idx] - counts[np.maximum(idx - days, 0)] > 0
+
+
+def _rolling_extreme(values, fn):
+    """fn over the current and two previous bars, as dynamic_stop does."""
+    out = values.copy()
+    out[1:] = fn(out[1:], values[:-1])
+    out[2:] = fn(out[2:], values[:-2])
+    return out
+
+
+def compute_signals(history: MarketHistory, params=None):
+    """
+    Vectorised evaluate_signals over every bar: symbol -> (direction, score, stop)
+    where direction is 1 (long), -1 (short) or 0.
+    """
+    params = params or SignalParams()
+    signals = {}
+    for symbol, h in history.symbols.items():
+        rsi, macd, atr = h.rsi, h.macd, h.atr
+        prev_rsi = np.concatenate(([np.nan], rsi[:-1]))
+        prev_macd = np.concatenate(([np.nan], macd[:-1]))
+        ready = (np.arange(len(rsi)) >= MIN_BARS - 1) & ~np.isnan(atr) & ~np.isnan(h.weekly_prev)
+
+        long, short = sid_rules(rsi, prev_rsi, macd, prev_macd, h.weekly_curr, h.weekly_prev,
+                                _window_any(rsi < params.oversold, params.signal_days),
+                                _window_any(rsi > params.overbought, params.signal_days), params)
+        long, short = long & ready, short & ready
+
+        dist = stop_distance(atr, h.instrument.category, params)
+        stop = np.where(long, np.minimum(h.close - dist, _rolling_extreme(h.low, np.minimum)),
+                        np.maximum(h.close + dist, _rolling_extreme(h.high, np.maximum)))
+        direction = long.astype(np.int8) - short.astype(np.int8)
+        score = sid_score(rsi, long)
+        signals[symbol] = (direction, score, stop)
+    return signals
+
+
+# -------------------------------
+# Sizing
+# -------------------------------
+def position_size(equity, risk_pct, price, stop, instrument, conversion_rate):
+    """Lots as trade_executor.prepare_order computes them; 0 if the stop distance is zero."""
+    price_dist = abs(price - stop)
+    if price_dist == 0:
+        return 0.0
+    return lot_size(equity * risk_pct, price_dist, instrument, conversion_rate)
+
+
+def currency_exposure(instrument, positions, history):
+    """get_current_currency_exposure over the simulated open positions."""
+    if instrument.category != "FOREX":
+        return 0
+    open_pairs = [(other.base, other.quote) for other in (history.symbols[p.symbol].instrument
+                                                          for p in positions.values())
+                  if other.category == "FOREX"]
+    return count_currency_exposure((instrument.base, instrument.quote), open_pairs)
+
+
+# -------------------------------
+# Simulation
+# -------------------------------
+def _timeline(history, start, end):
+    """Sorted bar times and, for each, the (symbol, bar index) pairs printed then."""
+    times = {}
+    for symbol, h in history.symbols.items():
+        for i, t in enumerate(h.time.tolist()):
+            if (start is None or t >= start) and (end is None or t <= end):
+                times.setdefault(t, []).append((symbol, i))
+    return sorted(times.items())
+
+
+def run_backtest(history: MarketHistory, params=None, settings=None, initial_balance=100000.0,
+                 start=None, end=None, signals=None) -> BacktestResult:
+    """
+    Replays the live cycle at every bar close between start and end (epoch
+    seconds). `signals` can be passed precomputed from compute_signals.
+    """
+    params = params or SignalParams()
+    settings = settings or RiskSettings()
+    signals = signals if signals is not None else compute_signals(history, params)
+
+    balance = initial_balance
+    positions = {}
+    last_bar = {}  # symbol -> index of its latest bar
+    trades, curve = [], []
+
+    def exit_price(pos, i):
+        h = history.symbols[pos.symbol]
+        return h.close[i] if pos.is_long else h.close[i] + h.spread[i]
+
+    def mark_to_market():
+        total = balance
+        for pos in positions.values():
+            h = history.symbols[pos.symbol]
+            i = last_bar[pos.symbol]
+            rate = history.conversion_rate(h.instrument.quote, h.time[i]) or 1.0
+            move = exit_price(pos, i) - pos.entry_price
+            total += (move if pos.is_long else -move) * pos.volume * h.instrument.contract_size * rate
+        return total
+
+    def close(symbol, price, when, reason):
+        nonlocal balance
+        pos = positions.pop(symbol)
+        h = history.symbols[symbol]
+        rate = history.conversion_rate(h.instrument.quote, when) or 1.0
+        move = price - pos.entry_price
+        pnl = (move if pos.is_long else -move) * pos.volume * h.instrument.contract_size * rate
+        balance += pnl
+        trades.append({
+            'symbol': symbol, 'side': 'BUY' if pos.is_long else 'SELL', 'volume': pos.volume,
+            'entry_time': pos.entry_time, 'entry_price': pos.entry_price, 'stop': pos.initial_stop,
+            'exit_time': int(when), 'exit_price': float(price), 'reason': reason, 'pnl': pnl,
+            'r_multiple': pnl / pos.risk_cash if pos.risk_cash else 0.0,
+        })
+
+    for when, bars in _timeline(history, start, end):
+        start_of_day_balance = balance
+        for symbol, i in bars:
+            last_bar[symbol] = i
+
+        # 1. Stop-loss hits inside the bar (bid for longs, ask for shorts)
+        for symbol, i in bars:
+            pos = positions.get(symbol)
+            if pos is None or pos.entry_time >= when: continue
+            h = history.symbols[symbol]
+            if pos.is_long and h.low[i] <= pos.stop:
+                close(symbol, min(h.open[i], pos.stop), when, 'STOP')
+            elif not pos.is_long and h.high[i] + h.spread[i] >= pos.stop:
+                close(symbol, max(h.open[i] + h.spread[i], pos.stop), when, 'STOP')
+
+        # 2. Emergency kill switch
+        equity = mark_to_market()
+        daily_dd = (start_of_day_balance - equity) / start_of_day_balance if start_of_day_balance > 0 else 0.0
+        if daily_dd >= settings.kill_drawdown_pct:
+            for symbol in list(positions):
+                close(symbol, exit_price(positions[symbol], last_bar[symbol]), when, 'KILL')
+
+        # 3. Exit scan: RSI 50 reached and no longer moving in the trade's favour
+        for symbol, i in bars:
+            pos = positions.get(symbol)
+            if pos is None or i < 1: continue
+            h = history.symbols[symbol]
+            curr_rsi, prev_rsi = h.rsi[i], h.rsi[i - 1]
+            if (pos.is_long and 50 <= curr_rsi <= prev_rsi) or (not pos.is_long and prev_rsi <= curr_rsi <= 50):
+                close(symbol, exit_price(pos, i), when, 'RSI_EXIT')
+
+        # 4. Entry scan
+        equity = mark_to_market()
+        daily_dd = (start_of_day_balance - equity) / start_of_day_balance if start_of_day_balance > 0 else 0.0
+        slots = settings.max_positions - len(positions)
+        if daily_dd < settings.max_daily_drawdown_pct and slots > 0:
+            candidates = []
+            for symbol, i in bars:
+                direction, score, stop = signals[symbol]
+                if direction[i] == 0 or symbol in positions: continue
+                if direction[i] < 0 and not settings.allow_shorts: continue
+                candidates.append((float(score[i]), symbol, i))
+            candidates.sort(key=lambda c: c[0])
+
+            for _, symbol, i in candidates[:slots]:
+                h = history.symbols[symbol]
+                instrument = h.instrument
+                is_long = signals[symbol][0][i] > 0
+                stop = float(signals[symbol][2][i])
+
+                modifier = 1.0
+                if instrument.category == "FOREX" and \
+                        currency_exposure(instrument, positions, history) >= settings.max_currency_exposure:
+                    if settings.correlation_mode == 'BLOCK': continue
+                    if settings.correlation_mode == 'REDUCE': modifier = settings.correlation_risk_modifier
+
+                if h.spread[i] / instrument.pip_unit > settings.max_spread_pips: continue
+                rate = history.conversion_rate(instrument.quote, when)
+                if rate is None: continue
+
+                price = float(h.close[i])
+                risk_pct = settings.risk_per_trade_pct * modifier
+                volume = position_size(equity, risk_pct, price, stop, instrument, rate)
+                if volume <= 0: continue
+                fill = price + h.spread[i] if is_long else price
+                positions[symbol] = Position(
+                    symbol=symbol, is_long=is_long, volume=volume, entry_time=int(when),
+                    entry_price=float(fill), stop=stop, initial_stop=stop, risk_cash=equity * risk_pct,
+                )
+
+        # 5. Trailing stop on every open position with a bar now
+        for symbol, i in bars:
+            pos = positions.get(symbol)
+            if pos is None: continue
+            h = history.symbols[symbol]
+            atr = h.atr[i]
+            if np.isnan(atr): continue
+            new_stop = trailed_stop(pos.is_long, h.close[i], h.close[i] + h.spread[i], pos.stop, atr,
+                                    stop_distance(atr, h.instrument.category, params))
+            if new_stop is not None:
+                pos.stop = float(new_stop)
+
+        equity = mark_to_market()
+        curve.append({
+            'time': when, 'balance': balance, 'equity': equity, 'positions': len(positions),
+            'daily_drawdown': max(0.0, (start_of_day_balance - equity) / start_of_day_balance)
+            if start_of_day_balance > 0 else 0.0,
+        })
+
+    if curve:
+        final_time = curve[-1]['time']
+        for symbol in list(positions):
+            close(symbol, exit_price(positions[symbol], last_bar[symbol]), final_time, 'END')
+        curve[-1].update(balance=balance, equity=balance, positions=0)
+
+    equity_df = pd.DataFrame(curve, columns=['time', 'balance', 'equity', 'positions', 'daily_drawdown'])
+    equity_df['timestamp'] = pd.to_datetime(equity_df['time'], unit='s')
+    trades_df = pd.DataFrame(trades, columns=[
+        'symbol', 'side', 'volume', 'entry_time', 'entry_price', 'stop',
+        'exit_time', 'exit_price', 'reason', 'pnl', 'r_multiple'])
+    return BacktestResult(equity=equity_df, trades=trades_df, initial_balance=initial_balance)
+
+
+def default_universe(timeframe=TIMEFRAME_D1):
+    """Enabled watchlist symbols that have stored history."""
+    stored = {symbol for symbol, tf in history_store.list_series() if tf == timeframe}
+    return [
+        t for t in dict.fromkeys(WATCHLIST)
+        if t in stored and TRADE_SETTINGS.get(classify_category(t, None, get_watchlist_sector(t)), False)
+    ]
+
+
+def to_epoch(date_str):
+    return int(pd.Timestamp(date_str).timestamp()) if date_str else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the Sid strategy over stored D1 history.")
+    parser.add_argument("--symbols", nargs="*", help="Defaults to enabled watchlist symbols in the store")
+    parser.add_argument("--start", help="First simulated date, e.g. 2015-01-01")
+    parser.add_argument("--end", help="Last simulated date")
+    parser.add_argument("--balance", type=float, default=100000.0)
+    parser.add_argument("--trades", help="Write the trade list to this CSV")
+    parser.add_argument("--equity", help="Write the equity curve to this CSV")
+    args = parser.parse_args(argv)
+
+    symbols = args.symbols or default_universe()
+    history = load_history(symbols)
+    if not history.symbols:
+        logger.error("❌ Backtest: no stored history to replay")
+        return None
+
+    result = run_backtest(history, initial_balance=args.balance, start=to_epoch(args.start), end=to_epoch(args.end))
+    summary = result.summary()
+    logger.info(f"📊 Backtest over {len(history.symbols)} symbols: return {summary['total_return']:.2%}, "
+                f"max DD {summary['max_drawdown']:.2%}, max daily DD {summary['max_daily_drawdown']:.2%}, "
+                f"{summary['trades']} trades, win rate {summary['win_rate']:.0%}")
+    if args.trades:
+        result.trades.to_csv(args.trades, index=False)
+    if args.equity:
+        result.equity.to_csv(args.equity, index=False)
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    main()
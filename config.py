@@ -9,6 +9,8 @@ MT5_LOGIN = int(os.getenv("MT5_LOGIN", 0))
 MT5_PASSWORD = os.getenv("MT5_PASSWORD")
 MT5_SERVER = os.getenv("MT5_SERVER")
 MT5_PATH = os.getenv("MT5_PATH")
+# "terminal" (MetaTrader5 package) or "fake" (in-memory simulator in fake_mt5.py)
+MT5_BACKEND = os.getenv("MT5_BACKEND", "terminal")
 MAGIC_NUMBER = int(os.getenv("MAGIC_NUMBER", 999))
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
@@ -57,7 +59,87 @@ CATEGORY_MAP = {
 # --- PROP FIRM LIMITS ---
 # 0.047 is 4.7% (safety margin below 5% daily limit)
 MAX_DAILY_DRAWDOWN_LIMIT = float(os.getenv("MAX_DAILY_DRAWDOWN_LIMIT", 0.047))
+# Overall loss limit from the initial balance and the challenge profit target
+MAX_OVERALL_DRAWDOWN_PCT = float(os.getenv("MAX_OVERALL_DRAWDOWN_PCT", 0.10))
+PROP_PROFIT_TARGET_PCT = float(os.getenv("PROP_PROFIT_TARGET_PCT", 0.08))
 
 # --- SCHEDULING ---
 EXIT_CHECK_INTERVAL = 300  # 5 Minutes
-TRAILING_STOP_INTERVAL = 60  # 1 Minute
+# Trailing stops poll quotes this often (seconds): one symbols_get() for every held symbol per pass
+TRAILING_STOP_INTERVAL = 10
+# The trailing engine accepts a position book this old (this bot's own fills invalidate it at once)
+TRAILING_BOOK_MAX_AGE = 60
+# A rejected SL move is retried for that ticket after BASE, 2*BASE, ... up to MAX seconds
+TRAILING_REJECT_BACKOFF_BASE = 30
+TRAILING_REJECT_BACKOFF_MAX = 900
+# The advisor reuses the bot's last entry scan if it is at most this old (seconds)
+ADVISOR_SCAN_REUSE_SECONDS = 900
+# Open positions are re-read at most this often (seconds) and after every order_send
+POSITION_BOOK_TTL = 5
+
+# --- P&L LEDGER ---
+# Broker server time minus UTC (hours): deal times and the daily reset are in server time.
+# Unset = read it off the terminal clock (last tick time of SERVER_CLOCK_SYMBOL vs
+# time.time()), which follows the broker's DST switches; a fixed value does not.
+SERVER_UTC_OFFSET_HOURS = float(os.environ["SERVER_UTC_OFFSET_HOURS"]) if os.getenv("SERVER_UTC_OFFSET_HOURS") else None
+SERVER_CLOCK_SYMBOL = os.getenv("SERVER_CLOCK_SYMBOL", "EURUSD")
+# A tick this many seconds off the half-hour grid is too stale to read the offset from
+SERVER_CLOCK_TOLERANCE = 120
+# Server-time hour at which the trading day (and the daily drawdown baseline) resets
+PNL_DAY_ROLLOVER_HOUR = int(os.getenv("PNL_DAY_ROLLOVER_HOUR", 0))
+# Drawdown readers share one account/deal read at most this old (seconds)
+PNL_LEDGER_TTL = 5
+
+# --- ORDER SUBMISSION ---
+# Max distance (points) a market order may fill from the requested price, per category
+ORDER_DEVIATION_POINTS = {
+    "FOREX": 20, "METALS": 50, "STOCKS": 20,
+    "INDICES": 50, "CRYPTO": 200, "COMMODITIES": 30
+}
+# Requotes / price changes are re-priced from a fresh tick at most this many times
+ORDER_MAX_RETRIES = 3
+# When order_send answers None, fills this recent (seconds, server time) are searched before any resend
+ORDER_RECONCILE_WINDOW = 300
+
+# --- KILL SWITCH ---
+# The flatten engine retries rejected closes until flat or this many seconds pass
+KILL_SWITCH_DEADLINE = 30
+KILL_SWITCH_RETRY_DELAY = 0.2
+
+# --- TERMINAL CONNECTION ---
+# Reconnect attempts back off from BASE to MAX seconds; after THRESHOLD
+# consecutive failures the circuit opens and scans pause until a reconnect works
+CONNECTION_BACKOFF_BASE = 2
+CONNECTION_BACKOFF_MAX = 300
+CONNECTION_BREAKER_THRESHOLD = 3
+# Round-trip samples kept for the latency percentiles
+CONNECTION_LATENCY_WINDOW = 500
+
+# --- MARKET DATA ---
+# A market snapshot is shared by every scan that runs within this many seconds
+SNAPSHOT_MAX_AGE = 45
+# Bars kept per symbol in a snapshot; consumers slice the tail they need
+SNAPSHOT_DEPTH = 250
+# Streaming RSI/ATR (indicators.py) are seeded from this many bars, whichever task touches a symbol first
+STREAM_SEED_BARS = SNAPSHOT_DEPTH
+# Currency conversion matrix (fx_rates.py) is rebuilt from fresh ticks after this many seconds
+CONVERSION_RATES_MAX_AGE = 45
+# Local memory-mapped bar history used for warm starts and offline tooling
+HISTORY_STORE_ENABLED = True
+HISTORY_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+# Seconds an mt5.symbol_info result is reused before asking the terminal again
+SYMBOL_INFO_TTL = 300
+# Trade mode (open/closed/close-only) can change at any session boundary, so
+# is_market_open accepts a much fresher symbol_info
+SYMBOL_TRADE_MODE_TTL = 5
+# Entry-scan memo: a symbol is re-evaluated only when its last bar changes or
+# its close leaves a bucket of this many pips
+SIGNAL_MEMO_BUCKET_PIPS = 2
+# Worker processes for the entry scan (0 or 1 = serial in the bot process);
+# the pool is only used when at least SCAN_PARALLEL_MIN_SYMBOLS need evaluating
+SCAN_WORKERS = 0
+SCAN_PARALLEL_MIN_SYMBOLS = 60
+# Worker processes for the offline parameter sweep (0 = one per CPU)
+OPTIMIZER_WORKERS = 0
+# Streaming RSI/ATR state for open positions, persisted across restarts
+INDICATOR_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "indicator_state.json")
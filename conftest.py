@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+# Tests run against the in-memory terminal (fake_mt5.py) unless told otherwise
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Keeps the history store and indicator state away from the live bot's files in the repo root."""
+    monkeypatch.setattr("history_store.HISTORY_STORE_DIR", str(tmp_path / "history"))
+    monkeypatch.setattr("indicators.INDICATOR_STATE_PATH", str(tmp_path / "indicator_state.json"))
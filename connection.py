@@ -0,0 +1,143 @@
+"""
+Terminal connection manager.
+
+Owns initialize/shutdown for the whole process. Callers ask
+`connection.ensure_connected()` before talking to MT5 instead of calling
+mt5.initialize() themselves:
+
+- Each check times a terminal_info() round trip; the samples feed rolling
+  latency percentiles (get_connection_stats()).
+- A failed check triggers a reconnect. Failed reconnects back off
+  exponentially (CONNECTION_BACKOFF_BASE .. CONNECTION_BACKOFF_MAX seconds).
+- After CONNECTION_BREAKER_THRESHOLD consecutive failures the circuit opens:
+  scans_allowed() is False until a reconnect succeeds, so scans pause instead
+  of hammering a dead terminal. ensure_connected(force=True) ignores the
+  backoff for emergencies (the kill switch).
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from mt5_gateway import mt5, priority, PRIORITY_CRITICAL
+from utils import invalidate_symbol_info
+
+from config import *
+
+logger = logging.getLogger("MT5MasterControl")
+
+
+class ConnectionManager:
+    def __init__(self, terminal=mt5, clock=time.monotonic):
+        self.terminal = terminal
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.connected = False
+        self.failures = 0  # Consecutive failed checks/reconnects
+        self.retry_at = 0.0
+        self.circuit_open = False
+        self.connections = 0  # Successful connects; all but the first are reconnects
+        self.latencies = deque(maxlen=CONNECTION_LATENCY_WINDOW)  # seconds
+
+    # -------------------------------
+    # Connect / Probe
+    # -------------------------------
+    def _initialize(self):
+        """Attaches to a running terminal, then falls back to launching it with credentials."""
+        if self.terminal.initialize():
+            return True
+        if MT5_PATH:
+            logger.info("No running terminal found, attempting to launch via path...")
+            return self.terminal.initialize(path=MT5_PATH, portable=True, login=MT5_LOGIN,
+                                            password=MT5_PASSWORD, server=MT5_SERVER)
+        return self.terminal.initialize(login=MT5_LOGIN, password=MT5_PASSWORD, server=MT5_SERVER)
+
+    def probe(self):
+        """Times one terminal round trip. True if the terminal answered and is connected."""
+        started = time.perf_counter()
+        with priority(PRIORITY_CRITICAL):  # Measure the terminal, not the scan queue
+            info = self.terminal.terminal_info()
+        if info is None or not getattr(info, "connected", True):
+            return False
+        self.latencies.append(time.perf_counter() - started)
+        return True
+
+    def _record_failure(self, reason):
+        self.connected = False
+        self.failures += 1
+        delay = min(CONNECTION_BACKOFF_MAX, CONNECTION_BACKOFF_BASE * 2 ** (self.failures - 1))
+        self.retry_at = self.clock() + delay
+        if self.failures >= CONNECTION_BREAKER_THRESHOLD and not self.circuit_open:
+            self.circuit_open = True
+            logger.critical(f"🔌 MT5 circuit OPEN after {self.failures} failures: scans paused")
+        logger.error(f"❌ MT5 {reason}: {self.terminal.last_error()} (retry in {delay:.0f}s)")
+
+    def _record_success(self):
+        if self.circuit_open:
+            logger.info("✅ MT5 circuit closed: terminal healthy again, scans resumed")
+        self.connected = True
+        self.failures = 0
+        self.retry_at = 0.0
+        self.circuit_open = False
+
+    def connect(self):
+        """Initializes the terminal now, ignoring any backoff. Returns True on success."""
+        with self._lock:
+            return self._connect()
+
+    def _connect(self):
+        if not self._initialize() or not self.probe():
+            self._record_failure("initialization failed")
+            return False
+        self.connections += 1
+        if self.connections > 1:
+            invalidate_symbol_info()  # Sessions and specs may have changed while we were away
+        self._record_success()
+        logger.info("✅ Reconnected to MT5 Broker successfully." if self.connections > 1
+                    else "MT5 initialized successfully")
+        return True
+
+    def ensure_connected(self, force=False):
+        """
+        Probes the terminal and reconnects if needed. While backing off after a
+        failure it returns False without touching the terminal, unless `force`.
+        """
+        with self._lock:
+            if self.connected:
+                if self.probe():
+                    return True
+                logger.warning("🔄 MT5 Connection lost. Attempting to reconnect...")
+                self.connected = False
+            elif not force and self.clock() < self.retry_at:
+                return False
+            return self._connect()
+
+    def scans_allowed(self):
+        """False while the circuit is open; scans should skip their cycle."""
+        return not self.circuit_open
+
+    def shutdown(self):
+        with self._lock:
+            self.terminal.shutdown()
+            self.connected = False
+
+    # -------------------------------
+    # Telemetry
+    # -------------------------------
+    def stats(self) -> dict:
+        samples = np.array(self.latencies) * 1000
+        latency = {}
+        if len(samples):
+            latency = {'avg_ms': float(samples.mean()), 'p50_ms': float(np.percentile(samples, 50)),
+                       'p95_ms': float(np.percentile(samples, 95)), 'max_ms': float(samples.max())}
+        return {'connected': self.connected, 'circuit_open': self.circuit_open, 'failures': self.failures,
+                'reconnects': max(0, self.connections - 1), 'samples': len(samples), **latency}
+
+
+connection = ConnectionManager()
+
+
+def get_connection_stats():
+    return connection.stats()
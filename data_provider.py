@@ -1,19 +1,166 @@
 import logging
-import MetaTrader5 as mt5
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import List, Mapping
+from mt5_gateway import mt5
+import numpy as np
 import pandas as pd
-from typing import List
+import history_store
+from config import SNAPSHOT_MAX_AGE, SNAPSHOT_DEPTH, HISTORY_STORE_ENABLED
 from prop_watchlist import WATCHLIST  # your ticker list
 
 logger = logging.getLogger(__name__)
 
 # ------------------------
-# Data Provider Functions
+# Bar Cache
 # ------------------------
-def get_data(symbol, timeframe=mt5.TIMEFRAME_D1, count=250):
+# Full rate history per (symbol, timeframe), oldest bar first. Only the tail
+# is refreshed from MT5 on each call; the forming bar is patched in place.
+# On first use a series is seeded from the local history store, so a restart
+# only downloads the bars printed while the bot was down.
+_BAR_CACHE = {}
+_BAR_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0, "bars_fetched": 0, "bars_loaded": 0}
+
+# Bars requested on an incremental refresh (forming bar + the one it replaced)
+INCREMENTAL_WINDOW = 2
+
+# Store writes happen outside _BAR_CACHE_LOCK, one series at a time
+_STORE_LOCK = threading.Lock()
+_PERSISTED = {}  # (symbol, timeframe) -> open time of the newest bar in the store
+
+
+def _fetch_rates(symbol, timeframe, count):
+    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
+    if rates is None or len(rates) == 0:
+        return None
+    _CACHE_STATS["bars_fetched"] += len(rates)
+    return rates
+
+
+def _merge_rates(cached, fresh):
+    """Replaces every cached bar from the first fresh bar onwards with the fresh slice."""
+    keep = np.searchsorted(cached['time'], fresh['time'][0], side='left')
+    return np.concatenate((cached[:keep], fresh))
+
+
+def _combine(cached, fresh):
     """
-    Fetches historical data from MT5 and returns a pandas DataFrame.
+    Returns (rates, joined). If `fresh` does not reach back to the last
+    cached bar, merging would leave a silent hole, so the cache is dropped
+    and `fresh` alone is returned with joined=False.
     """
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
+    if cached is None or len(cached) == 0 or fresh['time'][0] > cached['time'][-1]:
+        return fresh, False
+    return _merge_rates(cached, fresh), True
+
+
+def _refresh_tail(symbol, timeframe, cached, count):
+    """
+    Asks MT5 only for bars newer than the last cached one. The window grows
+    until it overlaps the cache, MT5 runs out of bars or it reaches `count`.
+    Returns the fresh bars or None.
+    """
+    last_time = cached['time'][-1]
+    window = INCREMENTAL_WINDOW
+    while True:
+        size = min(window, count)
+        fresh = _fetch_rates(symbol, timeframe, size)
+        if fresh is None or fresh['time'][0] <= last_time or len(fresh) < size or window >= count:
+            return fresh
+        window *= 4
+
+
+def _load_stored(symbol, timeframe, count):
+    if not HISTORY_STORE_ENABLED:
+        return None
+    try:
+        stored = history_store.load_rates(symbol, timeframe, count)
+    except Exception as e:
+        logger.error(f"[ERROR] History store read failed for {symbol}: {e}")
+        return None
+    if stored is not None and len(stored):
+        _CACHE_STATS["bars_loaded"] += len(stored)
+        with _STORE_LOCK:
+            _PERSISTED.setdefault((symbol, timeframe), int(stored['time'][-1]))
+    return stored
+
+
+def _persist(symbol, timeframe, fresh, joined):
+    """
+    Writes bars to the store once a new bar has printed, or replaces the
+    stored series when the fresh bars did not join up with it. A refresh that
+    only moved the forming bar writes nothing.
+    """
+    if not HISTORY_STORE_ENABLED:
+        return
+    key = (symbol, timeframe)
+    newest = int(fresh['time'][-1])
+    with _STORE_LOCK:
+        if joined and _PERSISTED.get(key, -1) >= newest:
+            return
+        try:
+            if joined:
+                history_store.append_rates(symbol, timeframe, fresh)
+            else:
+                history_store.replace_rates(symbol, timeframe, fresh)
+            _PERSISTED[key] = newest
+        except Exception as e:
+            logger.error(f"[ERROR] History store write failed for {symbol}: {e}")
+
+
+def get_rates(symbol, timeframe=mt5.TIMEFRAME_D1, count=250):
+    """
+    Returns the last `count` bars for a symbol as the raw MT5 structured array,
+    served from the bar cache and topped up incrementally.
+    """
+    key = (symbol, timeframe)
+    with _BAR_CACHE_LOCK:
+        cached = _BAR_CACHE.get(key)
+        if cached is None:
+            cached = _load_stored(symbol, timeframe, count)
+
+        if cached is not None and len(cached) >= count:
+            fresh = _refresh_tail(symbol, timeframe, cached, count)
+            if fresh is None:
+                return None
+            _CACHE_STATS["hits"] += 1
+        else:
+            fresh = _fetch_rates(symbol, timeframe, count)
+            if fresh is None:
+                return None
+            _CACHE_STATS["misses"] += 1
+
+        rates, joined = _combine(cached, fresh)
+        if cached is not None and not joined:
+            logger.warning(f"⚠️ {symbol}: new bars do not join the cached history; series reset")
+        _BAR_CACHE[key] = rates
+
+    _persist(symbol, timeframe, fresh, joined or cached is None)
+    return rates[-count:]
+
+
+def get_cache_stats() -> dict:
+    """Hit/miss counters for the bar cache plus bars pulled from MT5 and from disk."""
+    stats = dict(_CACHE_STATS)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["series"] = len(_BAR_CACHE)
+    return stats
+
+
+def clear_cache(symbol=None):
+    """Drops cached bars for one symbol (all timeframes) or for everything; they reload from the store."""
+    with _BAR_CACHE_LOCK, _STORE_LOCK:
+        for cache in (_BAR_CACHE, _PERSISTED):
+            for key in [k for k in cache if symbol is None or k[0] == symbol]:
+                del cache[key]
+
+
+def _to_frame(rates):
     if rates is None or len(rates) == 0:
         return pd.DataFrame()
 
@@ -22,6 +169,139 @@ def get_data(symbol, timeframe=mt5.TIMEFRAME_D1, count=250):
     return df
 
 
+# ------------------------
+# Per-Scan Market Snapshot
+# ------------------------
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    Read-only bars for every symbol fetched during one scan cycle.
+    All consumers in the cycle share it, so each symbol hits MT5 at most once.
+    """
+    cycle: int
+    timeframe: int
+    created: float
+    rates: Mapping[str, np.ndarray] = field(repr=False)
+    depths: Mapping[str, int] = field(repr=False)
+
+    def __contains__(self, symbol):
+        return symbol in self.rates
+
+    @property
+    def symbols(self):
+        return tuple(self.rates)
+
+    def frame(self, symbol, count=None) -> pd.DataFrame:
+        """Returns a fresh DataFrame (safe to mutate) with the last `count` bars."""
+        rates = self.rates.get(symbol)
+        if rates is None:
+            return pd.DataFrame()
+        return _to_frame(rates if count is None else rates[-count:])
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+
+_SNAPSHOTS = {}  # timeframe -> MarketSnapshot of the current cycle
+_PENDING = {}  # (symbol, timeframe) -> (Future, depth) of an in-flight fetch
+_SNAPSHOT_LOCK = threading.Lock()
+_CYCLE = {"id": 0}
+
+
+def begin_scan_cycle():
+    """Starts a new scan cycle; the next get_data_many call builds a fresh snapshot."""
+    with _SNAPSHOT_LOCK:
+        _CYCLE["id"] += 1
+        _SNAPSHOTS.clear()
+
+
+def _current_snapshot(timeframe):
+    snap = _SNAPSHOTS.get(timeframe)
+    if snap is None or snap.cycle != _CYCLE["id"] or snap.age() > SNAPSHOT_MAX_AGE:
+        if snap is not None and snap.cycle == _CYCLE["id"]:
+            # Snapshot expired on its own: roll the cycle forward
+            _CYCLE["id"] += 1
+        snap = MarketSnapshot(_CYCLE["id"], timeframe, time.monotonic(),
+                              MappingProxyType({}), MappingProxyType({}))
+        _SNAPSHOTS[timeframe] = snap
+    return snap
+
+
+def _read_only(rates):
+    view = rates.view()
+    view.flags.writeable = False
+    return view
+
+
+def get_data_many(symbols, timeframe=mt5.TIMEFRAME_D1, count=250) -> MarketSnapshot:
+    """
+    Returns the shared snapshot for the current scan cycle, extended with any
+    of `symbols` it did not hold yet. Symbols another thread is already
+    fetching are awaited instead of being requested twice. Symbols MT5 could
+    not deliver are simply absent from the snapshot.
+    """
+    depth = max(count, SNAPSHOT_DEPTH)
+    to_fetch, to_wait = [], []
+
+    with _SNAPSHOT_LOCK:
+        snap = _current_snapshot(timeframe)
+        for symbol in dict.fromkeys(symbols):
+            if snap.depths.get(symbol, 0) >= count:
+                continue
+            pending = _PENDING.get((symbol, timeframe))
+            if pending is not None and pending[1] >= count:
+                to_wait.append((symbol, pending))
+                continue
+            future = Future()
+            _PENDING[(symbol, timeframe)] = (future, depth)
+            to_fetch.append((symbol, future))
+
+    if not to_fetch and not to_wait:
+        return snap
+
+    fetched = {}
+    for symbol, future in to_fetch:
+        try:
+            rates = get_rates(symbol, timeframe, depth)
+            future.set_result(None if rates is None else _read_only(rates))
+        except Exception as e:
+            logger.error(f"[ERROR] Snapshot fetch failed for {symbol}: {e}")
+            future.set_result(None)
+        finally:
+            with _SNAPSHOT_LOCK:
+                if _PENDING.get((symbol, timeframe), (None,))[0] is future:
+                    del _PENDING[(symbol, timeframe)]
+        fetched[symbol] = (future.result(), depth)
+
+    for symbol, (future, pending_depth) in to_wait:
+        fetched[symbol] = (future.result(), pending_depth)
+
+    with _SNAPSHOT_LOCK:
+        snap = _current_snapshot(timeframe)
+        rates, depths = dict(snap.rates), dict(snap.depths)
+        for symbol, (symbol_rates, symbol_depth) in fetched.items():
+            if symbol_rates is None or symbol_depth < depths.get(symbol, 0):
+                continue
+            rates[symbol] = symbol_rates
+            depths[symbol] = symbol_depth
+        snap = MarketSnapshot(snap.cycle, timeframe, snap.created,
+                              MappingProxyType(rates), MappingProxyType(depths))
+        _SNAPSHOTS[timeframe] = snap
+        return snap
+
+
+# ------------------------
+# Data Provider Functions
+# ------------------------
+def get_data(symbol, timeframe=mt5.TIMEFRAME_D1, count=250):
+    """
+    Fetches historical data from MT5 and returns a pandas DataFrame.
+    Bars come from the incremental bar cache, so repeated scans only
+    transfer the newest bars.
+    """
+    return _to_frame(get_rates(symbol, timeframe, count))
+
+
 def get_universe() -> List[str]:
     """
     Return the list of tickers to scan.
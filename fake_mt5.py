@@ -0,0 +1,579 @@
+"""
+In-memory stand-in for the MetaTrader5 package, for tests and benchmarks.
+
+Covers the calls this project makes (initialize, account_info,
+terminal_info, symbol_info, symbols_get, symbol_info_tick,
+copy_rates_from_pos, positions_get, orders_get, history_deals_get,
+order_check, order_send, ...) with the same constants and record shapes.
+
+Prices are a seeded random walk per symbol: D1 history is generated on
+first use, and every call moves the price by the time elapsed on the clock
+(wall time by default). Market orders fill at bid/ask plus optional adverse
+slippage, can be requoted with a configurable probability, can execute and
+still answer None (a lost reply), and stops are triggered as prices move. Every call can sleep for a configurable latency,
+so the scan, execution and risk paths can be measured without a broker.
+
+Select it for the bot with MT5_BACKEND=fake (see mt5_gateway.py), or use it
+directly:
+
+    import fake_mt5
+    fake_mt5.reset(seed=7, latency={"order_send": 0.05})
+"""
+import fnmatch
+import math
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from config import CATEGORY_MAP, MAGIC_NUMBER
+from history_store import RATES_DTYPE
+from prop_watchlist import WATCHLIST_SECTORS
+
+# --- Constants (values match the MetaTrader5 package) ---
+TIMEFRAME_M1, TIMEFRAME_H1, TIMEFRAME_H4, TIMEFRAME_D1, TIMEFRAME_W1 = 1, 16385, 16388, 16408, 32769
+ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_LIMIT, ORDER_TYPE_BUY_STOP, ORDER_TYPE_SELL_STOP = 2, 3, 4, 5
+POSITION_TYPE_BUY, POSITION_TYPE_SELL = 0, 1
+TRADE_ACTION_DEAL, TRADE_ACTION_PENDING, TRADE_ACTION_SLTP = 1, 5, 6
+TRADE_ACTION_MODIFY, TRADE_ACTION_REMOVE, TRADE_ACTION_CLOSE_BY = 7, 8, 10
+ORDER_FILLING_FOK, ORDER_FILLING_IOC, ORDER_FILLING_RETURN = 0, 1, 2
+ORDER_TIME_GTC, ORDER_TIME_DAY = 0, 1
+SYMBOL_FILLING_FOK, SYMBOL_FILLING_IOC = 1, 2
+SYMBOL_TRADE_MODE_DISABLED, SYMBOL_TRADE_MODE_FULL = 0, 4
+DEAL_TYPE_BUY, DEAL_TYPE_SELL = 0, 1
+DEAL_ENTRY_IN, DEAL_ENTRY_OUT = 0, 1
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_PRICE = 10015
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_PRICE_OFF = 10021
+RES_S_OK, RES_E_FAIL, RES_E_NOT_FOUND, RES_E_INTERNAL_FAIL = 1, -1, -4, -10001
+
+# --- Records (field subsets of the real structures) ---
+AccountInfo = namedtuple('AccountInfo', 'login trade_allowed leverage balance equity profit margin margin_free '
+                                        'margin_level currency server name')
+TerminalInfo = namedtuple('TerminalInfo', 'connected trade_allowed name path build')
+SymbolInfo = namedtuple('SymbolInfo', 'name path visible trade_mode digits point spread time bid ask '
+                                      'trade_contract_size volume_min volume_max volume_step filling_mode '
+                                      'currency_base currency_profit')
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc')
+TradePosition = namedtuple('TradePosition', 'ticket time type magic identifier volume price_open sl tp '
+                                            'price_current swap profit symbol comment')
+TradeOrder = namedtuple('TradeOrder', 'ticket time_setup type magic volume_initial volume_current '
+                                      'price_open sl tp symbol comment')
+TradeDeal = namedtuple('TradeDeal', 'ticket order time type entry magic position_id volume price '
+                                    'commission swap profit fee symbol comment')
+TradeRequest = namedtuple('TradeRequest', 'action magic order symbol volume price sl tp deviation type '
+                                          'type_filling type_time comment position')
+OrderSendResult = namedtuple('OrderSendResult', 'retcode deal order volume price bid ask comment request_id '
+                                                'retcode_external request')
+OrderCheckResult = namedtuple('OrderCheckResult', 'retcode balance equity profit margin margin_free margin_level '
+                                                  'comment request')
+
+# sector -> (digits, contract size, starting price, daily volatility, broker path)
+_SECTOR_SPECS = {
+    'FOREX': (5, 100000, 1.10, 0.006, 'Forex\\Majors'),
+    'METALS': (2, 100, 2000.0, 0.010, 'Metals\\Spot'),
+    'INDICES': (1, 1, 15000.0, 0.011, 'Indices\\Cash'),
+    'COMMODITIES': (2, 1000, 75.0, 0.018, 'Commodity\\Energy'),
+    'CRYPTO': (2, 1, 30000.0, 0.030, 'Crypto\\Spot'),
+    'STOCKS': (2, 1, 100.0, 0.016, 'Stocks\\US'),
+}
+_SPREAD_POINTS = 12
+
+
+def _symbol_specs():
+    """symbol -> (category, base, quote) for every watchlist symbol."""
+    specs = {}
+    for sector, tickers in WATCHLIST_SECTORS.items():
+        for ticker in tickers:
+            category = next((c for key, c in CATEGORY_MAP.items() if key in ticker), sector.upper())
+            if category == 'FOREX' or (len(ticker) == 6 and ticker.endswith('USD')):
+                base, quote = ticker[:3], ticker[3:6]
+            else:
+                base, quote = ticker, 'USD'
+            specs[ticker] = (category, base, quote)
+    return specs
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class FakeTerminal:
+    """One simulated terminal/account. Module-level functions use a default instance."""
+
+    def __init__(self, seed=0, balance=100000.0, history_days=600, clock=time.time, latency=None,
+                 slippage_points=0, requote_probability=0.0, lost_reply_probability=0.0, leverage=100,
+                 require_initialize=True):
+        self.seed = seed
+        self.clock = clock
+        self.history_days = history_days
+        self.latency = latency or {}  # seconds: float for every call, or {function name: seconds}
+        self.slippage_points = slippage_points
+        self.requote_probability = requote_probability
+        self.lost_reply_probability = lost_reply_probability  # order_send executes, then returns None
+        self.leverage = leverage
+        self.require_initialize = require_initialize
+        self.connected = False
+        self.balance = balance
+        self.error = (RES_S_OK, "Success")
+        self.calls = {}
+
+        self._specs = _symbol_specs()
+        self._rng = np.random.default_rng(seed)
+        self._series = {}  # symbol -> dict(bars=list of rows, price, updated, day, vol, digits)
+        self._positions = {}
+        self._orders = {}
+        self._deals = []
+        self._ticket = 1000
+
+    # -------------------------------
+    # Plumbing
+    # -------------------------------
+    def _enter(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self.latency.get(name, 0.0) if isinstance(self.latency, dict) else self.latency
+        if delay:
+            time.sleep(delay)
+        if self.require_initialize and not self.connected and name not in ('initialize', 'last_error'):
+            self.error = (RES_E_FAIL, "Terminal: Call initialize first")
+            return False
+        return True
+
+    def _next_ticket(self):
+        self._ticket += 1
+        return self._ticket
+
+    def _spec(self, symbol):
+        category, base, quote = self._specs[symbol]
+        digits, contract, price, vol, path = _SECTOR_SPECS.get(category, _SECTOR_SPECS['STOCKS'])
+        if category == 'FOREX' and quote == 'JPY':
+            digits, price = 3, 150.0
+        if symbol.startswith('XAG'):
+            contract, price = 5000, 25.0
+        return category, base, quote, digits, contract, price, vol, path
+
+    # -------------------------------
+    # Price Generator
+    # -------------------------------
+    def _series_for(self, symbol):
+        series = self._series.get(symbol)
+        if series is not None:
+            return series
+
+        category, _, _, digits, _, start_price, vol, _ = self._spec(symbol)
+        rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+        now = self.clock()
+        today = int(now // 86400)
+        days = [d for d in range(today - self.history_days, today)
+                if category == 'CRYPTO' or self._weekday(d)]
+        price = start_price * math.exp(rng.normal(0, 0.1))
+        bars = []
+        for day in days:
+            open_ = price
+            path = open_ * np.exp(np.cumsum(rng.normal(0, vol / 4, 4)))
+            price = float(path[-1])
+            bars.append([day * 86400, open_, max(open_, path.max()), min(open_, path.min()), price,
+                         int(rng.integers(500, 5000)), _SPREAD_POINTS, 0])
+        series = {'bars': bars, 'price': round(price, digits), 'updated': now, 'vol': vol, 'digits': digits,
+                  'category': category, 'rng': rng, 'day': today}
+        if self._trading_day(series, today):
+            self._new_bar(series, today)
+        self._series[symbol] = series
+        return series
+
+    @staticmethod
+    def _weekday(day):
+        return (day + 3) % 7 < 5  # Epoch day 0 was a Thursday
+
+    def _trading_day(self, series, day):
+        return series['category'] == 'CRYPTO' or self._weekday(day)
+
+    @staticmethod
+    def _new_bar(series, day):
+        price = series['price']
+        series['bars'].append([day * 86400, price, price, price, price, 0, _SPREAD_POINTS, 0])
+        series['day'] = day
+
+    def _advance(self, symbol):
+        """Moves the symbol's price by the time elapsed since it was last touched."""
+        series = self._series_for(symbol)
+        now = self.clock()
+        dt = now - series['updated']
+        if dt <= 0:
+            return series
+        series['updated'] = now
+        day = int(now // 86400)
+        if not self._trading_day(series, day):
+            return series  # Market closed for the weekend
+        if day != series['day']:
+            self._new_bar(series, day)
+        step = series['vol'] * math.sqrt(dt / 86400.0) * series['rng'].normal()
+        self._set_price(symbol, series, series['price'] * math.exp(step))
+        return series
+
+    def _set_price(self, symbol, series, price):
+        series['price'] = round(price, series['digits'])
+        bar = series['bars'][-1]
+        bar[2], bar[3], bar[4] = max(bar[2], series['price']), min(bar[3], series['price']), series['price']
+        bar[5] += 1
+        self._check_stops(symbol)
+
+    def set_price(self, symbol, bid):
+        """Moves a symbol's bid to `bid` (stops are checked as on any price update)."""
+        series = self._advance(symbol)
+        self._set_price(symbol, series, bid)
+
+    def _quote(self, symbol):
+        series = self._advance(symbol)
+        point = 10 ** -series['digits']
+        bid = series['price']
+        return bid, round(bid + _SPREAD_POINTS * point, series['digits']), point
+
+    # -------------------------------
+    # Account
+    # -------------------------------
+    def _usd_rate(self, quote):
+        """Quote-currency-to-USD rate from the simulated prices."""
+        if quote in ('USD', ''):
+            return 1.0
+        if f"{quote}USD" in self._specs:
+            return self._quote(f"{quote}USD")[0]
+        if f"USD{quote}" in self._specs:
+            return 1.0 / self._quote(f"USD{quote}")[0]
+        return 1.0
+
+    def _profit(self, pos, close_price):
+        _, _, quote, _, contract, _, _, _ = self._spec(pos['symbol'])
+        direction = 1 if pos['type'] == POSITION_TYPE_BUY else -1
+        return round((close_price - pos['price_open']) * direction * pos['volume'] * contract
+                     * self._usd_rate(quote), 2)
+
+    def _close_price(self, pos):
+        bid, ask, _ = self._quote(pos['symbol'])
+        return bid if pos['type'] == POSITION_TYPE_BUY else ask
+
+    def _floating(self):
+        return sum((self._profit(p, self._close_price(p)) for p in list(self._positions.values())), 0.0)
+
+    def _margin(self):
+        total = 0.0
+        for pos in self._positions.values():
+            _, _, quote, _, contract, _, _, _ = self._spec(pos['symbol'])
+            total += pos['volume'] * contract * pos['price_open'] * self._usd_rate(quote) / self.leverage
+        return round(total, 2)
+
+    # -------------------------------
+    # Fills
+    # -------------------------------
+    def _record_deal(self, pos, entry, volume, price, profit, comment):
+        is_buy = (pos['type'] == POSITION_TYPE_BUY) == (entry == DEAL_ENTRY_IN)
+        deal = TradeDeal(
+            ticket=self._next_ticket(), order=self._ticket, time=int(self.clock()),
+            type=DEAL_TYPE_BUY if is_buy else DEAL_TYPE_SELL, entry=entry, magic=pos['magic'],
+            position_id=pos['ticket'], volume=volume, price=price, commission=0.0, swap=0.0,
+            profit=profit, fee=0.0, symbol=pos['symbol'], comment=comment,
+        )
+        self._deals.append(deal)
+        return deal
+
+    def _close(self, pos, price, volume, comment):
+        volume = min(volume, pos['volume'])
+        part = dict(pos, volume=volume)
+        profit = self._profit(part, price)
+        self.balance = round(self.balance + profit, 2)
+        deal = self._record_deal(pos, DEAL_ENTRY_OUT, volume, price, profit, comment)
+        pos['volume'] = round(pos['volume'] - volume, 2)
+        if pos['volume'] <= 0:
+            del self._positions[pos['ticket']]
+        return deal
+
+    def _check_stops(self, symbol):
+        series = self._series[symbol]
+        bid = series['price']
+        ask = round(bid + _SPREAD_POINTS * 10 ** -series['digits'], series['digits'])
+        for pos in [p for p in self._positions.values() if p['symbol'] == symbol]:
+            long = pos['type'] == POSITION_TYPE_BUY
+            price = bid if long else ask
+            if pos['sl'] and (price <= pos['sl'] if long else price >= pos['sl']):
+                self._close(pos, pos['sl'], pos['volume'], "sl")
+            elif pos['tp'] and (price >= pos['tp'] if long else price <= pos['tp']):
+                self._close(pos, pos['tp'], pos['volume'], "tp")
+
+    def _result(self, retcode, request, deal=0, order=0, volume=0.0, price=0.0, comment=""):
+        bid, ask = (self._quote(request['symbol'])[:2] if request.get('symbol') in self._specs else (0.0, 0.0))
+        fields = {f: request.get(f, 0) for f in TradeRequest._fields}
+        return OrderSendResult(retcode=retcode, deal=deal, order=order, volume=volume, price=price, bid=bid,
+                               ask=ask, comment=comment, request_id=self._next_ticket(), retcode_external=0,
+                               request=TradeRequest(**fields))
+
+    def _validate(self, request):
+        """Returns (retcode, comment) for a request that cannot be executed, else None."""
+        action = request.get('action')
+        symbol = request.get('symbol')
+        if action in (TRADE_ACTION_DEAL, TRADE_ACTION_PENDING) and symbol not in self._specs:
+            return TRADE_RETCODE_INVALID, "Invalid request"
+        if action in (TRADE_ACTION_DEAL, TRADE_ACTION_PENDING) and not request.get('position'):
+            volume = request.get('volume', 0)
+            if volume < 0.01 or volume > 100 or abs(round(volume / 0.01) * 0.01 - volume) > 1e-9:
+                return TRADE_RETCODE_INVALID_VOLUME, "Invalid volume"
+            bid, ask, _ = self._quote(symbol)
+            sl = request.get('sl', 0.0)
+            if sl and action == TRADE_ACTION_DEAL:
+                if (request.get('type') == ORDER_TYPE_BUY and sl >= bid) or \
+                        (request.get('type') == ORDER_TYPE_SELL and sl <= ask):
+                    return TRADE_RETCODE_INVALID_STOPS, "Invalid stops"
+            _, _, quote, _, contract, _, _, _ = self._spec(symbol)
+            margin = volume * contract * ask * self._usd_rate(quote) / self.leverage
+            if margin > self.balance + self._floating() - self._margin():
+                return TRADE_RETCODE_NO_MONEY, "No money"
+        return None
+
+    def _deal(self, request):
+        symbol = request['symbol']
+        bid, ask, point = self._quote(symbol)
+        is_buy = request.get('type') == ORDER_TYPE_BUY
+        market = ask if is_buy else bid
+
+        requested = request.get('price')
+        if requested and self.requote_probability and self._rng.random() < self.requote_probability:
+            return self._result(TRADE_RETCODE_REQUOTE, request, comment="Requote")
+        slip = int(self._rng.integers(0, self.slippage_points + 1)) if self.slippage_points else 0
+        digits = self._series[symbol]['digits']
+        fill = round(market + slip * point if is_buy else market - slip * point, digits)
+
+        if request.get('position'):
+            pos = self._positions.get(request['position'])
+            if pos is None or pos['symbol'] != symbol:
+                return self._result(TRADE_RETCODE_INVALID, request, comment="Position not found")
+            deal = self._close(pos, fill, request.get('volume', pos['volume']), request.get('comment', ""))
+            return self._result(TRADE_RETCODE_DONE, request, deal.ticket, deal.order, deal.volume, fill,
+                                "Request executed")
+
+        ticket = self._next_ticket()
+        pos = {
+            'ticket': ticket, 'time': int(self.clock()), 'symbol': symbol, 'volume': request['volume'],
+            'type': POSITION_TYPE_BUY if is_buy else POSITION_TYPE_SELL, 'price_open': fill,
+            'sl': request.get('sl', 0.0), 'tp': request.get('tp', 0.0),
+            'magic': request.get('magic', 0), 'comment': request.get('comment', ""),
+        }
+        self._positions[ticket] = pos
+        deal = self._record_deal(pos, DEAL_ENTRY_IN, pos['volume'], fill, 0.0, pos['comment'])
+        return self._result(TRADE_RETCODE_DONE, request, deal.ticket, ticket, pos['volume'], fill,
+                            "Request executed")
+
+    def _sltp(self, request):
+        pos = self._positions.get(request.get('position'))
+        if pos is None:
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Position not found")
+        bid, ask, _ = self._quote(pos['symbol'])
+        sl = request.get('sl', 0.0)
+        long = pos['type'] == POSITION_TYPE_BUY
+        if sl and (sl >= bid if long else sl <= ask):
+            return self._result(TRADE_RETCODE_INVALID_STOPS, request, comment="Invalid stops")
+        pos['sl'], pos['tp'] = sl, request.get('tp', pos['tp'])
+        return self._result(TRADE_RETCODE_DONE, request, comment="Request executed")
+
+    # -------------------------------
+    # MetaTrader5 API
+    # -------------------------------
+    def initialize(self, *args, **kwargs):
+        self._enter('initialize')
+        self.connected = True
+        return True
+
+    def shutdown(self):
+        self._enter('shutdown')
+        self.connected = False
+        return True
+
+    def last_error(self):
+        return self.error
+
+    def terminal_info(self):
+        if not self._enter('terminal_info'): return None
+        return TerminalInfo(connected=True, trade_allowed=True, name="Fake MT5", path="", build=0)
+
+    def account_info(self):
+        if not self._enter('account_info'): return None
+        return self._account()
+
+    def _account(self):
+        floating = round(self._floating(), 2)
+        equity = round(self.balance + floating, 2)
+        margin = self._margin()
+        return AccountInfo(
+            login=MAGIC_NUMBER, trade_allowed=True, leverage=self.leverage, balance=self.balance,
+            equity=equity, profit=floating, margin=margin, margin_free=round(equity - margin, 2),
+            margin_level=round(100 * equity / margin, 2) if margin else 0.0,
+            currency="USD", server="Fake-Server", name="Fake Account",
+        )
+
+    def symbols_total(self):
+        if not self._enter('symbols_total'): return None
+        return len(self._specs)
+
+    def symbols_get(self, group=None):
+        if not self._enter('symbols_get'): return None
+        if group is None:
+            return tuple(self._symbol_info(s) for s in self._specs)
+        # Comma-separated patterns with * wildcards; a leading ! excludes
+        patterns = [p.strip() for p in group.split(',') if p.strip()]
+        selected = []
+        for symbol in self._specs:
+            keep = False
+            for pattern in patterns:
+                if fnmatch.fnmatchcase(symbol, pattern.lstrip('!')):
+                    keep = not pattern.startswith('!')
+            if keep:
+                selected.append(self._symbol_info(symbol))
+        return tuple(selected)
+
+    def _symbol_info(self, symbol):
+        category, base, quote, digits, contract, _, _, path = self._spec(symbol)
+        bid, ask, point = self._quote(symbol)
+        return SymbolInfo(
+            name=symbol, path=f"{path}\\{symbol}", visible=True, trade_mode=SYMBOL_TRADE_MODE_FULL,
+            digits=digits, point=point, spread=_SPREAD_POINTS, time=int(self.clock()), bid=bid, ask=ask,
+            trade_contract_size=contract, volume_min=0.01, volume_max=100.0, volume_step=0.01,
+            filling_mode=SYMBOL_FILLING_IOC, currency_base=base, currency_profit=quote,
+        )
+
+    def symbol_info(self, symbol):
+        if not self._enter('symbol_info'): return None
+        return self._symbol_info(symbol) if symbol in self._specs else None
+
+    def symbol_info_tick(self, symbol):
+        if not self._enter('symbol_info_tick') or symbol not in self._specs: return None
+        bid, ask, _ = self._quote(symbol)
+        now = self.clock()
+        return Tick(time=int(now), bid=bid, ask=ask, last=0.0, volume=0, time_msc=int(now * 1000))
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        if not self._enter('copy_rates_from_pos') or symbol not in self._specs:
+            return None
+        if timeframe != TIMEFRAME_D1:
+            self.error = (RES_E_INTERNAL_FAIL, "Fake terminal only serves D1 bars")
+            return None
+        bars = self._advance(symbol)['bars']
+        end = len(bars) - start_pos
+        selected = bars[max(0, end - count):end]
+        rates = np.empty(len(selected), dtype=RATES_DTYPE)
+        for i, row in enumerate(selected):
+            rates[i] = tuple(row)
+        return rates
+
+    def positions_total(self):
+        if not self._enter('positions_total'): return None
+        return len(self._positions)
+
+    def positions_get(self, symbol=None, group=None, ticket=None):
+        if not self._enter('positions_get'): return None
+        for sym in {p['symbol'] for p in self._positions.values()}:
+            self._advance(sym)
+        result = []
+        for pos in self._positions.values():
+            if symbol is not None and pos['symbol'] != symbol: continue
+            if ticket is not None and pos['ticket'] != ticket: continue
+            price = self._close_price(pos)
+            result.append(TradePosition(
+                ticket=pos['ticket'], time=pos['time'], type=pos['type'], magic=pos['magic'],
+                identifier=pos['ticket'], volume=pos['volume'], price_open=pos['price_open'], sl=pos['sl'],
+                tp=pos['tp'], price_current=price, swap=0.0, profit=self._profit(pos, price),
+                symbol=pos['symbol'], comment=pos['comment'],
+            ))
+        return tuple(result)
+
+    def orders_get(self, symbol=None, group=None, ticket=None):
+        if not self._enter('orders_get'): return None
+        return tuple(o for o in self._orders.values()
+                     if (symbol is None or o.symbol == symbol) and (ticket is None or o.ticket == ticket))
+
+    def history_deals_get(self, date_from=None, date_to=None, group=None, ticket=None, position=None):
+        if not self._enter('history_deals_get'): return None
+        if position is not None:
+            return tuple(d for d in self._deals if d.position_id == position)
+        if ticket is not None:
+            return tuple(d for d in self._deals if d.order == ticket)
+        start, end = _timestamp(date_from), _timestamp(date_to)
+        return tuple(d for d in self._deals if start <= d.time <= end)
+
+    def order_check(self, request):
+        if not self._enter('order_check'): return None
+        account = self._account()
+        failure = self._validate(request)
+        retcode, comment = failure or (0, "Done")
+        fields = {f: request.get(f, 0) for f in TradeRequest._fields}
+        return OrderCheckResult(retcode=retcode, balance=account.balance, equity=account.equity,
+                                profit=account.profit, margin=account.margin, margin_free=account.margin_free,
+                                margin_level=account.margin_level, comment=comment,
+                                request=TradeRequest(**fields))
+
+    def order_send(self, request):
+        if not self._enter('order_send'): return None
+        result = self._order_send(request)
+        if result is not None and self.lost_reply_probability and self._rng.random() < self.lost_reply_probability:
+            self.error = (RES_E_INTERNAL_FAIL, "IPC recv failed")  # Executed, but the reply never arrived
+            return None
+        return result
+
+    def _order_send(self, request):
+        action = request.get('action')
+        if action == TRADE_ACTION_DEAL and request.get('symbol') not in self._specs:
+            self.error = (RES_E_NOT_FOUND, "Unknown symbol")
+            return None
+
+        failure = self._validate(request)
+        if failure:
+            return self._result(failure[0], request, comment=failure[1])
+        if action == TRADE_ACTION_DEAL:
+            return self._deal(request)
+        if action == TRADE_ACTION_SLTP:
+            return self._sltp(request)
+        if action == TRADE_ACTION_PENDING:
+            ticket = self._next_ticket()
+            self._orders[ticket] = TradeOrder(
+                ticket=ticket, time_setup=int(self.clock()), type=request['type'], magic=request.get('magic', 0),
+                volume_initial=request['volume'], volume_current=request['volume'],
+                price_open=request.get('price', 0.0), sl=request.get('sl', 0.0), tp=request.get('tp', 0.0),
+                symbol=request['symbol'], comment=request.get('comment', ""),
+            )
+            return self._result(TRADE_RETCODE_DONE, request, order=ticket, comment="Request executed")
+        if action == TRADE_ACTION_REMOVE:
+            if self._orders.pop(request.get('order'), None) is None:
+                return self._result(TRADE_RETCODE_INVALID, request, comment="Order not found")
+            return self._result(TRADE_RETCODE_DONE, request, order=request['order'], comment="Request executed")
+        return self._result(TRADE_RETCODE_INVALID, request, comment="Unsupported action")
+
+
+_terminal = FakeTerminal()
+
+
+def reset(**options):
+    """Replaces the default terminal (fresh account, prices and call counters)."""
+    global _terminal
+    _terminal = FakeTerminal(**options)
+    return _terminal
+
+
+def terminal():
+    return _terminal
+
+
+def __getattr__(name):
+    # Module-level API: fake_mt5.positions_get(...) -> default terminal
+    if name.startswith('_'):
+        raise AttributeError(name)
+    return getattr(_terminal, name)
@@ -0,0 +1,129 @@
+"""
+Emergency flatten engine used by the kill switch.
+
+Each pass reads the live book (positions and pending orders), fetches fresh
+ticks and filling modes for every symbol at once, then queues every close and
+every cancel to the gateway at PRIORITY_CRITICAL in one go, so they go out
+back-to-back ahead of any other terminal traffic. Anything rejected
+(requote, price off, None result) is retried with fresh prices on the next
+pass, until the account is flat or KILL_SWITCH_DEADLINE passes.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+
+from mt5_gateway import mt5, gateway, PRIORITY_CRITICAL
+
+from config import *
+from instruments import resolve_filling_type
+
+logger = logging.getLogger("MT5MasterControl")
+
+
+@dataclass
+class FlattenReport:
+    flat: bool = False
+    seconds: float = 0.0  # Time to flat, or until the deadline gave up
+    passes: int = 0
+    closed: int = 0
+    cancelled: int = 0
+    rejections: int = 0
+    remaining: list = field(default_factory=list)  # Tickets still open at the deadline
+
+    @property
+    def book_unread(self):
+        """The deadline passed before the position book could be read once: the account state is unknown."""
+        return not self.flat and self.passes == 0
+
+    def summary(self):
+        if self.flat:
+            state = "FLAT"
+        elif self.book_unread:
+            state = "NOT FLAT (position book unreadable, account may still hold positions)"
+        else:
+            state = f"NOT FLAT ({len(self.remaining)} left)"
+        return (f"{state} in {self.seconds:.2f}s: {self.closed} closed, {self.cancelled} cancelled, "
+                f"{self.rejections} rejections over {self.passes} passes")
+
+
+def _submit(name, *args):
+    return gateway.submit(name, *args, level=PRIORITY_CRITICAL)
+
+
+def _close_request(pos, tick, filling):
+    order_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.POSITION_TYPE_BUY else mt5.ORDER_TYPE_BUY
+    return {
+        "action": mt5.TRADE_ACTION_DEAL,
+        "symbol": pos.symbol,
+        "volume": pos.volume,
+        "type": order_type,
+        "position": pos.ticket,
+        "price": tick.bid if order_type == mt5.ORDER_TYPE_SELL else tick.ask,
+        "deviation": 20,
+        "magic": pos.magic,
+        "comment": "EMERGENCY KILL",
+        "type_time": mt5.ORDER_TIME_GTC,
+        "type_filling": filling,
+    }
+
+
+def flatten(deadline=KILL_SWITCH_DEADLINE, retry_delay=KILL_SWITCH_RETRY_DELAY) -> FlattenReport:
+    """Closes every position and cancels every pending order; see the module docstring."""
+    report = FlattenReport()
+    started = time.monotonic()
+    fillings = {}  # symbol -> filling type, fetched once
+
+    while True:
+        positions_future, orders_future = _submit("positions_get"), _submit("orders_get")
+        positions, orders = positions_future.result(), orders_future.result()
+        report.seconds = time.monotonic() - started
+        if positions is not None and orders is not None and not positions and not orders:
+            report.flat = True
+            return report
+        if report.seconds >= deadline:
+            report.remaining = [p.ticket for p in positions or ()] + [o.ticket for o in orders or ()]
+            return report
+        if positions is None or orders is None:
+            logger.error(f"❌ Flatten could not read the book: {mt5.last_error()}")
+            time.sleep(retry_delay)
+            continue
+
+        report.passes += 1
+        rejected = report.rejections
+        symbols = sorted({p.symbol for p in positions})
+        tick_futures = {s: _submit("symbol_info_tick", s) for s in symbols}
+        info_futures = {s: _submit("symbol_info", s) for s in symbols if s not in fillings}
+        for symbol, future in info_futures.items():
+            info = future.result()
+            if info is not None:
+                fillings[symbol] = resolve_filling_type(info.filling_mode)
+        ticks = {s: f.result() for s, f in tick_futures.items()}
+
+        # Every close and cancel of the pass is queued before waiting on any of them
+        sends = []
+        for pos in positions:
+            tick = ticks.get(pos.symbol)
+            if tick is None or pos.symbol not in fillings:
+                logger.error(f"❌ No tick/symbol info for {pos.symbol}; retrying next pass")
+                report.rejections += 1
+                continue
+            request = _close_request(pos, tick, fillings[pos.symbol])
+            sends.append(("close", pos.symbol, _submit("order_send", request)))
+        for order in orders:
+            request = {"action": mt5.TRADE_ACTION_REMOVE, "order": order.ticket}
+            sends.append(("cancel", order.symbol, _submit("order_send", request)))
+
+        for kind, symbol, future in sends:
+            result = future.result()
+            if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
+                if kind == "close":
+                    report.closed += 1
+                else:
+                    report.cancelled += 1
+                continue
+            report.rejections += 1
+            reason = f"{result.comment} (retcode: {result.retcode})" if result is not None else mt5.last_error()
+            logger.warning(f"⚠️ Flatten {kind} rejected for {symbol}: {reason}")
+
+        if report.rejections > rejected:
+            time.sleep(retry_delay)
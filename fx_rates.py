@@ -0,0 +1,128 @@
+"""
+Currency conversion matrix for lot sizing.
+
+Risk is set in account currency (USD) but a stop distance is worth
+price_dist * contract_size in the instrument's quote currency. The matrix
+holds a rate between every pair of currencies the watchlist trades in. It is
+built from one batch of ticks per cycle: the {CCY}USD / USD{CCY} legs plus
+every watchlist forex pair. A currency with no USD leg is priced through a
+quoted cross (e.g. SEK via EURSEK and EURUSD); cross rates between two
+non-USD currencies are triangulated through USD.
+
+Rates use the bid, as the per-trade conversion did: {CCY}USD bid, or
+1 / USD{CCY} bid.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Mapping
+
+from mt5_gateway import gateway
+
+from config import CONVERSION_RATES_MAX_AGE
+from instruments import get_instrument, get_watchlist_sector
+from prop_watchlist import WATCHLIST
+
+logger = logging.getLogger("MT5MasterControl")
+
+
+@dataclass(frozen=True)
+class RateMatrix:
+    created: float
+    usd: Mapping[str, float] = field(repr=False)  # currency -> USD per unit
+    pairs: Mapping[tuple, float] = field(repr=False)  # (base, quote) -> quoted bid
+
+    @property
+    def currencies(self):
+        return tuple(sorted(self.usd))
+
+    def rate(self, from_ccy, to_ccy="USD"):
+        """Units of `to_ccy` per unit of `from_ccy`; None if either side has no price."""
+        if not from_ccy or from_ccy == to_ccy:
+            return 1.0
+        direct = self.pairs.get((from_ccy, to_ccy))
+        if direct:
+            return direct
+        inverse = self.pairs.get((to_ccy, from_ccy))
+        if inverse:
+            return 1.0 / inverse
+        from_usd, to_usd = self.usd.get(from_ccy), self.usd.get(to_ccy)
+        if from_usd is None or to_usd is None:
+            return None
+        return from_usd / to_usd
+
+    def to_usd(self, currency):
+        return self.rate(currency, "USD")
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+
+def _legs(currencies):
+    """Symbols whose ticks make up the matrix: USD legs plus watchlist forex pairs."""
+    pairs = {}
+    for ccy in currencies - {"USD"}:
+        for symbol in (f"{ccy}USD", f"USD{ccy}"):
+            instrument = get_instrument(symbol)
+            if instrument is not None:
+                pairs[symbol] = (instrument.base, instrument.quote)
+    for symbol in WATCHLIST:
+        instrument = get_instrument(symbol)
+        if instrument is not None and instrument.category == "FOREX" and \
+                {instrument.base, instrument.quote} <= currencies:
+            pairs[symbol] = (instrument.base, instrument.quote)
+    return pairs
+
+
+def watchlist_currencies():
+    currencies = {"USD"}
+    for symbol in WATCHLIST:
+        instrument = get_instrument(symbol)
+        if instrument is None: continue
+        if instrument.quote: currencies.add(instrument.quote)
+        if get_watchlist_sector(symbol) == "FOREX" or instrument.category == "FOREX":
+            currencies.add(instrument.base)
+    return currencies
+
+
+def build_rate_matrix(currencies=None) -> RateMatrix:
+    currencies = set(currencies or watchlist_currencies()) | {"USD"}
+    legs = _legs(currencies)
+    futures = {symbol: gateway.submit("symbol_info_tick", symbol) for symbol in legs}
+
+    pairs = {}
+    for symbol, future in futures.items():
+        tick = future.result()
+        if tick is not None and tick.bid > 0:
+            pairs[legs[symbol]] = tick.bid
+
+    usd = {"USD": 1.0}
+    for (base, quote), bid in pairs.items():
+        if quote == "USD": usd.setdefault(base, bid)
+        elif base == "USD": usd.setdefault(quote, 1.0 / bid)
+    # Currencies without a USD leg: one hop through any quoted cross
+    for (base, quote), bid in pairs.items():
+        if base not in usd and quote in usd:
+            usd[base] = bid * usd[quote]
+        elif quote not in usd and base in usd:
+            usd[quote] = usd[base] / bid
+
+    missing = currencies - set(usd)
+    if missing:
+        logger.warning(f"⚠️ No conversion rate for {', '.join(sorted(missing))}")
+    return RateMatrix(time.monotonic(), usd, pairs)
+
+
+_MATRIX = {"value": None}
+_MATRIX_LOCK = threading.Lock()
+
+
+def get_rate_matrix(max_age=CONVERSION_RATES_MAX_AGE) -> RateMatrix:
+    """The current cycle's matrix; rebuilt from fresh ticks once it is older than `max_age`."""
+    with _MATRIX_LOCK:
+        matrix = _MATRIX["value"]
+        if matrix is None or matrix.age() > max_age:
+            matrix = build_rate_matrix()
+            _MATRIX["value"] = matrix
+        return matrix
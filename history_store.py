@@ -0,0 +1,145 @@
+"""
+Local on-disk OHLCV history, one fixed-width column file per field.
+
+Layout: <HISTORY_STORE_DIR>/<SYMBOL>/<timeframe>/<field>.bin
+Columns are raw little-endian arrays, appended incrementally and opened
+with np.memmap: load_columns() is zero-copy, and load_rates(count=N) reads
+only the last N rows, so a warm start does not grow with history length.
+Does not import MetaTrader5, so offline tooling can read it on any platform.
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import HISTORY_STORE_DIR
+
+logger = logging.getLogger("MT5MasterControl")
+
+# Same layout as the structured array returned by mt5.copy_rates_*
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+
+
+def _series_dir(symbol, timeframe) -> Path:
+    return Path(HISTORY_STORE_DIR) / symbol / str(timeframe)
+
+
+def _column_path(symbol, timeframe, field) -> Path:
+    return _series_dir(symbol, timeframe) / f"{field}.bin"
+
+
+def _stored_length(symbol, timeframe) -> int:
+    """Rows present in every column (guards against a half-written append)."""
+    lengths = []
+    for field in RATES_DTYPE.names:
+        path = _column_path(symbol, timeframe, field)
+        if not path.exists():
+            return 0
+        lengths.append(path.stat().st_size // RATES_DTYPE[field].itemsize)
+    return min(lengths)
+
+
+def load_columns(symbol, timeframe):
+    """
+    Returns {field: read-only np.memmap} for a stored series, or None.
+    Nothing is read from disk until the arrays are touched.
+    """
+    rows = _stored_length(symbol, timeframe)
+    if rows == 0:
+        return None
+    return {
+        field: np.memmap(_column_path(symbol, timeframe, field), dtype=RATES_DTYPE[field],
+                         mode='r', shape=(rows,))
+        for field in RATES_DTYPE.names
+    }
+
+
+def load_rates(symbol, timeframe, count=None):
+    """
+    Returns the stored series, or only its last `count` bars, as an
+    MT5-style structured array (None if nothing is stored). Only the
+    returned rows are read from disk.
+    """
+    columns = load_columns(symbol, timeframe)
+    if columns is None:
+        return None
+    rows = len(columns['time'])
+    start = 0 if count is None else max(0, rows - count)
+    rates = np.empty(rows - start, dtype=RATES_DTYPE)
+    for field, column in columns.items():
+        rates[field] = column[start:]
+    return rates
+
+
+def load_frame(symbol, timeframe) -> pd.DataFrame:
+    """Stored series as a DataFrame shaped like data_provider.get_data output."""
+    rates = load_rates(symbol, timeframe)
+    if rates is None:
+        return pd.DataFrame()
+    df = pd.DataFrame(rates)
+    df['timestamp'] = pd.to_datetime(df['time'], unit='s')
+    return df
+
+
+def last_time(symbol, timeframe):
+    """Open time of the newest stored bar, or None."""
+    rows = _stored_length(symbol, timeframe)
+    if rows == 0:
+        return None
+    column = np.memmap(_column_path(symbol, timeframe, 'time'), dtype=RATES_DTYPE['time'],
+                       mode='r', shape=(rows,))
+    return int(column[-1])
+
+
+def append_rates(symbol, timeframe, rates):
+    """
+    Appends bars to the stored series. Stored bars at or after the first new
+    bar (e.g. the previously forming bar) are overwritten, so callers can pass
+    any overlapping tail straight from MT5.
+    """
+    if rates is None or len(rates) == 0:
+        return
+
+    rows = _stored_length(symbol, timeframe)
+    keep = 0
+    if rows:
+        times = np.memmap(_column_path(symbol, timeframe, 'time'), dtype=RATES_DTYPE['time'],
+                          mode='r', shape=(rows,))
+        keep = int(np.searchsorted(times, rates['time'][0], side='left'))
+        del times
+    _write(symbol, timeframe, rates, keep)
+
+
+def replace_rates(symbol, timeframe, rates):
+    """Replaces the stored series with `rates` (for new bars that do not join up with the stored ones)."""
+    if rates is None or len(rates) == 0:
+        return
+    _write(symbol, timeframe, rates, 0)
+
+
+def _write(symbol, timeframe, rates, keep):
+    """Cuts every column to `keep` rows and appends `rates`."""
+    _series_dir(symbol, timeframe).mkdir(parents=True, exist_ok=True)
+    # 'time' is written last so a torn append is cut off by _stored_length
+    for field in RATES_DTYPE.names[1:] + ('time',):
+        dtype = RATES_DTYPE[field]
+        path = _column_path(symbol, timeframe, field)
+        with open(path, 'ab') as f:
+            f.truncate(keep * dtype.itemsize)
+            f.write(np.ascontiguousarray(rates[field], dtype=dtype).tobytes())
+
+
+def list_series():
+    """All (symbol, timeframe) pairs present in the store."""
+    root = Path(HISTORY_STORE_DIR)
+    if not root.exists():
+        return []
+    return [
+        (symbol_dir.name, int(tf_dir.name))
+        for symbol_dir in sorted(root.iterdir()) if symbol_dir.is_dir()
+        for tf_dir in sorted(symbol_dir.iterdir()) if tf_dir.is_dir() and tf_dir.name.isdigit()
+    ]
@@ -0,0 +1,578 @@
+"""
+Vectorised indicator kernel: Wilder RSI, MACD and ATR for a whole universe
+in one pass over a symbols x bars float64 matrix.
+
+Formulas reproduce pandas_ta_classic (non-TA-Lib path) exactly:
+  rma  = SMA seed of the first `length` values, then ewm(alpha=1/length, adjust=False)
+  ema  = SMA seed of the first `length` values, then ewm(span=length, adjust=False)
+  macd = ema(fast) - ema(slow), signal = ema(macd, signal), hist = macd - signal
+Rows are right-aligned; shorter histories are NaN-padded on the left and
+produce the same values they would on their own.
+"""
+import json
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import numpy as np
+
+from config import INDICATOR_STATE_PATH, STREAM_SEED_BARS
+
+logger = logging.getLogger("MT5MasterControl")
+
+
+def to_matrix(series_list):
+    """Right-aligns 1-D arrays of different lengths into an N x T float64 matrix."""
+    width = max((len(s) for s in series_list), default=0)
+    matrix = np.full((len(series_list), width), np.nan)
+    for row, series in enumerate(series_list):
+        if len(series):
+            matrix[row, width - len(series):] = series
+    return matrix
+
+
+def _first_valid(x):
+    """Column of the first non-NaN value per row (x.shape[1] if none)."""
+    if x.shape[1] == 0:
+        return np.zeros(x.shape[0], dtype=np.int64)
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), x.shape[1])
+
+
+def _seeded_ewm(x, length, alpha):
+    """EWM (adjust=False) seeded with the SMA of each row's first `length` valid values."""
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    out = np.full(x.shape, np.nan)
+    first = _first_valid(x)
+    seed_at = first + length - 1
+    seeds = np.array([
+        x[r, first[r]:seed_at[r] + 1].mean() if seed_at[r] < x.shape[1] else np.nan
+        for r in range(x.shape[0])
+    ])
+    y = np.full(x.shape[0], np.nan)
+    for j in range(x.shape[1]):
+        seeding = seed_at == j
+        y[seeding] = seeds[seeding]
+        rolling = (seed_at < j) & ~np.isnan(x[:, j])
+        y[rolling] = alpha * x[rolling, j] + (1.0 - alpha) * y[rolling]
+        out[:, j] = y
+    return out
+
+
+def rma(x, length):
+    """Wilder's moving average (pandas_ta_classic: SMA-seeded, alpha = 1/length)."""
+    return _seeded_ewm(x, length, 1.0 / length)
+
+
+def _rma_states(x, length):
+    """One RmaState per row, as if every valid value of the row had been fed to update()."""
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    last = rma(x, length)[:, -1] if x.shape[1] else np.full(x.shape[0], np.nan)
+    first = _first_valid(x)
+    return [
+        RmaState(length, float(last[r]), [float(v) for v in x[r, first[r]:first[r] + length]])
+        for r in range(x.shape[0])
+    ]
+
+
+def ema(x, length):
+    """EMA seeded with the SMA of each row's first `length` valid values."""
+    return _seeded_ewm(x, length, 2.0 / (length + 1.0))
+
+
+def _gains_losses(close):
+    change = np.full(close.shape, np.nan)
+    change[:, 1:] = close[:, 1:] - close[:, :-1]
+    gains = np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0))
+    losses = np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0))
+    return gains, losses
+
+
+def rsi(close, length=14):
+    """Relative Strength Index (pandas_ta RSI_<length>)."""
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    gains, losses = _gains_losses(close)
+    avg_gain = rma(gains, length)
+    avg_loss = rma(losses, length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * avg_gain / (avg_gain + avg_loss)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Returns (macd, histogram, signal) like pandas_ta MACD_/MACDh_/MACDs_ columns."""
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, line - signal_line, signal_line
+
+
+def true_range(high, low, close):
+    high = np.atleast_2d(np.asarray(high, dtype=np.float64))
+    low = np.atleast_2d(np.asarray(low, dtype=np.float64))
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+
+    high_low = high - low
+    # pandas_ta non_zero_range: nudges the whole series if any range is zero
+    has_zero = (high_low == 0).any(axis=1)
+    high_low[has_zero] += np.finfo(float).eps
+
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+    ranges = np.stack([np.abs(high_low), np.abs(high - prev_close), np.abs(prev_close - low)])
+    with np.errstate(invalid='ignore'):
+        tr = np.fmax(np.fmax(ranges[0], ranges[1]), ranges[2])
+    if tr.shape[1]:
+        tr[np.arange(tr.shape[0]), np.minimum(_first_valid(close), tr.shape[1] - 1)] = np.nan
+    return tr
+
+
+def atr(high, low, close, length=14):
+    """Average True Range (pandas_ta ATRr_<length>, RMA smoothing)."""
+    return rma(true_range(high, low, close), length)
+
+
+@dataclass(frozen=True)
+class IndicatorSet:
+    """RSI(14), MACD(12,26,9) and ATR(14) for a universe, one matrix row per symbol."""
+    symbols: tuple
+    lengths: np.ndarray
+    close: np.ndarray
+    rsi: np.ndarray
+    macd: np.ndarray
+    macd_hist: np.ndarray
+    macd_signal: np.ndarray
+    atr: np.ndarray
+
+    def row(self, symbol):
+        return self.symbols.index(symbol)
+
+    def series(self, name, symbol):
+        """Un-padded indicator history for one symbol (oldest first)."""
+        row = self.row(symbol)
+        return getattr(self, name)[row, self.close.shape[1] - self.lengths[row]:]
+
+    def frame_columns(self, symbol):
+        """pandas_ta-named columns for one symbol, ready to assign onto its DataFrame."""
+        return {
+            'RSI_14': self.series('rsi', symbol),
+            'MACD_12_26_9': self.series('macd', symbol),
+            'MACDh_12_26_9': self.series('macd_hist', symbol),
+            'MACDs_12_26_9': self.series('macd_signal', symbol),
+            'ATRr_14': self.series('atr', symbol),
+        }
+
+
+def compute_indicators(rates_by_symbol):
+    """
+    Computes every indicator for every symbol in one vectorised pass.
+    `rates_by_symbol` maps symbol -> MT5 rates array (or any object with
+    'high', 'low' and 'close' columns).
+    """
+    symbols = tuple(rates_by_symbol)
+    columns = [rates_by_symbol[s] for s in symbols]
+    close = to_matrix([np.asarray(r['close'], dtype=np.float64) for r in columns])
+    high = to_matrix([np.asarray(r['high'], dtype=np.float64) for r in columns])
+    low = to_matrix([np.asarray(r['low'], dtype=np.float64) for r in columns])
+    line, hist, signal = macd(close)
+    return IndicatorSet(
+        symbols=symbols,
+        lengths=np.array([len(r['close']) for r in columns], dtype=np.int64),
+        close=close,
+        rsi=rsi(close),
+        macd=line,
+        macd_hist=hist,
+        macd_signal=signal,
+        atr=atr(high, low, close),
+    )
+
+
+# -------------------------------
+# Streaming (O(1) per bar) State
+# -------------------------------
+# Same recurrences as the matrix kernel, advanced one bar at a time. Each
+# state has update(x) for a closed bar and peek(x) for the still-forming bar,
+# which never mutates the state, so revising the forming bar is free.
+
+@dataclass
+class EmaState:
+    length: int
+    value: float = np.nan
+    seed: list = None
+
+    def __post_init__(self):
+        if self.seed is None:
+            self.seed = []
+
+    @property
+    def alpha(self):
+        return 2.0 / (self.length + 1.0)
+
+    def _next(self, x):
+        if len(self.seed) < self.length:
+            seed = self.seed + [x]
+            return (float(np.mean(seed)) if len(seed) == self.length else np.nan), seed
+        return self.alpha * x + (1.0 - self.alpha) * self.value, self.seed
+
+    def peek(self, x):
+        return self._next(x)[0]
+
+    def update(self, x):
+        self.value, self.seed = self._next(x)
+        return self.value
+
+
+@dataclass
+class RmaState(EmaState):
+    """Wilder smoothing: the same SMA seed, then alpha = 1/length."""
+
+    @property
+    def alpha(self):
+        return 1.0 / self.length
+
+
+@dataclass
+class RsiState:
+    length: int = 14
+    prev_close: float = np.nan
+    gain: RmaState = None
+    loss: RmaState = None
+
+    def __post_init__(self):
+        self.gain = self.gain or RmaState(self.length)
+        self.loss = self.loss or RmaState(self.length)
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        total = avg_gain + avg_loss
+        return 100.0 * avg_gain / total if total else np.nan
+
+    def peek(self, close):
+        if np.isnan(self.prev_close):
+            return np.nan
+        change = close - self.prev_close
+        return self._rsi(self.gain.peek(max(change, 0.0)), self.loss.peek(max(-change, 0.0)))
+
+    def update(self, close):
+        if not np.isnan(self.prev_close):
+            change = close - self.prev_close
+            self.gain.update(max(change, 0.0))
+            self.loss.update(max(-change, 0.0))
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self):
+        return self._rsi(self.gain.value, self.loss.value)
+
+
+@dataclass
+class MacdState:
+    fast: EmaState = None
+    slow: EmaState = None
+    signal: EmaState = None
+
+    def __post_init__(self):
+        self.fast = self.fast or EmaState(12)
+        self.slow = self.slow or EmaState(26)
+        self.signal = self.signal or EmaState(9)
+
+    def peek(self, close):
+        """Returns (macd, histogram, signal) as if `close` closed the next bar."""
+        line = self.fast.peek(close) - self.slow.peek(close)
+        signal = self.signal.peek(line) if not np.isnan(line) else np.nan
+        return line, line - signal, signal
+
+    def update(self, close):
+        line = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(line) if not np.isnan(line) else np.nan
+        return line, line - signal, signal
+
+
+@dataclass
+class AtrState:
+    """ATR with RMA smoothing. Unlike the batch kernel it skips pandas_ta's
+    epsilon nudge for zero-range bars (a ~1e-16 difference)."""
+    length: int = 14
+    prev_close: float = np.nan
+    tr: RmaState = None
+
+    def __post_init__(self):
+        self.tr = self.tr or RmaState(self.length)
+
+    def _true_range(self, high, low):
+        return max(high - low, abs(high - self.prev_close), abs(self.prev_close - low))
+
+    def peek(self, high, low, close):
+        if np.isnan(self.prev_close):
+            return np.nan
+        return self.tr.peek(self._true_range(high, low))
+
+    def update(self, high, low, close):
+        if not np.isnan(self.prev_close):
+            self.tr.update(self._true_range(high, low))
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self):
+        return self.tr.value
+
+
+def _state_from_dict(cls, data):
+    nested = {'gain': RmaState, 'loss': RmaState, 'tr': RmaState,
+              'fast': EmaState, 'slow': EmaState, 'signal': EmaState}
+    kwargs = {k: (nested[k](**v) if k in nested and isinstance(v, dict) else v) for k, v in data.items()}
+    return cls(**kwargs)
+
+
+@dataclass
+class SymbolStream:
+    """
+    RSI(14) and ATR(14) of one symbol's D1 series. Closed bars advance the
+    state; the forming bar is only peeked at, so a resync is O(new bars).
+    """
+    last_closed_time: int = None
+    rsi_state: RsiState = None
+    atr_state: AtrState = None
+    rsi: float = np.nan
+    prev_rsi: float = np.nan
+    atr: float = np.nan
+
+    def __post_init__(self):
+        self.rsi_state = self.rsi_state or RsiState(14)
+        self.atr_state = self.atr_state or AtrState(14)
+
+    def seed(self, rates):
+        # A fixed depth: the RMA seed must not depend on which caller got here first
+        rates = rates[-STREAM_SEED_BARS:]
+        self.last_closed_time = None
+        self.rsi_state, self.atr_state = RsiState(14), AtrState(14)
+        self._advance(rates[:-1])
+        self._peek_forming(rates[-1])
+
+    def sync(self, rates):
+        """Brings the state up to date with `rates` (oldest first, last bar forming)."""
+        if len(rates) == 0:
+            return
+        times = rates['time']
+        closed = rates[:-1]
+        if (self.last_closed_time is None or times[-1] <= self.last_closed_time
+                or (len(closed) and times[0] > self.last_closed_time)):
+            # First sight, clock went backwards, or a gap wider than `rates`
+            self.seed(rates)
+            return
+        self._advance(closed[closed['time'] > self.last_closed_time])
+        self._peek_forming(rates[-1])
+
+    def _advance(self, bars):
+        for bar in bars:
+            self.rsi_state.update(float(bar['close']))
+            self.atr_state.update(float(bar['high']), float(bar['low']), float(bar['close']))
+            self.last_closed_time = int(bar['time'])
+
+    def _peek_forming(self, bar):
+        self.prev_rsi = self.rsi_state.value
+        self.rsi = self.rsi_state.peek(float(bar['close']))
+        self.atr = self.atr_state.peek(float(bar['high']), float(bar['low']), float(bar['close']))
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data['rsi_state'] = _state_from_dict(RsiState, data['rsi_state'])
+        data['atr_state'] = _state_from_dict(AtrState, data['atr_state'])
+        return cls(**data)
+
+
+_STREAMS = {}
+_STATE_VERSION = 2  # Bumped when the saved recurrences change shape
+_STREAMS_LOCK = threading.Lock()
+_STREAMS_LOADED = {"value": False}
+
+
+def _load_streams_locked():
+    if _STREAMS_LOADED["value"]:
+        return
+    _STREAMS_LOADED["value"] = True
+    path = Path(INDICATOR_STATE_PATH)
+    if not path.exists():
+        return
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != _STATE_VERSION:
+            logger.info(f"♻️ Indicator state in {path} is from an older format; streams will reseed")
+            return
+        _STREAMS.update({symbol: SymbolStream.from_dict(state) for symbol, state in data['streams'].items()})
+    except Exception as e:
+        logger.error(f"❌ Could not load indicator state from {path}: {e}")
+
+
+def sync_stream(symbol, rates):
+    """
+    Advances the symbol's stream to `rates` and returns (rsi, prev_rsi, atr)
+    for the forming bar and the last closed bar.
+    """
+    with _STREAMS_LOCK:
+        stream = _synced_stream_locked(symbol, rates)
+        return stream.rsi, stream.prev_rsi, stream.atr
+
+
+def closed_atr(symbol, rates):
+    """Advances the symbol's stream to `rates` and returns the ATR as of the last closed bar."""
+    with _STREAMS_LOCK:
+        return _synced_stream_locked(symbol, rates).atr_state.value
+
+
+def _synced_stream_locked(symbol, rates):
+    _load_streams_locked()
+    stream = _STREAMS.get(symbol)
+    if stream is None:
+        stream = _STREAMS[symbol] = SymbolStream()
+    stream.sync(rates)
+    return stream
+
+
+def prune_streams(keep_symbols):
+    """Drops state for symbols no longer held."""
+    with _STREAMS_LOCK:
+        for symbol in [s for s in _STREAMS if s not in keep_symbols]:
+            del _STREAMS[symbol]
+
+
+def rsi_states(close, length=14):
+    """One RsiState per row, as if every value of the row had been fed to update()."""
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    gains, losses = _gains_losses(close)
+    gain_states = _rma_states(gains, length)
+    loss_states = _rma_states(losses, length)
+    return [
+        RsiState(length, prev_close=float(close[r, -1]) if close.shape[1] else np.nan,
+                 gain=gain_states[r], loss=loss_states[r])
+        for r in range(close.shape[0])
+    ]
+
+
+# -------------------------------
+# Weekly RSI Without Resampling
+# -------------------------------
+def week_ids(times):
+    """
+    W-FRI week bucket of each bar (Saturday..Friday), from epoch seconds.
+    Unix day 0 is a Thursday, so shifting by two days aligns weeks to Saturday.
+    """
+    return (np.asarray(times, dtype=np.int64) // 86400 - 2) // 7
+
+
+def weekly_closes(times, close):
+    """Last close of each week, matching resample('W-FRI').last().dropna()."""
+    ids = week_ids(times)
+    last_of_week = np.append(np.flatnonzero(np.diff(ids)), len(ids) - 1) if len(ids) else np.array([], dtype=int)
+    return ids[last_of_week], np.asarray(close, dtype=np.float64)[last_of_week]
+
+
+# symbol -> (window start time, current week id, RsiState after the completed weeks)
+_WEEKLY_CACHE = {}
+_WEEKLY_LOCK = threading.Lock()
+
+
+def weekly_rsi(rates_by_symbol, length=14):
+    """
+    {symbol: (previous_week_rsi, current_week_rsi)} for every symbol with at
+    least two weeks of bars. Completed weeks are folded into a cached RsiState
+    (computed for all changed symbols in one array pass); while the window
+    start and the current week are unchanged, only the forming week's close
+    is re-evaluated.
+    """
+    result, stale = {}, {}
+    with _WEEKLY_LOCK:
+        for symbol, rates in rates_by_symbol.items():
+            if len(rates) == 0: continue
+            key = (int(rates['time'][0]), int(week_ids(rates['time'][-1:])[0]))
+            cached = _WEEKLY_CACHE.get(symbol)
+            if cached is not None and cached[:2] == key:
+                state = cached[2]
+                result[symbol] = (state.value, state.peek(float(rates['close'][-1])))
+            else:
+                stale[symbol] = key
+
+    if stale:
+        completed = {}
+        for symbol in stale:
+            rates = rates_by_symbol[symbol]
+            _, closes = weekly_closes(rates['time'], rates['close'])
+            if len(closes) >= 2:
+                completed[symbol] = closes[:-1]
+        states = rsi_states(to_matrix(list(completed.values())), length) if completed else []
+        with _WEEKLY_LOCK:
+            for symbol, state in zip(completed, states):
+                _WEEKLY_CACHE[symbol] = stale[symbol] + (state,)
+                result[symbol] = (state.value, state.peek(float(rates_by_symbol[symbol]['close'][-1])))
+
+    return result
+
+
+def weekly_rsi_series(times, close, length=14):
+    """
+    Per-bar (previous_week_rsi, current_week_rsi) arrays for a whole history:
+    what weekly_rsi would report at each bar, with the completed weeks folded
+    in and the bar's own close standing in for the forming week.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    close = np.asarray(close, dtype=np.float64)
+    _, closes = weekly_closes(times, close)
+    ids = week_ids(times)
+    week_of_bar = np.concatenate(([0], np.cumsum(np.diff(ids) != 0))).astype(int) if len(ids) else ids
+
+    # RsiState after weekly closes 0..k-1, for every week k
+    n_weeks = len(closes)
+    gain, loss, gain_seed, loss_seed = (np.full(n_weeks, np.nan) for _ in range(4))
+    obs = np.zeros(n_weeks, dtype=np.int64)
+    prev_close = np.full(n_weeks, np.nan)
+    state = RsiState(length)
+    for week in range(1, n_weeks):
+        state.update(closes[week - 1])
+        gain[week], loss[week] = state.gain.value, state.loss.value
+        gain_seed[week], loss_seed[week] = sum(state.gain.seed), sum(state.loss.seed)
+        obs[week], prev_close[week] = len(state.gain.seed), closes[week - 1]
+
+    def _rsi(avg_gain, avg_loss):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            total = avg_gain + avg_loss
+            out = 100.0 * avg_gain / total
+        out[total == 0] = np.nan
+        return out
+
+    def _peek(value, seed_sum, seen, x):
+        # RmaState.peek for every bar at once (`seen` counts seed values, capped at length)
+        alpha = 1.0 / length
+        with np.errstate(invalid='ignore'):
+            rolled = alpha * x + (1.0 - alpha) * value
+        out = np.where(seen + 1 == length, (seed_sum + x) / length, rolled)
+        out[seen + 1 < length] = np.nan
+        return out
+
+    k = week_of_bar
+    prev = _rsi(gain[k], loss[k])
+    change = close - prev_close[k]
+    curr = _rsi(_peek(gain[k], gain_seed[k], obs[k], np.maximum(change, 0.0)),
+                _peek(loss[k], loss_seed[k], obs[k], np.maximum(-change, 0.0)))
+    # Weekly RSI needs at least one completed week before the bar's own
+    prev[k < 1] = np.nan
+    curr[k < 1] = np.nan
+    return prev, curr
+
+
+def save_streams():
+    """Persists every stream so a restart resumes without reseeding."""
+    with _STREAMS_LOCK:
+        data = {'version': _STATE_VERSION,
+                'streams': {symbol: stream.to_dict() for symbol, stream in _STREAMS.items()}}
+    try:
+        with open(INDICATOR_STATE_PATH, 'w') as f:
+            json.dump(data, f)
+    except Exception as e:
+        logger.error(f"❌ Could not save indicator state: {e}")
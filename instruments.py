@@ -0,0 +1,167 @@
+"""
+Instrument index: per-symbol category, currencies and trading specs,
+built once from the watchlist plus the broker symbol list so that hot scan
+loops do a dict lookup instead of classifying symbols on every call.
+
+The terminal is only touched when the index is built, so the classifiers
+import without MetaTrader5 (backtest.py runs offline).
+"""
+import logging
+import re
+import threading
+from dataclasses import dataclass
+
+from config import CATEGORY_MAP
+from prop_watchlist import WATCHLIST_SECTORS
+
+logger = logging.getLogger("MT5MasterControl")
+
+_FOREX_PAIR_RE = re.compile(r'^([A-Z]{3})([A-Z]{3})')
+
+
+@dataclass(frozen=True)
+class Instrument:
+    symbol: str
+    category: str
+    base: str
+    quote: str
+    digits: int
+    pip_unit: float
+    contract_size: float
+    volume_step: float
+    volume_min: float
+    volume_max: float
+    filling_type: int
+
+
+_INDEX = {}  # symbol -> Instrument
+_INDEX_LOCK = threading.Lock()
+_FINGERPRINT = {"value": None}
+
+
+def _watchlist_sectors():
+    return {ticker: sector.upper() for sector, tickers in WATCHLIST_SECTORS.items() for ticker in tickers}
+
+
+_WATCHLIST_SECTOR = _watchlist_sectors()
+
+
+def resolve_filling_type(filling_mode):
+    """Maps a symbol's filling_mode flags to the order filling type we send."""
+    from mt5_gateway import mt5
+
+    if filling_mode & 1:
+        return mt5.ORDER_FILLING_FOK
+    if filling_mode & 2:
+        return mt5.ORDER_FILLING_IOC
+    return mt5.ORDER_FILLING_RETURN
+
+
+def classify_category(symbol, info, sector=None):
+    """Category from the config map, then the MT5 path, then the watchlist sector."""
+    for key, category in CATEGORY_MAP.items():
+        if key in symbol:
+            return category
+
+    if info:
+        path = info.path.upper()
+        if "FOREX" in path: return "FOREX"
+        if "STOCK" in path or "EQUITY" in path: return "STOCKS"
+        if "INDEX" in path or "INDICES" in path: return "INDICES"
+        if "COMMODITY" in path or "OIL" in path or "ENERGY" in path: return "COMMODITIES"
+        if "CRYPTO" in path: return "CRYPTO"
+    return sector or "FOREX"
+
+
+def split_base_quote(symbol, info, category):
+    """Base and quote currencies, handling suffixes and different lengths."""
+    if info is None:
+        # Fallback for 6-char forex pairs if info not available
+        if len(symbol) >= 6:
+            return symbol[:3], symbol[3:6]
+        return symbol, ""
+
+    if getattr(info, 'currency_base', None):
+        return info.currency_base, info.currency_profit
+
+    # Fallback to standard Forex logic for 6-char pairs if currency info is missing
+    if len(symbol) >= 6 and category == "FOREX":
+        # Handle suffixes like EURUSD.pro by taking first 6 alpha chars if possible
+        match = _FOREX_PAIR_RE.match(symbol.upper())
+        if match:
+            return match.group(1), match.group(2)
+        return symbol[:3], symbol[3:6]
+
+    # For non-forex, base is usually the symbol itself or currency_base if it exists
+    return symbol, getattr(info, 'currency_profit', "")
+
+
+def _build_instrument(info, sector):
+    category = classify_category(info.name, info, sector)
+    base, quote = split_base_quote(info.name, info, category)
+    return Instrument(
+        symbol=info.name, category=category, base=base, quote=quote,
+        digits=info.digits, pip_unit=10 ** - (info.digits - 1),
+        contract_size=info.trade_contract_size, volume_step=info.volume_step,
+        volume_min=info.volume_min, volume_max=info.volume_max,
+        filling_type=resolve_filling_type(info.filling_mode),
+    )
+
+
+def build_instrument_index():
+    """Rebuilds the index from one mt5.symbols_get() call plus the watchlist."""
+    from mt5_gateway import mt5
+
+    symbols = mt5.symbols_get()
+    if symbols is None:
+        # Fingerprint left as it was: the next lookup or refresh retries the build
+        logger.error(f"❌ Instrument index build failed: {mt5.last_error()}")
+        return False
+
+    sectors = _watchlist_sectors()
+    index = {info.name: _build_instrument(info, sectors.get(info.name)) for info in symbols}
+
+    missing = [t for t in sectors if t not in index]
+    if missing:
+        logger.warning(f"⚠️ {len(missing)} watchlist symbols unknown to broker: {', '.join(missing[:10])}")
+
+    with _INDEX_LOCK:
+        _INDEX.clear()
+        _INDEX.update(index)
+        _FINGERPRINT["value"] = (len(symbols), tuple(sectors.items()),
+                                 tuple(sorted(t for t in sectors if t in index)))
+    logger.info(f"🗂️ Instrument index built: {len(index)} symbols")
+    return True
+
+
+def _fingerprint(sectors):
+    """
+    (broker symbol count, watchlist, watchlist symbols the broker lists). The
+    names catch a swap that leaves the count unchanged (e.g. EURUSD renamed
+    to EURUSD.r) without pulling every symbol's specs.
+    """
+    from mt5_gateway import mt5
+
+    listed = mt5.symbols_get(group=",".join(sectors))
+    names = tuple(sorted(info.name for info in listed)) if listed is not None else None
+    return mt5.symbols_total(), tuple(sectors.items()), names
+
+
+def refresh_instrument_index():
+    """Rebuilds the index only if the watchlist or the broker's symbols changed."""
+    fingerprint = _fingerprint(_watchlist_sectors())
+    if fingerprint != _FINGERPRINT["value"]:
+        return build_instrument_index()
+    return True
+
+
+def get_instrument(symbol):
+    """Constant-time lookup; builds the index on first use. None if unknown."""
+    if _FINGERPRINT["value"] is None:
+        build_instrument_index()
+    return _INDEX.get(symbol)
+
+
+def get_watchlist_sector(symbol):
+    """Watchlist sector (upper-case, e.g. 'FOREX') for a symbol, or None."""
+    return _WATCHLIST_SECTOR.get(symbol)
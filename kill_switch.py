@@ -1,8 +1,11 @@
-import MetaTrader5 as mt5
+from mt5_gateway import with_priority, PRIORITY_CRITICAL
 import psutil
 import os
 import time
 
+from connection import connection
+from flatten_engine import flatten
+
 
 # 1. STOP THE BOT PROCESSES
 def stop_bot_processes():
@@ -20,68 +23,29 @@ def stop_bot_processes():
             pass
 
 
-# 2. CLOSE ALL MT5 POSITIONS
+# 2. CLOSE ALL MT5 POSITIONS AND CANCEL ALL PENDING ORDERS
+@with_priority(PRIORITY_CRITICAL)  # Served ahead of every other queued terminal call
 def close_all_positions():
-    if not mt5.initialize():
+    # Emergency: reconnect now even if the connection is backing off
+    if not connection.ensure_connected(force=True):
         print("❌ MT5 Initialization failed")
-        return
-
-    positions = mt5.positions_get()
-    if not positions:
-        print("✅ No open positions found.")
+        return None
+
+    # Closes and cancels go out together; rejected ones are retried until flat or the deadline
+    report = flatten()
+    if report.book_unread:
+        print(f"❌ Could not read the position book; the account may NOT be flat. {report.summary()}")
+    elif report.passes == 0:
+        print("✅ No open positions or pending orders found.")
+    elif report.flat:
+        print(f"✅ {report.summary()}")
     else:
-        print(f"📉 Closing {len(positions)} positions...")
-        for pos in positions:
-            tick = mt5.symbol_info_tick(pos.symbol)
-            if tick is None:
-                print(f"❌ Could not get tick info for {pos.symbol}. Skipping.")
-                continue
-            order_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-            price = tick.bid if order_type == mt5.ORDER_TYPE_SELL else tick.ask
-
-            # Use the dynamic filling logic we established
-            info = mt5.symbol_info(pos.symbol)
-            if info is None:
-                print(f"❌ Could not get symbol info for {pos.symbol}. Skipping.")
-                continue
-            filling = mt5.ORDER_FILLING_FOK if info.filling_mode & 1 else \
-                mt5.ORDER_FILLING_IOC if info.filling_mode & 2 else \
-                    mt5.ORDER_FILLING_RETURN
-
-            request = {
-                "action": mt5.TRADE_ACTION_DEAL,
-                "symbol": pos.symbol,
-                "volume": pos.volume,
-                "type": order_type,
-                "position": pos.ticket,
-                "price": price,
-                "deviation": 20,
-                "magic": pos.magic,
-                "comment": "EMERGENCY KILL",
-                "type_time": mt5.ORDER_TIME_GTC,
-                "type_filling": filling,
-            }
-            result = mt5.order_send(request)
-            if result.retcode != mt5.TRADE_RETCODE_DONE:
-                print(f"❌ Failed to close {pos.symbol}: {result.comment}")
-            else:
-                print(f"✅ Closed {pos.symbol}")
-
-    # 3. CANCEL ALL PENDING ORDERS
-    orders = mt5.orders_get()
-    if orders:
-        print(f"🗑️ Canceling {len(orders)} pending orders...")
-        for order in orders:
-            request = {
-                "action": mt5.TRADE_ACTION_REMOVE,
-                "order": order.ticket,
-            }
-            mt5.order_send(request)
-
-    mt5.shutdown()
+        print(f"❌ {report.summary()}: tickets {report.remaining}")
+    return report
 
 
 if __name__ == "__main__":
     stop_bot_processes()
     close_all_positions()
+    connection.shutdown()
     print("\n⚡ SYSTEM IS NOW FLAT AND OFFLINE.")
\ No newline at end of file
@@ -4,7 +4,7 @@ from logging.handlers import RotatingFileHandler
 import logging
 import os
 import sys
-import MetaTrader5 as mt5
+from mt5_gateway import mt5, priority, PRIORITY_CRITICAL, PRIORITY_RISK, PRIORITY_SCAN
 import pytz
 from config import *
 from fetch_earnings import weekly_maintenance
@@ -15,6 +15,10 @@ from mt5_news_filter import is_trading_blocked
 from mt5_trailing_stops import apply_trailing_stop
 from prop_sid_advisor import run_advisor_scan, send_admin_heartbeat
 from strategies import run_entry_scan, run_exit_scan
+from data_provider import begin_scan_cycle
+from instruments import build_instrument_index
+from signal_engine import shutdown_scan_pool
+from connection import connection, get_connection_stats
 import aiohttp
 
 
@@ -84,16 +88,10 @@ async def high_frequency_risk_task():
     global TRADING_BLOCKED
     while True:
         try:
-            if mt5.account_info() is None:
-                logger.warning("🔄 MT5 Connection lost. Attempting to reconnect...")
-                if mt5.initialize(login=MT5_LOGIN, password=MT5_PASSWORD, server=MT5_SERVER):
-                    logger.info("✅ Reconnected to MT5 Broker successfully.")
-                else:
-                    logger.error(f"❌ Reconnection failed: {mt5.last_error()}")
-                    await asyncio.sleep(10)
-                    continue
-            
-            await asyncio.to_thread(apply_trailing_stop)
+            # Probes the terminal; reconnects with backoff if it dropped
+            if not await asyncio.to_thread(connection.ensure_connected):
+                await asyncio.sleep(10)
+                continue
             
             currencies = ['USD','EUR','GBP','JPY','CAD','AUD','NZD','CHF']
             blocked, reason = await asyncio.to_thread(is_trading_blocked, currencies)
@@ -109,17 +107,44 @@ async def high_frequency_risk_task():
             logger.error(f"❌ Error in Risk Task: {e}", exc_info=True)
         await asyncio.sleep(60)
 
+async def trailing_stop_task():
+    while True:
+        try:
+            # Connection health is probed by the risk task; this loop only reads quotes
+            if connection.connected:
+                # SL modifications are served ahead of scan traffic on the gateway
+                with priority(PRIORITY_RISK):
+                    await asyncio.to_thread(apply_trailing_stop)
+        except Exception as e:
+            logger.error(f"❌ Error in Trailing Stop Task: {e}", exc_info=True)
+        await asyncio.sleep(TRAILING_STOP_INTERVAL)
+
 async def market_monitor_task():
     while True:
         try:
+            if not await asyncio.to_thread(connection.ensure_connected) or not connection.scans_allowed():
+                stats = get_connection_stats()
+                logger.warning(f"⏸️ Monitor cycle skipped: MT5 unhealthy ({stats['failures']} failures, "
+                               f"circuit {'open' if stats['circuit_open'] else 'closed'})")
+                await asyncio.sleep(60)  # Retry sooner than a full cycle
+                continue
+
+            # Exit and entry scans of this pass share one market snapshot
+            begin_scan_cycle()
             if not is_drawdown_safe(limit=MAX_DAILY_DRAWDOWN_LIMIT):
                 logger.critical("🚨 CRITICAL DRAWDOWN REACHED: ACTIVATING EMERGENCY KILL SWITCH")
-                await asyncio.to_thread(close_all_positions)
+                with priority(PRIORITY_CRITICAL):
+                    report = await asyncio.to_thread(close_all_positions)
+                if report is not None:
+                    log = logger.critical if not report.flat else logger.warning
+                    log(f"⏱️ Kill switch: {report.summary()}")
             
-            await asyncio.to_thread(run_exit_scan)
+            with priority(PRIORITY_RISK):
+                await asyncio.to_thread(run_exit_scan)
             
             if not TRADING_BLOCKED:
-                await asyncio.to_thread(run_entry_scan)
+                with priority(PRIORITY_SCAN):
+                    await asyncio.to_thread(run_entry_scan)
             else:
                 logger.info("⏸️ Entry scan skipped: News Block Active.")
                 
@@ -178,16 +203,11 @@ async def schedule_weekly_task(func, target_day, target_time_str, task_name):
 # -------------------------------
 async def main():
     try:
-        # First try to attach to an ALREADY running terminal (pass no path)
-        if not mt5.initialize():
-            logger.info("No running terminal found, attempting to launch via path...")
-            # If that fails, then try to launch it using the explicit path
-            if not mt5.initialize(path=MT5_PATH, portable=True, login=MT5_LOGIN, password=MT5_PASSWORD,
-                                    server=MT5_SERVER):
-                logger.error(f"MT5 initialization FAILED, error: {mt5.last_error()}")
-                return
-
-        logger.info("MT5 initialized successfully")
+        # Attaches to an ALREADY running terminal, else launches it via MT5_PATH
+        if not connection.connect():
+            logger.error(f"MT5 initialization FAILED, error: {mt5.last_error()}")
+            return
+
         await notify_discord("🚀 **SidBot Online:** Successfully attached to MT5 in Portable Mode.")
     except Exception as e:
         logger.exception(f"Exception during MT5 initialization: {e}")
@@ -205,15 +225,21 @@ async def main():
         return
 
     logger.info("💎 MT5 PROP MASTER CONTROL ONLINE (Algo Trading Enabled)")
+    build_instrument_index()
 
-    await asyncio.gather(
-        high_frequency_risk_task(),
-        market_monitor_task(),
-        schedule_task(liquidate_earnings_risk, "15:45", "Earnings Shield"),
-        schedule_task(send_admin_heartbeat, "09:45", "Admin Heartbeat"),
-        schedule_task(run_advisor_scan, "15:00", "Daily Advisor"),
-        schedule_weekly_task(weekly_maintenance, "Monday", "00:00", "Weekly Maintenance")
-    )
+    try:
+        await asyncio.gather(
+            high_frequency_risk_task(),
+            trailing_stop_task(),
+            market_monitor_task(),
+            schedule_task(liquidate_earnings_risk, "15:45", "Earnings Shield"),
+            schedule_task(send_admin_heartbeat, "09:45", "Admin Heartbeat"),
+            schedule_task(run_advisor_scan, "15:00", "Daily Advisor"),
+            schedule_weekly_task(weekly_maintenance, "Monday", "00:00", "Weekly Maintenance")
+        )
+    finally:
+        shutdown_scan_pool()
+        connection.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
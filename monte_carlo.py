@@ -0,0 +1,176 @@
+"""
+Monte Carlo prop-challenge simulator.
+
+Trade outcomes are bootstrapped as R-multiples (P&L / cash risked), so one
+sample set can be replayed at any RISK_PER_TRADE_PCT. Each simulated day
+closes a Poisson number of trades (at most MAX_POSITIONS, the most that can
+be open at once); the day's return is risk * sum(R). A path breaches on a day
+losing MAX_DAILY_DRAWDOWN_LIMIT or once equity is MAX_OVERALL_DRAWDOWN_PCT
+below the start, and passes on reaching PROP_PROFIT_TARGET_PCT first.
+
+Outcomes come from a backtest trade list (backtest.py --trades) or from the
+bot's closed deals in MT5. The terminal (mt5_gateway and the connection
+manager) is only imported for the latter.
+
+Usage: python monte_carlo.py --trades trades.csv [--risk 0.0025 0.005] [--paths 20000]
+"""
+import argparse
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config import *
+
+logger = logging.getLogger("MT5MasterControl")
+
+# Paths simulated per vectorised block (bounds memory at paths * days * MAX_POSITIONS)
+BLOCK_PATHS = 5000
+
+
+@dataclass(frozen=True)
+class ChallengeStats:
+    risk_per_trade_pct: float
+    paths: int
+    pass_probability: float
+    breach_probability: float
+    daily_breach_probability: float
+    unresolved_probability: float
+    days_to_target: np.ndarray  # Trading days to the target, passing paths only
+
+    def percentile(self, q):
+        return float(np.percentile(self.days_to_target, q)) if len(self.days_to_target) else float('nan')
+
+    def to_row(self) -> dict:
+        return {
+            'risk_per_trade_pct': self.risk_per_trade_pct, 'paths': self.paths,
+            'pass_probability': self.pass_probability, 'breach_probability': self.breach_probability,
+            'daily_breach_probability': self.daily_breach_probability,
+            'unresolved_probability': self.unresolved_probability,
+            'days_to_target_p10': self.percentile(10), 'days_to_target_p50': self.percentile(50),
+            'days_to_target_p90': self.percentile(90),
+        }
+
+
+# -------------------------------
+# Trade Outcome Sources
+# -------------------------------
+def outcomes_from_backtest(trades: pd.DataFrame):
+    """(R-multiples, trades closed per trading day) from a backtest trade list."""
+    trades = trades[trades['reason'] != 'END']
+    r = trades['r_multiple'].to_numpy(dtype=np.float64)
+    days = np.unique(trades['exit_time'].to_numpy() // 86400)
+    # Inclusive count of trading days between the first and last exit
+    span = max(1, np.busday_count(days.min().astype('datetime64[D]'), (days.max() + 1).astype('datetime64[D]'))) \
+        if len(days) else 1
+    return r, len(r) / span
+
+
+def outcomes_from_mt5(days=365, risk_pct=RISK_PER_TRADE_PCT):
+    """
+    (R-multiples, trades closed per trading day) from the bot's closed deals.
+    Cash risked is not stored per deal, so R is approximated as
+    profit / (current balance * risk_pct).
+    """
+    from mt5_gateway import mt5
+
+    end = datetime.now()
+    deals = mt5.history_deals_get(end - timedelta(days=days), end)
+    account = mt5.account_info()
+    if not deals or account is None:
+        return np.array([]), 0.0
+    closed = [d for d in deals if d.magic == MAGIC_NUMBER and d.entry == mt5.DEAL_ENTRY_OUT]
+    risk_cash = account.balance * risk_pct
+    r = np.array([(d.profit + d.commission + d.swap + d.fee) / risk_cash for d in closed])
+    return r, len(r) / max(1, np.busday_count((end - timedelta(days=days)).date(), end.date()))
+
+
+# -------------------------------
+# Simulation
+# -------------------------------
+def _first_true(mask):
+    """Index of the first True along the last axis, or the axis length."""
+    return np.where(mask.any(axis=-1), mask.argmax(axis=-1), mask.shape[-1])
+
+
+def simulate_challenge(r_multiples, trades_per_day, risk_pct=RISK_PER_TRADE_PCT, paths=20000, days=250,
+                       max_positions=MAX_POSITIONS, target=PROP_PROFIT_TARGET_PCT,
+                       daily_limit=MAX_DAILY_DRAWDOWN_LIMIT, overall_limit=MAX_OVERALL_DRAWDOWN_PCT,
+                       seed=None) -> ChallengeStats:
+    """Runs `paths` equity paths of `days` trading days in vectorised blocks."""
+    r_multiples = np.asarray(r_multiples, dtype=np.float64)
+    if len(r_multiples) == 0:
+        raise ValueError("No trade outcomes to bootstrap")
+    rng = np.random.default_rng(seed)
+
+    passed = breached = daily_breached = 0
+    days_to_target = []
+    for start in range(0, paths, BLOCK_PATHS):
+        n = min(BLOCK_PATHS, paths - start)
+        counts = np.minimum(rng.poisson(trades_per_day, size=(n, days)), max_positions)
+        samples = rng.choice(r_multiples, size=(n, days, max_positions))
+        samples[np.arange(max_positions) >= counts[..., None]] = 0.0
+        daily_return = risk_pct * samples.sum(axis=-1)
+        equity = np.cumprod(1.0 + daily_return, axis=-1)
+
+        daily_hit = _first_true(daily_return <= -daily_limit)
+        overall_hit = _first_true(equity <= 1.0 - overall_limit)
+        breach_day = np.minimum(daily_hit, overall_hit)
+        target_day = _first_true(equity >= 1.0 + target)
+
+        passes = target_day < breach_day
+        breaches = breach_day < target_day
+        passed += int(passes.sum())
+        breached += int(breaches.sum())
+        daily_breached += int((breaches & (daily_hit <= overall_hit)).sum())
+        days_to_target.append(target_day[passes] + 1)
+
+    return ChallengeStats(
+        risk_per_trade_pct=risk_pct, paths=paths,
+        pass_probability=passed / paths, breach_probability=breached / paths,
+        daily_breach_probability=daily_breached / paths,
+        unresolved_probability=(paths - passed - breached) / paths,
+        days_to_target=np.concatenate(days_to_target),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate prop-challenge pass and breach probabilities.")
+    parser.add_argument("--trades", help="Backtest trade list CSV; defaults to the bot's MT5 deal history")
+    parser.add_argument("--history-days", type=int, default=365, help="MT5 deal history to sample")
+    parser.add_argument("--risk", type=float, nargs="+", default=[RISK_PER_TRADE_PCT])
+    parser.add_argument("--trades-per-day", type=float, help="Override the observed trade frequency")
+    parser.add_argument("--paths", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=250, help="Trading days simulated per path")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    if args.trades:
+        r, frequency = outcomes_from_backtest(pd.read_csv(args.trades))
+    else:
+        from connection import connection
+        if not connection.ensure_connected():
+            logger.error("❌ MT5 connection failed; pass --trades to simulate from a backtest")
+            return None
+        try:
+            r, frequency = outcomes_from_mt5(args.history_days)
+        finally:
+            connection.shutdown()
+    frequency = args.trades_per_day or frequency
+    logger.info(f"🎲 Bootstrapping {len(r)} trades (mean {np.mean(r) if len(r) else 0:.2f}R, "
+                f"{frequency:.2f} closes/day) over {args.paths} paths")
+
+    rows = []
+    for risk in args.risk:
+        stats = simulate_challenge(r, frequency, risk, args.paths, args.days, seed=args.seed)
+        rows.append(stats.to_row())
+        logger.info(f"📈 Risk {risk:.2%}: pass {stats.pass_probability:.1%}, breach {stats.breach_probability:.1%} "
+                    f"(daily {stats.daily_breach_probability:.1%}), median {stats.percentile(50):.0f} days to target")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    main()
@@ -3,9 +3,12 @@ import logging
 from datetime import datetime
 from pathlib import Path
 
-import MetaTrader5 as mt5
+from mt5_gateway import mt5
 
 from config import MAGIC_NUMBER
+from utils import get_symbol_info
+from position_book import get_position_book
+from order_engine import send_order
 
 logger = logging.getLogger("MT5Master")
 
@@ -24,7 +27,7 @@ def liquidate_earnings_risk():
         with open(cache_path, 'r') as f:
             earnings_data = json.load(f)
 
-        positions = mt5.positions_get()
+        positions = get_position_book().positions
         if not positions:
             return
 
@@ -32,7 +35,7 @@ def liquidate_earnings_risk():
             symbol = pos.symbol
 
             # 1. Determine if the symbol is a stock
-            symbol_info = mt5.symbol_info(symbol)
+            symbol_info = get_symbol_info(symbol)
             path = symbol_info.path.upper() if symbol_info else ""
 
             if "STOCK" in path or "EQUITY" in path:
@@ -64,12 +67,11 @@ def close_mt5_position(position):
         "type": order_type,
         "position": position.ticket,
         "price": price,
-        "deviation": 20,
         "magic": MAGIC_NUMBER,
         "comment": "Earnings Shield Exit",
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
-    result = mt5.order_send(request)
-    if result.retcode != mt5.TRADE_RETCODE_DONE:
-        logger.error(f"❌ Failed to close {position.symbol}: {result.comment}")
+    result = send_order(request)
+    if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+        logger.error(f"❌ Failed to close {position.symbol}: {result.comment if result else mt5.last_error()}")
@@ -0,0 +1,202 @@
+"""
+Single-threaded gateway to the MetaTrader5 terminal.
+
+The MetaTrader5 package is not thread-safe, but main.py runs its jobs through
+asyncio.to_thread. Every terminal call is therefore queued to one dedicated
+thread that owns the connection. Modules import the proxy instead of the
+package:
+
+    from mt5_gateway import mt5
+
+It has the same constants and functions as MetaTrader5, but each call runs
+on the gateway thread and blocks the caller until it completes. Coroutines
+can use the awaitable helpers (positions(), rates(), tick(), order_send(),
+call()) instead. MT5_BACKEND=fake swaps the terminal for the simulator in
+fake_mt5.py.
+
+Requests are served by priority, then in arrival order. The priority comes
+from the `priority()` context (contextvars follow asyncio.to_thread), so a
+kill-switch flatten or an SL modification queued behind a universe scan is
+served as soon as the current call returns.
+"""
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from config import MT5_BACKEND
+
+if MT5_BACKEND == "fake":
+    import fake_mt5 as _backend
+else:
+    import MetaTrader5 as _backend
+
+logger = logging.getLogger("MT5MasterControl")
+
+# Lower is served first
+PRIORITY_CRITICAL = 0  # Kill switch / emergency flatten
+PRIORITY_RISK = 1      # Stop-loss modifications and exits
+PRIORITY_NORMAL = 2
+PRIORITY_SCAN = 3      # Universe scans and reports
+
+_PRIORITY = contextvars.ContextVar("mt5_priority", default=PRIORITY_NORMAL)
+
+
+@contextmanager
+def priority(level):
+    """Terminal calls made inside this block (and threads started from it) use `level`."""
+    token = _PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def with_priority(level):
+    """Decorator form of priority() for functions that always run at `level`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with priority(level):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MT5Gateway:
+    """Owns the terminal on one thread and serves queued calls by priority."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # priority -> (calls, total queue wait seconds, max queue wait seconds)
+        self._stats = {}
+        self._hooks = {}  # function name -> callbacks run on the gateway thread after each call
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="mt5-gateway", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            level, _, queued_at, future, name, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            waited = time.perf_counter() - queued_at
+            with self._stats_lock:
+                calls, total, worst = self._stats.get(level, (0, 0.0, 0.0))
+                self._stats[level] = (calls + 1, total + waited, max(worst, waited))
+            # Terminal round trip of this call, excluding queue wait
+            future.started_at = time.perf_counter()
+            try:
+                result = self._execute(name, args, kwargs)
+            except BaseException as e:
+                future.finished_at = time.perf_counter()
+                future.set_exception(e)
+            else:
+                future.finished_at = time.perf_counter()
+                future.set_result(result)
+
+    def _execute(self, name, args, kwargs):
+        try:
+            return getattr(self.backend, name)(*args, **kwargs)
+        finally:
+            for hook in self._hooks.get(name, ()):
+                hook()
+
+    def after_call(self, name, callback):
+        """Runs callback() on the gateway thread after every backend.<name> call, even a failed one."""
+        self._hooks.setdefault(name, []).append(callback)
+
+    def submit(self, name, *args, level=None, **kwargs) -> Future:
+        """
+        Queues backend.<name>(*args, **kwargs); returns a concurrent Future.
+        Once done, future.started_at / finished_at (perf_counter) bound the call.
+        """
+        self._ensure_started()
+        future = Future()
+        if level is None:
+            level = _order_priority(args[0]) if name == "order_send" and args else _PRIORITY.get()
+        self._queue.put((level, next(self._seq), time.perf_counter(), future, name, args, kwargs))
+        return future
+
+    def call(self, name, *args, level=None, **kwargs):
+        """Blocking call; runs inline when already on the gateway thread."""
+        if threading.current_thread() is self._thread:
+            return self._execute(name, args, kwargs)
+        return self.submit(name, *args, level=level, **kwargs).result()
+
+    async def acall(self, name, *args, level=None, **kwargs):
+        return await asyncio.wrap_future(self.submit(name, *args, level=level, **kwargs))
+
+    # --- Awaitable API ---
+    async def positions(self, **filters):
+        return await self.acall("positions_get", **filters)
+
+    async def rates(self, symbol, timeframe, start_pos=0, count=250):
+        return await self.acall("copy_rates_from_pos", symbol, timeframe, start_pos, count)
+
+    async def tick(self, symbol):
+        return await self.acall("symbol_info_tick", symbol)
+
+    async def order_send(self, request):
+        return await self.acall("order_send", request, level=_order_priority(request))
+
+    def stats(self):
+        """{priority: {'calls', 'avg_wait_ms', 'max_wait_ms'}} since start."""
+        with self._stats_lock:
+            return {
+                level: {'calls': calls, 'avg_wait_ms': 1000 * total / calls, 'max_wait_ms': 1000 * worst}
+                for level, (calls, total, worst) in sorted(self._stats.items())
+            }
+
+
+def _order_priority(request):
+    """SL/TP modifications are never queued behind scan traffic."""
+    level = _PRIORITY.get()
+    if isinstance(request, dict) and request.get("action") == getattr(gateway.backend, "TRADE_ACTION_SLTP", None):
+        return min(level, PRIORITY_RISK)
+    return level
+
+
+class _TerminalProxy:
+    """Drop-in for the MetaTrader5 module whose calls run on the gateway thread."""
+
+    def __init__(self, gateway):
+        self._gateway = gateway
+
+    def __getattr__(self, name):
+        attr = getattr(self._gateway.backend, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        if name == "order_send":
+            def call(request, *args, **kwargs):
+                return self._gateway.call(name, request, *args, level=_order_priority(request), **kwargs)
+        else:
+            def call(*args, **kwargs):
+                return self._gateway.call(name, *args, **kwargs)
+        call.__name__ = name
+        setattr(self, name, call)  # Later lookups skip __getattr__
+        return call
+
+
+gateway = MT5Gateway(_backend)
+mt5 = _TerminalProxy(gateway)
+
+
+def get_gateway_stats():
+    return gateway.stats()
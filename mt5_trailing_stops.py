@@ -1,70 +1,154 @@
+"""
+ATR trailing stops, driven by quote changes.
+
+apply_trailing_stop() is polled every TRAILING_STOP_INTERVAL seconds. Each
+pass reads the quotes of every held symbol in one symbols_get() call and
+only re-evaluates positions whose bid/ask or stop moved since the previous
+pass. Positions come from the shared book, accepted up to
+TRAILING_BOOK_MAX_AGE old. D1 ATR only changes when a bar closes, so it is
+computed once per symbol per server day (from the last closed bar) and
+cached. Every SL move that clears 10% of ATR in a pass goes to the order
+engine as one batch; a rejected ticket backs off exponentially
+(TRAILING_REJECT_BACKOFF_BASE .. TRAILING_REJECT_BACKOFF_MAX seconds).
+"""
 import logging
+import time
 
-import MetaTrader5 as mt5
-import pandas as pd
-try:
-    import pandas_ta as ta
-except ImportError:
-    pass
+from mt5_gateway import mt5
+import numpy as np
 
 from config import *
 from utils import get_symbol_category, get_base_quote
+from data_provider import get_rates
+from indicators import closed_atr, save_streams
+from position_book import get_position_book
+from order_engine import send_orders
+from trading_rules import trailed_stop
 
 logger = logging.getLogger("MT5Master")
 
+_ATR_CACHE = {}  # symbol -> (server day, ATR of the last closed D1 bar)
+_LAST_SEEN = {}  # position ticket -> (bid, ask, sl) it was last evaluated at
+_BACKOFF = {}  # position ticket -> (consecutive rejections, time.monotonic() it may be retried at)
+_TRAIL_STATS = {"passes": 0, "evaluated": 0, "unchanged": 0, "backed_off": 0, "atr_refreshes": 0,
+                "modified": 0, "rejected": 0}
+
+
+def get_trailing_stats() -> dict:
+    return dict(_TRAIL_STATS, cached_atr=len(_ATR_CACHE))
+
+
+def _server_day(quote):
+    return int(quote.time // 86400)
+
+
+def _quotes(symbols):
+    """{symbol: SymbolInfo} for `symbols`, from one symbols_get() call (its bid/ask/time are the last tick)."""
+    infos = mt5.symbols_get(group=",".join(symbols))
+    if infos is None:
+        logger.error(f"❌ symbols_get failed: {mt5.last_error()}")
+        return {}
+    wanted = set(symbols)
+    return {info.name: info for info in infos if info.name in wanted and info.bid > 0}
+
+
+def _refresh_atr(symbols, quotes):
+    """Recomputes ATR for symbols whose cached value is from an earlier server day."""
+    stale = [s for s in symbols if _ATR_CACHE.get(s, (None,))[0] != _server_day(quotes[s])]
+    for symbol in stale:
+        rates = get_rates(symbol, mt5.TIMEFRAME_D1, STREAM_SEED_BARS)
+        if rates is None or len(rates) < 20: continue
+        # Streaming ATR: only bars closed since the last refresh are folded in
+        _ATR_CACHE[symbol] = (_server_day(quotes[symbol]), closed_atr(symbol, rates))
+        _TRAIL_STATS["atr_refreshes"] += 1
+    if stale:
+        save_streams()
+
+
+def _trail_request(pos, quote, current_atr):
+    """SLTP request moving the stop behind price, or None if the move is under 10% of ATR."""
+    if pos.type not in (mt5.POSITION_TYPE_BUY, mt5.POSITION_TYPE_SELL):
+        return None
+    # Get category to apply correct multiplier
+    category = get_symbol_category(pos.symbol)
+    trail_dist = current_atr * VOLATILITY_MULT.get(category, 2.0)
+    new_sl = trailed_stop(pos.type == mt5.POSITION_TYPE_BUY, quote.bid, quote.ask, pos.sl, current_atr, trail_dist)
+    if new_sl is None:
+        return None
+    return {
+        "action": mt5.TRADE_ACTION_SLTP,
+        "symbol": pos.symbol,
+        "position": pos.ticket,
+        "sl": float(round(new_sl, 5)),
+        "tp": pos.tp,
+        "type_time": mt5.ORDER_TIME_GTC,
+        "type_filling": mt5.ORDER_FILLING_IOC,
+    }
+
+
+def _reject(ticket, symbol, reason):
+    """Backs the ticket off so a persistent rejection (stops/freeze level) is not resent every pass."""
+    failures = _BACKOFF.get(ticket, (0, 0.0))[0] + 1
+    delay = min(TRAILING_REJECT_BACKOFF_MAX, TRAILING_REJECT_BACKOFF_BASE * 2 ** (failures - 1))
+    _BACKOFF[ticket] = (failures, time.monotonic() + delay)
+    _LAST_SEEN.pop(ticket, None)  # Re-evaluate once the backoff ends, even if the price has not moved
+    _TRAIL_STATS["rejected"] += 1
+    logger.warning(f"⚠️ Trailing SL rejected for {symbol}: {reason} (retry in {delay:.0f}s)")
+
 
 def apply_trailing_stop():
-    """Updates SL for all positions based on ATR to lock in gains."""
-    positions = mt5.positions_get()
+    """Updates SL for all positions based on ATR to lock in gains. Returns the number of stops moved."""
+    positions = get_position_book(max_age=TRAILING_BOOK_MAX_AGE).for_magic(MAGIC_NUMBER)  # Skip manual trades
+    held = {p.ticket for p in positions}
+    for state in (_LAST_SEEN, _BACKOFF):
+        for ticket in [t for t in state if t not in held]:
+            del state[ticket]
     if not positions:
-        return
+        return 0
+    _TRAIL_STATS["passes"] += 1
 
-    for pos in positions:
-        if pos.magic != MAGIC_NUMBER: continue  # Skip manual trades
-        symbol = pos.symbol
-        # Fetch fresh data for ATR calculation
-        rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_D1, 0, 50)
-        if rates is None or len(rates) < 20: continue
+    quotes = _quotes(sorted({p.symbol for p in positions}))
 
-        df = pd.DataFrame(rates)
-        try:
-            df.ta.atr(length=14, append=True)
-            atr_cols = [col for col in df.columns if 'ATR' in col.upper()]
-            if not atr_cols: continue
-            current_atr = df[atr_cols[-1]].iloc[-1]
-        except Exception:
+    # Only positions whose price or stop changed since the last pass, and not backing off
+    now = time.monotonic()
+    moved = []
+    for pos in positions:
+        quote = quotes.get(pos.symbol)
+        if quote is None: continue
+        if _BACKOFF.get(pos.ticket, (0, 0.0))[1] > now:
+            _TRAIL_STATS["backed_off"] += 1
+            continue
+        if _LAST_SEEN.get(pos.ticket) == (quote.bid, quote.ask, pos.sl):
+            _TRAIL_STATS["unchanged"] += 1
             continue
+        moved.append(pos)
+    if not moved:
+        return 0
+
+    _refresh_atr(sorted({p.symbol for p in moved}), quotes)
+
+    requests = []
+    for pos in moved:
+        quote = quotes[pos.symbol]
+        current_atr = _ATR_CACHE.get(pos.symbol, (None, np.nan))[1]
+        if np.isnan(current_atr): continue
+        _TRAIL_STATS["evaluated"] += 1
+        _LAST_SEEN[pos.ticket] = (quote.bid, quote.ask, pos.sl)
+        request = _trail_request(pos, quote, current_atr)
+        if request is not None:
+            requests.append(request)
 
-        # Get category to apply correct multiplier
-        category = get_symbol_category(symbol)  # Helper from prop_sidbot
-        trail_dist = current_atr * VOLATILITY_MULT.get(category, 2.0)
-
-        tick = mt5.symbol_info_tick(symbol)
-        if tick is None: continue
-
-        new_sl = 0.0
-        # LONG: SL moves UP as Bid price rises
-        if pos.type == mt5.POSITION_TYPE_BUY:
-            potential_sl = tick.bid - trail_dist
-            if potential_sl > pos.sl + (current_atr * 0.1):  # Only move if change > 10% of ATR
-                new_sl = potential_sl
-
-        # SHORT: SL moves DOWN as Ask price falls
-        elif pos.type == mt5.POSITION_TYPE_SELL:
-            potential_sl = tick.ask + trail_dist
-            if pos.sl == 0 or potential_sl < pos.sl - (current_atr * 0.1):
-                new_sl = potential_sl
-
-        if new_sl > 0:
-            request = {
-                "action": mt5.TRADE_ACTION_SLTP,
-                "symbol": symbol,
-                "position": pos.ticket,
-                "sl": float(round(new_sl, 5)),
-                "tp": pos.tp,
-                "type_time": mt5.ORDER_TIME_GTC,
-                "type_filling": mt5.ORDER_FILLING_IOC,
-            }
-            result = mt5.order_send(request)
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
-                logger.info(f"📈 Trailing SL updated for {symbol}: {new_sl:.5f}")
+    modified = 0
+    for request, (result, _) in zip(requests, send_orders(requests)):
+        ticket = request["position"]
+        if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
+            logger.info(f"📈 Trailing SL updated for {request['symbol']}: {request['sl']:.5f}")
+            bid, ask, _ = _LAST_SEEN[ticket]
+            _LAST_SEEN[ticket] = (bid, ask, request["sl"])  # The stop the next book will show
+            _BACKOFF.pop(ticket, None)
+            modified += 1
+        else:
+            reason = f"{result.comment} ({result.retcode})" if result is not None else mt5.last_error()
+            _reject(ticket, request["symbol"], reason)
+    _TRAIL_STATS["modified"] += modified
+    return modified
@@ -0,0 +1,191 @@
+"""
+Parameter sweep over the backtester.
+
+Stored bars and every parameter-independent indicator (RSI, MACD, ATR,
+weekly RSI) are loaded once in the parent and handed to each worker process
+once through the pool initializer. Workers only recompute the signal masks
+when the signal parameters change, then replay the grid points assigned to
+them. Results go to a columnar file ranked by return, worst daily drawdown
+and prop-challenge pass rate.
+
+Usage: python optimizer.py --grid signal_days=14,21,28 long_rsi_max=40,45 risk_per_trade_pct=0.0025,0.005
+"""
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from backtest import RiskSettings, load_history, default_universe, compute_signals, run_backtest, to_epoch
+from trading_rules import SignalParams
+
+logger = logging.getLogger("MT5MasterControl")
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "optimizer_results.parquet")
+
+_SIGNAL_FIELDS = {f.name for f in fields(SignalParams)} - {"volatility_mult"}
+_RISK_FIELDS = {f.name for f in fields(RiskSettings)}
+
+# Per-worker state set by the pool initializer
+_WORKER = {"history": None, "signals": {}, "options": None}
+
+
+def prop_pass_rate(equity, target=PROP_PROFIT_TARGET_PCT, daily_limit=MAX_DAILY_DRAWDOWN_LIMIT,
+                   overall_limit=MAX_OVERALL_DRAWDOWN_PCT):
+    """
+    Starts a challenge at the first bar of every month of an equity curve and
+    returns (passes / resolved attempts, resolved attempts). An attempt passes
+    when equity gains `target` before a day loses `daily_limit` or equity
+    falls `overall_limit` below its starting value; unresolved ones are ignored.
+    """
+    if equity.empty:
+        return 0.0, 0
+    values = equity['equity'].to_numpy()
+    daily = equity['daily_drawdown'].to_numpy()
+    months = equity['timestamp'].dt.to_period('M').to_numpy()
+    starts = np.flatnonzero(np.concatenate(([True], months[1:] != months[:-1])))
+
+    passes = resolved = 0
+    for start in starts:
+        growth = values[start:] / values[start]
+        breach = (daily[start:] >= daily_limit) | (growth <= 1 - overall_limit)
+        hit = growth >= 1 + target
+        first_breach = np.argmax(breach) if breach.any() else len(growth)
+        first_hit = np.argmax(hit) if hit.any() else len(growth)
+        if first_hit == first_breach == len(growth):
+            continue
+        resolved += 1
+        passes += first_hit < first_breach
+    return (passes / resolved if resolved else 0.0), resolved
+
+
+def expand_grid(grid):
+    """Cartesian product of {name: [values]} as (SignalParams, RiskSettings, point) triples."""
+    unknown = set(grid) - _SIGNAL_FIELDS - _RISK_FIELDS - {"volatility_scale"}
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+
+    names = list(grid)
+    points = []
+    for values in itertools.product(*(grid[n] for n in names)):
+        point = dict(zip(names, values))
+        scale = point.get("volatility_scale", 1.0)
+        params = SignalParams(
+            volatility_mult={k: v * scale for k, v in VOLATILITY_MULT.items()},
+            **{k: v for k, v in point.items() if k in _SIGNAL_FIELDS},
+        )
+        settings = RiskSettings(**{k: v for k, v in point.items() if k in _RISK_FIELDS})
+        points.append((params, settings, point))
+    # Consecutive points share signal masks inside a worker
+    points.sort(key=lambda p: repr(p[0]))
+    return points
+
+
+def _init_worker(history, options):
+    _WORKER["history"] = history
+    _WORKER["signals"] = {}
+    _WORKER["options"] = options
+
+
+def _run_point(task):
+    params, settings, point = task
+    history, options = _WORKER["history"], _WORKER["options"]
+    key = repr(params)
+    signals = _WORKER["signals"].get(key)
+    if signals is None:
+        _WORKER["signals"] = {key: compute_signals(history, params)}  # Keep only the latest mask set
+        signals = _WORKER["signals"][key]
+
+    result = run_backtest(history, params, settings, signals=signals, **options)
+    pass_rate, attempts = prop_pass_rate(result.equity)
+    return {**point, **result.summary(), 'pass_rate': pass_rate, 'attempts': attempts}
+
+
+def rank_results(results: pd.DataFrame) -> pd.DataFrame:
+    """Adds per-metric ranks (1 = best) and sorts by their mean."""
+    results = results.copy()
+    results['rank_return'] = results['total_return'].rank(ascending=False, method='min')
+    results['rank_daily_dd'] = results['max_daily_drawdown'].rank(ascending=True, method='min')
+    results['rank_pass_rate'] = results['pass_rate'].rank(ascending=False, method='min')
+    results['rank'] = results[['rank_return', 'rank_daily_dd', 'rank_pass_rate']].mean(axis=1)
+    return results.sort_values(['rank', 'pass_rate', 'total_return'],
+                               ascending=[True, False, False]).reset_index(drop=True)
+
+
+def write_results(results: pd.DataFrame, path=RESULTS_PATH):
+    """Parquet when pyarrow/fastparquet is installed, CSV otherwise. Returns the path written."""
+    try:
+        results.to_parquet(path, index=False)
+        return path
+    except ImportError:
+        csv_path = os.path.splitext(path)[0] + ".csv"
+        logger.warning(f"⚠️ No parquet engine installed, writing {csv_path} instead")
+        results.to_csv(csv_path, index=False)
+        return csv_path
+
+
+def run_sweep(grid, symbols=None, workers=None, initial_balance=100000.0, start=None, end=None,
+              history=None) -> pd.DataFrame:
+    """Backtests every grid point in parallel; returns the ranked results."""
+    history = history or load_history(symbols or default_universe())
+    points = expand_grid(grid)
+    workers = workers or OPTIMIZER_WORKERS or os.cpu_count() or 1
+    options = {"initial_balance": initial_balance, "start": start, "end": end}
+    logger.info(f"🧪 Sweeping {len(points)} parameter sets over {len(history.symbols)} symbols "
+                f"with {workers} workers")
+
+    # Contiguous chunks keep points with the same signal parameters in one worker
+    chunksize = max(1, len(points) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(history, options)) as pool:
+        rows = list(pool.map(_run_point, points, chunksize=chunksize))
+    return rank_results(pd.DataFrame(rows))
+
+
+def _parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return {"true": True, "false": False}.get(text.lower(), text)
+
+
+def parse_grid(specs):
+    """['signal_days=14,21', 'oversold=25,30'] -> {'signal_days': [14, 21], 'oversold': [25, 30]}"""
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        grid[name.strip()] = [_parse_value(v.strip()) for v in values.split(",") if v.strip()]
+    return grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep strategy and risk parameters over the backtester.")
+    parser.add_argument("--grid", nargs="+", required=True, help="name=v1,v2,... (SignalParams or RiskSettings "
+                                                                 "fields, or volatility_scale)")
+    parser.add_argument("--symbols", nargs="*")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--balance", type=float, default=100000.0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--out", default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    results = run_sweep(parse_grid(args.grid), args.symbols, args.workers, args.balance,
+                        to_epoch(args.start), to_epoch(args.end))
+    path = write_results(results, args.out)
+    best = results.iloc[0]
+    logger.info(f"🏆 Best of {len(results)}: return {best['total_return']:.2%}, "
+                f"max daily DD {best['max_daily_drawdown']:.2%}, pass rate {best['pass_rate']:.0%} -> {path}")
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    main()
@@ -0,0 +1,273 @@
+"""
+Order submission engine.
+
+send_orders() queues a batch of requests to the gateway back-to-back. A
+market order answered with REQUOTE, PRICE_CHANGED or PRICE_OFF is re-priced
+from a fresh tick and re-sent, up to ORDER_MAX_RETRIES times; all retries of
+a round go out together. Requests without a `deviation` get the category's
+ORDER_DEVIATION_POINTS.
+
+A None answer means the outcome is unknown: the request may have executed
+before the reply was lost. It is only re-sent once the account shows it did
+not (_reconcile); if it did, a DONE stand-in result is returned instead.
+
+Every attempt's send-to-ack time (terminal round trip, excluding gateway
+queue wait) and every fill's slippage in points (positive = worse than
+requested) are recorded in per-category histograms: get_order_stats().
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+from mt5_gateway import mt5, gateway
+
+from config import *
+from instruments import get_instrument
+
+logger = logging.getLogger("MT5MasterControl")
+
+LATENCY_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SLIPPAGE_EDGES_POINTS = (-20, -10, -5, -2, -1, 0, 1, 2, 5, 10, 20, 50)
+
+
+class Histogram:
+    """Fixed-bucket histogram; bucket i counts values <= edges[i] (the last one is open)."""
+
+    def __init__(self, edges):
+        self.edges = tuple(edges)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.total = 0.0
+        self.max = float('-inf')
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def add(self, value):
+        self.counts[np.searchsorted(self.edges, value, side='left')] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper edge of the bucket holding the q-quantile (the max for the open bucket)."""
+        if not self.count:
+            return float('nan')
+        i = int(np.searchsorted(np.cumsum(self.counts), q * self.count, side='left'))
+        return self.edges[i] if i < len(self.edges) else self.max
+
+    def to_dict(self) -> dict:
+        labels = [f"<={e}" for e in self.edges] + [f">{self.edges[-1]}"]
+        return {
+            'count': self.count, 'mean': self.total / self.count if self.count else float('nan'),
+            'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'max': self.max if self.count else float('nan'),
+            'buckets': dict(zip(labels, self.counts.tolist())),
+        }
+
+
+# category -> {"latency_ms": Histogram, "slippage_points": Histogram, "retries": int, "failed": int,
+#              "reconciled": int}
+_STATS = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _stats_for(category):
+    stats = _STATS.get(category)
+    if stats is None:
+        stats = {"latency_ms": Histogram(LATENCY_EDGES_MS), "slippage_points": Histogram(SLIPPAGE_EDGES_POINTS),
+                 "retries": 0, "failed": 0, "reconciled": 0}
+        _STATS[category] = stats
+    return stats
+
+
+def get_order_stats(category=None) -> dict:
+    """Histograms for one category, or merged over all of them."""
+    with _STATS_LOCK:
+        selected = [_STATS[category]] if category in _STATS else [] if category else list(_STATS.values())
+        latency, slippage = Histogram(LATENCY_EDGES_MS), Histogram(SLIPPAGE_EDGES_POINTS)
+        counters = {"retries": 0, "failed": 0, "reconciled": 0}
+        for stats in selected:
+            for merged, part in ((latency, stats["latency_ms"]), (slippage, stats["slippage_points"])):
+                merged.counts += part.counts
+                merged.total += part.total
+                merged.max = max(merged.max, part.max)
+            for name in counters:
+                counters[name] += stats[name]
+    return {'latency_ms': latency.to_dict(), 'slippage_points': slippage.to_dict(), **counters}
+
+
+def reset_order_stats():
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+def _category(symbol):
+    instrument = get_instrument(symbol) if symbol else None
+    return instrument.category if instrument else "OTHER"
+
+
+def _is_buy(request):
+    return request.get("type") == mt5.ORDER_TYPE_BUY
+
+
+def _record(request, future, result, category):
+    latency_ms = (future.finished_at - future.started_at) * 1000
+    with _STATS_LOCK:
+        stats = _stats_for(category)
+        stats["latency_ms"].add(latency_ms)
+        if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+            return
+        instrument = get_instrument(request.get("symbol"))
+        if request.get("action") == mt5.TRADE_ACTION_DEAL and instrument and request.get("price") and result.price:
+            points = (result.price - request["price"]) / 10 ** -instrument.digits
+            stats["slippage_points"].add(round(points if _is_buy(request) else -points, 1))
+
+
+def _requoted(request, result):
+    return request.get("action") == mt5.TRADE_ACTION_DEAL and \
+        result.retcode in (mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED, mt5.TRADE_RETCODE_PRICE_OFF)
+
+
+# Stand-in for the OrderSendResult that never arrived, built from the effect found on the account
+ReconciledResult = namedtuple('ReconciledResult', 'retcode deal order volume price bid ask comment request_id '
+                              'retcode_external request')
+
+
+def _reconciled(request, deal=0, order=0, volume=0.0, price=0.0):
+    return ReconciledResult(mt5.TRADE_RETCODE_DONE, deal, order, volume, price, 0.0, 0.0, "Reconciled", 0, 0,
+                            SimpleNamespace(**request))
+
+
+def _find_entry(request):
+    """Looks for the IN deal of a market entry among the last ORDER_RECONCILE_WINDOW seconds of history."""
+    tick = mt5.symbol_info_tick(request["symbol"])
+    if tick is None:
+        return None, False
+    # Deal times are server time; the symbol's last tick is the nearest server clock available
+    deals = mt5.history_deals_get(tick.time - ORDER_RECONCILE_WINDOW, tick.time + 86400)
+    if deals is None:
+        return None, False
+    deal_type = mt5.DEAL_TYPE_BUY if _is_buy(request) else mt5.DEAL_TYPE_SELL
+    for deal in deals:
+        if (deal.symbol == request["symbol"] and deal.entry == mt5.DEAL_ENTRY_IN and deal.type == deal_type
+                and deal.magic == request.get("magic", 0) and deal.comment == request.get("comment", "")
+                and abs(deal.volume - request["volume"]) < 1e-9):
+            return _reconciled(request, deal.ticket, deal.order, deal.volume, deal.price), False
+    return None, True
+
+
+def _reconcile(request):
+    """
+    order_send answered None for `request`. Returns (result, resend): a DONE
+    stand-in if the account shows the request went through, resend=True only
+    if it provably did not. If the account cannot be read either, nothing is
+    re-sent.
+    """
+    action = request.get("action")
+    if action == mt5.TRADE_ACTION_DEAL and not request.get("position"):
+        return _find_entry(request)
+    if action in (mt5.TRADE_ACTION_DEAL, mt5.TRADE_ACTION_SLTP):
+        positions = mt5.positions_get(ticket=request.get("position"))
+        if positions is None:
+            return None, False
+        if action == mt5.TRADE_ACTION_DEAL:
+            # Closes are full-volume: a position that is still open was not closed
+            return (None, True) if positions else (_reconciled(request), False)
+        if not positions:
+            return None, False  # Position closed meanwhile: nothing left to modify
+        pos = positions[0]
+        applied = abs(pos.sl - request.get("sl", 0.0)) < 1e-9 and abs(pos.tp - request.get("tp", 0.0)) < 1e-9
+        return (_reconciled(request), False) if applied else (None, True)
+    if action == mt5.TRADE_ACTION_REMOVE:
+        orders = mt5.orders_get(ticket=request.get("order"))
+        if orders is None:
+            return None, False
+        return (None, True) if orders else (_reconciled(request, order=request.get("order")), False)
+    if action == mt5.TRADE_ACTION_PENDING:
+        orders = mt5.orders_get(symbol=request.get("symbol"))
+        if orders is None:
+            return None, False
+        for order in orders:
+            if (order.type == request.get("type") and order.magic == request.get("magic", 0)
+                    and order.comment == request.get("comment", "")
+                    and abs(order.price_open - request.get("price", 0.0)) < 1e-9
+                    and abs(order.volume_initial - request.get("volume", 0.0)) < 1e-9):
+                return _reconciled(request, order=order.ticket, volume=order.volume_initial), False
+        return None, True
+    return None, False
+
+
+def send_orders(requests, max_retries=ORDER_MAX_RETRIES):
+    """
+    Sends `requests` back-to-back with requote handling (see the module
+    docstring). Returns [(result, acked_at)] in request order: result is the
+    OrderSendResult, a ReconciledResult stand-in or None; acked_at is the
+    time.monotonic() of the final answer.
+    """
+    requests = [dict(r) for r in requests]
+    categories = [_category(r.get("symbol")) for r in requests]
+    for request, category in zip(requests, categories):
+        if request.get("action") == mt5.TRADE_ACTION_DEAL:
+            request.setdefault("deviation", ORDER_DEVIATION_POINTS.get(category, 20))
+
+    replies = [(None, 0.0)] * len(requests)
+    pending = list(range(len(requests)))
+    for attempt in range(max_retries + 1):
+        futures = [(i, gateway.submit("order_send", requests[i])) for i in pending]
+        retry = []
+        for i, future in futures:
+            result = future.result()
+            # Gateway timestamps are perf_counter; report the ack on the monotonic clock
+            acked_at = time.monotonic() - (time.perf_counter() - future.finished_at)
+            _record(requests[i], future, result, categories[i])
+            replies[i] = (result, acked_at)
+            if result is None:
+                found, resend = _reconcile(requests[i])
+                symbol = requests[i].get("symbol")
+                if found is not None:
+                    replies[i] = (found, acked_at)
+                    logger.warning(f"🔎 {symbol}: order_send returned None but the request executed")
+                    with _STATS_LOCK:
+                        _stats_for(categories[i])["reconciled"] += 1
+                elif resend:
+                    retry.append(i)
+                else:
+                    logger.error(f"❓ {symbol}: order_send returned None and the outcome could not be "
+                                 f"confirmed ({mt5.last_error()}); not re-sending")
+            elif _requoted(requests[i], result):
+                retry.append(i)
+        if not retry or attempt == max_retries:
+            break
+
+        # Re-price every retry of this round from fresh ticks
+        symbols = sorted({requests[i]["symbol"] for i in retry if requests[i].get("symbol")})
+        ticks = dict(zip(symbols, [f.result() for f in [gateway.submit("symbol_info_tick", s) for s in symbols]]))
+        pending = []
+        for i in retry:
+            request, result = requests[i], replies[i][0]
+            tick = ticks.get(request.get("symbol"))
+            reason = f"{result.comment} ({result.retcode})" if result is not None else mt5.last_error()
+            if request.get("action") == mt5.TRADE_ACTION_DEAL:
+                if tick is None: continue
+                request["price"] = tick.ask if _is_buy(request) else tick.bid
+            logger.warning(f"🔁 {request.get('symbol')}: {reason}, retry {attempt + 1}/{max_retries}"
+                           f" at {request.get('price')}")
+            with _STATS_LOCK:
+                _stats_for(categories[i])["retries"] += 1
+            pending.append(i)
+        if not pending:
+            break
+
+    with _STATS_LOCK:
+        for (result, _), category in zip(replies, categories):
+            if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+                _stats_for(category)["failed"] += 1
+    return replies
+
+
+def send_order(request, max_retries=ORDER_MAX_RETRIES):
+    """Single-request send_orders(); returns the OrderSendResult or None."""
+    return send_orders([request], max_retries)[0][0]
@@ -0,0 +1,175 @@
+"""
+Intraday P&L ledger.
+
+Drawdown checks need the start-of-day balance, which used to be rebuilt by
+summing every deal since midnight on each call. The ledger pulls only deals
+newer than the last ticket it has seen and keeps the day's realised P&L,
+start-of-day balance and peak equity as running totals.
+
+The day is a broker server day: it starts at PNL_DAY_ROLLOVER_HOUR server
+time (the clock deal times are stamped in). The server's UTC offset is
+SERVER_UTC_OFFSET_HOURS when configured; otherwise it is read on every
+refresh from the last tick of SERVER_CLOCK_SYMBOL, rounded to the half hour,
+so it follows the broker's DST switches. A stale tick (weekend, quiet
+market) keeps the last learned offset; before one was ever learned UTC is
+assumed with a warning, never an error that would read as a drawdown
+breach. At rollover the start-of-day balance is re-based and peak equity
+restarts.
+
+Readers share one snapshot at most PNL_LEDGER_TTL seconds old:
+get_pnl_snapshot(). It costs one account_info(), one short
+history_deals_get() and (offset not configured) one symbol_info_tick() per
+refresh, whatever the number of deals.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from mt5_gateway import mt5
+
+from config import *
+
+logger = logging.getLogger("MT5MasterControl")
+
+
+@dataclass(frozen=True)
+class PnLSnapshot:
+    created: float  # time.monotonic()
+    day_start: int  # Server epoch seconds
+    start_balance: float
+    realized: float  # Today's profit + commission + fee + swap
+    balance: float
+    equity: float
+    peak_equity: float  # Highest equity seen today
+    deals: int  # Deals booked today
+
+    @property
+    def drawdown(self):
+        """Loss from the start-of-day balance, as a fraction of it (0 if the balance is unknown)."""
+        if self.start_balance <= 0:
+            return 0.0
+        return (self.start_balance - self.equity) / self.start_balance
+
+    @property
+    def drawdown_from_peak(self):
+        if self.peak_equity <= 0:
+            return 0.0
+        return (self.peak_equity - self.equity) / self.peak_equity
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+
+def _deal_pnl(deal):
+    return deal.profit + deal.commission + deal.fee + deal.swap
+
+
+class PnLLedger:
+    def __init__(self, terminal=mt5, clock=time.time, rollover_hour=PNL_DAY_ROLLOVER_HOUR,
+                 utc_offset_hours=SERVER_UTC_OFFSET_HOURS, clock_symbol=SERVER_CLOCK_SYMBOL):
+        self.terminal = terminal
+        self.clock = clock
+        self.rollover = int(rollover_hour * 3600)
+        self.configured_offset = int(utc_offset_hours * 3600) if utc_offset_hours is not None else None
+        self.clock_symbol = clock_symbol
+        self.offset = self.configured_offset  # Server time minus UTC, seconds
+        self._offset_warned = False
+        self._lock = threading.Lock()
+        self.day_start = None
+        self.start_balance = 0.0
+        self.realized = 0.0
+        self.peak_equity = 0.0
+        self.deals = []  # Today's deals
+        self.last_ticket = 0
+        self.last_time = 0
+        self.pulls = 0
+        self.deals_pulled = 0
+        self._snapshot = None
+
+    def server_day_start(self, server_now):
+        """Server epoch seconds at which the trading day holding `server_now` began."""
+        return (server_now - self.rollover) // 86400 * 86400 + self.rollover
+
+    def _server_offset(self):
+        """Server time minus UTC in seconds: configured, read off a fresh tick, last learned, or 0 (UTC)."""
+        if self.configured_offset is not None:
+            return self.configured_offset
+        tick = self.terminal.symbol_info_tick(self.clock_symbol)
+        if tick is not None and tick.time:
+            drift = tick.time - self.clock()
+            offset = int(round(drift / 1800.0)) * 1800  # Server zones are whole or half hours
+            if abs(drift - offset) <= SERVER_CLOCK_TOLERANCE:
+                if self.offset is not None and offset != self.offset:
+                    logger.info(f"🕑 Server UTC offset changed to {offset / 3600:+.1f}h (DST)")
+                self.offset = offset
+        if self.offset is None:
+            if not self._offset_warned:
+                logger.warning(f"⚠️ Server UTC offset unknown (no fresh {self.clock_symbol} tick); assuming UTC "
+                               "until one arrives. Set SERVER_UTC_OFFSET_HOURS to pin it.")
+                self._offset_warned = True
+            return 0
+        return self.offset
+
+    def _pull(self, since, until):
+        """Deals booked since `since` that the ledger has not seen yet (None on error)."""
+        deals = self.terminal.history_deals_get(since, until)
+        if deals is None:
+            logger.error(f"❌ history_deals_get failed: {self.terminal.last_error()}")
+            return None
+        self.pulls += 1
+        fresh = sorted((d for d in deals if d.ticket > self.last_ticket), key=lambda d: d.ticket)
+        self.deals_pulled += len(fresh)
+        return fresh
+
+    def refresh(self):
+        """Reads the account and any new deals; returns a PnLSnapshot, or None if MT5 did not answer."""
+        with self._lock:
+            account = self.terminal.account_info()
+            if account is None:
+                logger.error(f"❌ account_info failed: {self.terminal.last_error()}")
+                return None
+
+            server_now = int(self.clock()) + self._server_offset()
+            day_start = self.server_day_start(server_now)
+            # Deals may be stamped slightly ahead of our clock; the upper bound is generous
+            fresh = self._pull(max(day_start, self.last_time), server_now + 86400)
+            if fresh is None:
+                return None
+            if day_start != self.day_start:
+                if self.day_start is not None:
+                    logger.info("🌅 P&L ledger rolled over to a new trading day")
+                self.deals = [d for d in self.deals if d.time >= day_start] + fresh
+                self.realized = sum((_deal_pnl(d) for d in self.deals), 0.0)
+                self.start_balance = account.balance - self.realized
+                self.peak_equity = max(self.start_balance, account.equity)
+                self.day_start = day_start
+            else:
+                self.deals.extend(fresh)
+                self.realized += sum((_deal_pnl(d) for d in fresh), 0.0)
+                self.peak_equity = max(self.peak_equity, account.equity)
+
+            if fresh:
+                self.last_ticket = fresh[-1].ticket
+                self.last_time = max(self.last_time, *(d.time for d in fresh))
+            self._snapshot = PnLSnapshot(time.monotonic(), self.day_start, self.start_balance, self.realized,
+                                         account.balance, account.equity, self.peak_equity, len(self.deals))
+            return self._snapshot
+
+    def snapshot(self, max_age=PNL_LEDGER_TTL):
+        """The last snapshot if it is at most `max_age` seconds old, else a refreshed one."""
+        current = self._snapshot
+        if current is not None and current.age() <= max_age:
+            return current
+        return self.refresh()
+
+    def stats(self) -> dict:
+        return {'pulls': self.pulls, 'deals_pulled': self.deals_pulled, 'deals_today': len(self.deals),
+                'last_ticket': self.last_ticket}
+
+
+ledger = PnLLedger()
+
+
+def get_pnl_snapshot(max_age=PNL_LEDGER_TTL):
+    return ledger.snapshot(max_age)
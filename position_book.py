@@ -0,0 +1,113 @@
+"""
+Position book: one shared snapshot of the open positions.
+
+The exit scan, entry scan, currency-exposure check, trailing stops and the
+earnings shield all read positions within seconds of each other. They share
+a snapshot that is re-read from MT5 at most every POSITION_BOOK_TTL seconds,
+and immediately after any order_send (the gateway marks the book stale once
+the order has been processed), so a reader never sees positions from before
+its own fills.
+"""
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+from mt5_gateway import mt5, gateway
+
+from config import POSITION_BOOK_TTL
+
+logger = logging.getLogger("MT5MasterControl")
+
+
+@dataclass(frozen=True)
+class PositionBook:
+    """Open positions at one instant, indexed by ticket, symbol and magic number."""
+    generation: int
+    created: float
+    positions: Tuple = ()
+    by_ticket: Mapping[int, object] = field(default_factory=dict, repr=False)
+    by_symbol: Mapping[str, Tuple] = field(default_factory=dict, repr=False)
+    by_magic: Mapping[int, Tuple] = field(default_factory=dict, repr=False)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    @property
+    def symbols(self):
+        return frozenset(self.by_symbol)
+
+    def for_symbol(self, symbol):
+        return self.by_symbol.get(symbol, ())
+
+    def for_magic(self, magic):
+        return self.by_magic.get(magic, ())
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+
+def build_book(positions, generation=0) -> PositionBook:
+    positions = tuple(positions or ())
+    by_symbol, by_magic = {}, {}
+    for pos in positions:
+        by_symbol.setdefault(pos.symbol, []).append(pos)
+        by_magic.setdefault(pos.magic, []).append(pos)
+    return PositionBook(
+        generation=generation, created=time.monotonic(), positions=positions,
+        by_ticket=MappingProxyType({p.ticket: p for p in positions}),
+        by_symbol=MappingProxyType({s: tuple(p) for s, p in by_symbol.items()}),
+        by_magic=MappingProxyType({m: tuple(p) for m, p in by_magic.items()}),
+    )
+
+
+_GENERATIONS = itertools.count(1)
+_BOOK = {"current": None, "generation": 0}
+_BOOK_LOCK = threading.Lock()
+_BOOK_STATS = {"hits": 0, "refreshes": 0, "errors": 0}
+
+
+def invalidate():
+    """Marks the book stale. Lock-free: it runs on the gateway thread after order_send."""
+    _BOOK["generation"] = next(_GENERATIONS)
+
+
+gateway.after_call("order_send", invalidate)
+
+
+def get_position_book(max_age=POSITION_BOOK_TTL) -> PositionBook:
+    """
+    Returns the shared snapshot, re-reading MT5 if it is older than `max_age`
+    seconds or an order was sent since it was taken. If MT5 returns None the
+    error is logged and an empty, uncached book is returned.
+    """
+    with _BOOK_LOCK:
+        book = _BOOK["current"]
+        if book is not None and book.generation == _BOOK["generation"] and book.age() <= max_age:
+            _BOOK_STATS["hits"] += 1
+            return book
+
+        # Read the generation before the fetch: an order filled while it is
+        # queued bumps it again and the next reader refreshes
+        generation = _BOOK["generation"]
+        positions = mt5.positions_get()
+        if positions is None:
+            _BOOK_STATS["errors"] += 1
+            logger.error(f"❌ positions_get failed: {mt5.last_error()}")
+            return build_book((), generation)
+
+        _BOOK_STATS["refreshes"] += 1
+        book = build_book(positions, generation)
+        _BOOK["current"] = book
+        return book
+
+
+def get_position_book_stats() -> dict:
+    total = _BOOK_STATS["hits"] + _BOOK_STATS["refreshes"]
+    return {**_BOOK_STATS, "hit_rate": _BOOK_STATS["hits"] / total if total else 0.0}
@@ -4,15 +4,19 @@ import json
 from datetime import datetime, timedelta
 from pathlib import Path
 
-import MetaTrader5 as mt5
+from mt5_gateway import mt5, with_priority, PRIORITY_SCAN
 import pandas as pd
 import plotly.graph_objects as go
 import resend
 from plotly.subplots import make_subplots
 
 from config import *
-from utils import get_symbol_category
+from instruments import get_instrument, refresh_instrument_index
 from risk_management import is_instrument_enabled
+from signal_engine import scan_universe, get_last_scan
+from connection import connection, get_connection_stats
+from fx_rates import get_rate_matrix
+from pnl_ledger import get_pnl_snapshot
 
 # --- INITIALIZATION ---
 load_dotenv()
@@ -22,10 +26,8 @@ EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER").split(',')
 
 
 def initialize_mt5():
-    login = int(os.getenv("MT5_LOGIN"))
-    password = os.getenv("MT5_PASSWORD")
-    server = os.getenv("MT5_SERVER")
-    if not mt5.initialize(login=login, password=password, server=server):
+    # Shared connection: reuses the bot's session when running inside it
+    if not connection.ensure_connected():
         print(f"MT5 Init Failed: {mt5.last_error()}")
         return False
     return True
@@ -33,48 +35,6 @@ def initialize_mt5():
 
 # --- CORE MT5 FUNCTIONS (IDENTICAL TO BOT) ---
 
-def get_data(ticker):
-    rates = mt5.copy_rates_from_pos(ticker, mt5.TIMEFRAME_D1, 0, 100)
-    if rates is None or len(rates) < 15: return pd.DataFrame()
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df.rename(columns={'time': 'timestamp'}, inplace=True)
-    # Ensure pandas_ta can be used
-    try:
-        import pandas_ta as ta
-    except ImportError:
-        pass
-    return df
-
-
-
-
-def calculate_dynamic_stop(df, ticker, order_type):
-    # Try to import pandas_ta if not already available in df
-    try:
-        import pandas_ta as ta
-        df.ta.atr(length=14, append=True)
-    except Exception:
-        pass
-    
-    atr_cols = [col for col in df.columns if 'ATR' in col.upper()]
-    if not atr_cols:
-        # Fallback if ATR calculation failed
-        return df['close'].iloc[-1] * 0.99 if order_type == mt5.ORDER_TYPE_BUY else df['close'].iloc[-1] * 1.01
-
-    atr = df[atr_cols[-1]].iloc[-1]
-    curr_price = df['close'].iloc[-1]
-
-    category = get_symbol_category(ticker)
-    multiplier = VOLATILITY_MULT.get(category, 2.0)
-    dist = atr * multiplier
-
-    if order_type == mt5.ORDER_TYPE_BUY:
-        return min(curr_price - dist, df['low'].tail(3).min())
-    else:
-        return max(curr_price + dist, df['high'].tail(3).max())
-
-
 def is_earnings_safe(ticker):
     cache_path = Path(__file__).parent / 'earnings_cache.json'
     if not cache_path.exists(): return False
@@ -167,35 +127,24 @@ def send_advisor_email(longs, shorts, sector_stats):
 def send_admin_heartbeat():
     """Sends a private email with MT5 equity, drawdown, and recent trade logs."""
     try:
-        if not mt5.initialize():
+        if not initialize_mt5():
             print("❌ Heartbeat failed: MT5 not initialized.")
             return
 
-        # 1. Fetch Account Metrics
-        account = mt5.account_info()
-        if not account:
+        # 1. Fetch Account Metrics and Start-of-Day Balance from the P&L ledger
+        pnl = get_pnl_snapshot()
+        if not pnl:
             print("❌ Could not retrieve account info.")
             return
 
-        equity = account.equity
-        balance = account.balance
-
-        # 2. Calculate Start-of-Day Balance for Drawdown
-        # Fetches realized P/L from today's midnight to now
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        history_deals = mt5.history_deals_get(today_start, datetime.now())
-
-        today_realized_pl = 0
-        if history_deals:
-            for deal in history_deals:
-                today_realized_pl += (deal.profit + deal.commission + deal.swap + deal.fee)
-
-        start_of_day_balance = balance - today_realized_pl
-        drawdown = (start_of_day_balance - equity) / start_of_day_balance if start_of_day_balance > 0 else 0
+        equity = pnl.equity
+        start_of_day_balance = pnl.start_balance
+        drawdown = pnl.drawdown
 
         status = "🟢 OPERATIONAL" if drawdown < MAX_DAILY_DRAWDOWN_PCT else "🔴 PAUSED (DRAWDOWN)"
+        link = get_connection_stats()
 
-        # 3. Fetch Trade Log (Deals from last 24 hours)
+        # 2. Fetch Trade Log (Deals from last 24 hours)
         last_24h = datetime.now() - timedelta(days=1)
         recent_deals = mt5.history_deals_get(last_24h, datetime.now())
 
@@ -210,14 +159,16 @@ def send_admin_heartbeat():
         else:
             trade_log += "No trades executed in the last 24 hours.\n"
 
-        # 4. Construct and Send Email
+        # 3. Construct and Send Email
         body = f"""
         ### SID BOT ADMIN HEARTBEAT ###
         Status: {status}
 
         Account Equity: ${equity:,.2f}
         Start of Day: ${start_of_day_balance:,.2f}
+        Realized Today: ${pnl.realized:,.2f} | Peak Equity: ${pnl.peak_equity:,.2f}
         Current Drawdown: {drawdown:.2%}
+        Terminal Latency: p50 {link.get('p50_ms', 0):.1f} ms | p95 {link.get('p95_ms', 0):.1f} ms | Reconnects: {link['reconnects']}
 
         {trade_log}
 
@@ -240,70 +191,61 @@ def send_admin_heartbeat():
 
 # --- SCANNER ENGINE ---
 
+@with_priority(PRIORITY_SCAN)
 def run_advisor_scan():
     if not initialize_mt5(): return
+    refresh_instrument_index()
     from prop_watchlist import WATCHLIST_SECTORS
     long_cands, short_cands = [], []
     sector_stats = {}
     equity = mt5.account_info().equity
+    rates = get_rate_matrix()  # Quote-to-USD rates shared with the bot's sizing
+
+    # Check which instrument types are currently enabled
+    enabled = {
+        sector: [t for t in tickers if is_instrument_enabled(t)]
+        for sector, tickers in WATCHLIST_SECTORS.items() if TRADE_SETTINGS.get(sector.upper(), False)
+    }
+    universe = [t for tickers in enabled.values() for t in tickers]
+
+    # Reuse the bot's latest entry scan when it is recent and covers the same universe
+    scan = get_last_scan(max_age=ADVISOR_SCAN_REUSE_SECONDS)
+    if scan is not None and scan.covers(universe):
+        print(f"♻️ Reusing entry scan from {scan.scanned_at.strftime('%H:%M:%S')}")
+    else:
+        scan = scan_universe(universe)
+
+    evaluated = set(scan.evaluated)
+    for sector in WATCHLIST_SECTORS:
+        sector_stats[sector] = sum(1 for t in enabled.get(sector, []) if t in evaluated)
 
-    for sector, tickers in WATCHLIST_SECTORS.items():
-        # Check if this instrument type is currently enabled
-        # Using a dummy symbol for the sector to check if it's enabled
-        if not TRADE_SETTINGS.get(sector.upper(), False):
-            sector_stats[sector] = 0
+    for cand in scan.candidates:
+        if cand.ticker not in universe: continue
+        if cand.category == "STOCKS" and not is_earnings_safe(cand.ticker): continue
+
+        instrument = get_instrument(cand.ticker)
+        if instrument is None:
+            print(f"⚠️ {cand.ticker} is not in the instrument index; skipped")
+            continue
+        conversion_rate = rates.to_usd(instrument.quote)
+        if conversion_rate is None:
+            print(f"❌ No conversion rate for {cand.ticker} ({instrument.quote}); skipped")
             continue
+        qty = (equity * RISK_PER_TRADE_PCT) / (abs(cand.price - cand.stop_price) * instrument.contract_size
+                                               * conversion_rate)
+        entry = {'ticker': cand.ticker, 'sl': cand.stop_price, 'qty': round(qty, 2), 'df': scan.frame(cand.ticker)}
 
-        count = 0
-        for ticker in tickers:
-            if not is_instrument_enabled(ticker):
-                continue
-                
-            df = get_data(ticker)
-            if df.empty or len(df) < 50: continue
-            count += 1
-
-            df.ta.rsi(length=14, append=True)
-            df.ta.macd(append=True)
-            macd_col = [c for c in df.columns if 'MACD_' in c][0]
-
-            weekly = df.resample('W-FRI', on='timestamp').agg({'close': 'last'}).dropna()
-            if len(weekly) < 2: continue
-            weekly.ta.rsi(length=14, append=True)
-
-            curr, prev = df.iloc[-1], df.iloc[-2]
-            rsi_hist = df['RSI_14'].tail(SIGNAL_DAYS)
-
-            # Long Entry Logic
-            if (curr['RSI_14'] <= 45 and curr['RSI_14'] > prev['RSI_14'] and
-                    curr[macd_col] > prev[macd_col] and (rsi_hist < 30).any() and
-                    weekly.iloc[-1]['RSI_14'] > weekly.iloc[-2]['RSI_14']):
-
-                if get_symbol_category(ticker) != "STOCKS" or is_earnings_safe(ticker):
-                    sl = calculate_dynamic_stop(df, ticker, mt5.ORDER_TYPE_BUY)
-                    info = mt5.symbol_info(ticker)
-                    qty = (equity * RISK_PER_TRADE_PCT) / (abs(curr['close'] - sl) * info.trade_contract_size)
-                    long_cands.append(
-                        {'ticker': ticker, 'score': curr['RSI_14'], 'sl': sl, 'qty': round(qty, 2), 'df': df})
-
-            # Short Entry Logic
-            elif (curr['RSI_14'] >= 55 and curr['RSI_14'] < prev['RSI_14'] and
-                  curr[macd_col] < prev[macd_col] and (rsi_hist > 70).any() and
-                  weekly.iloc[-1]['RSI_14'] < weekly.iloc[-2]['RSI_14']):
-
-                if get_symbol_category(ticker) != "STOCKS" or is_earnings_safe(ticker):
-                    sl = calculate_dynamic_stop(df, ticker, mt5.ORDER_TYPE_SELL)
-                    info = mt5.symbol_info(ticker)
-                    qty = (equity * RISK_PER_TRADE_PCT) / (abs(curr['close'] - sl) * info.trade_contract_size)
-                    short_cands.append(
-                        {'ticker': ticker, 'score': -curr['RSI_14'], 'sl': sl, 'qty': round(qty, 2), 'df': df})
-
-        sector_stats[sector] = count
+        # Long Entry Logic
+        if cand.is_long:
+            long_cands.append({**entry, 'score': cand.rsi})
+
+        # Short Entry Logic
+        else:
+            short_cands.append({**entry, 'score': -cand.rsi})
 
     long_cands.sort(key=lambda x: x['score'])
     short_cands.sort(key=lambda x: abs(x['score']), reverse=True)
     send_advisor_email(long_cands, short_cands, sector_stats)
-    mt5.shutdown()
 
 
 if __name__ == "__main__":
@@ -317,4 +259,7 @@ if __name__ == "__main__":
     if args.no_forex: TRADE_SETTINGS["FOREX"] = False
     if args.no_metals: TRADE_SETTINGS["METALS"] = False
 
-    run_advisor_scan()
+    try:
+        run_advisor_scan()
+    finally:
+        connection.shutdown()
@@ -6,7 +6,7 @@ import sys
 from datetime import datetime, time
 from pathlib import Path
 
-import MetaTrader5 as mt5
+from mt5_gateway import mt5
 import pandas as pd
 
 from config import *
@@ -16,6 +16,7 @@ from utils import get_symbol_category
 from data_provider import get_data
 from trade_executor import execute_mt5_trade, close_position_and_orders
 from strategies import run_entry_scan, run_exit_scan
+from connection import connection
 # Import Watchlist
 from prop_watchlist import WATCHLIST
 
@@ -35,19 +36,14 @@ FALLBACK_WATCHLIST = [
 
 def initialize_mt5():
     """Initializes MT5 using credentials from .env"""
-    # Use the logic from your mt5_test.py here
-    login = int(os.getenv("MT5_LOGIN"))
-    password = os.getenv("MT5_PASSWORD")
-    server = os.getenv("MT5_SERVER")
-
-    if not mt5.initialize(login=login, password=password, server=server):
+    if not connection.connect():
         logger.error(f"Failed to initialize MT5: {mt5.last_error()}")
         sys.exit(1)
     logger.info(f"Connected to MT5: {mt5.account_info().login}")
 
 
 def mt5_shutdown():
-    mt5.shutdown()
+    connection.shutdown()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='MT5 Forex Sid Method Trading Bot')
@@ -1,11 +1,14 @@
-import MetaTrader5 as mt5
+from mt5_gateway import mt5
 import json
 import logging
-from datetime import datetime, time
+from datetime import datetime
 from pathlib import Path
 
 from config import *
-from utils import get_symbol_category, get_base_quote
+from utils import get_symbol_category, get_base_quote, get_symbol_info
+from position_book import get_position_book
+from pnl_ledger import get_pnl_snapshot
+from trading_rules import count_currency_exposure
 
 logger = logging.getLogger("MT5MasterControl")
 
@@ -25,7 +28,8 @@ def is_market_open(symbol):
     """
     Checks if the market for a specific symbol is currently open for trading.
     """
-    info = mt5.symbol_info(symbol)
+    # Specs can be minutes old, the trade mode cannot
+    info = get_symbol_info(symbol, ttl=SYMBOL_TRADE_MODE_TTL)
     if info is None:
         return False
 
@@ -73,61 +77,40 @@ def is_earnings_safe(ticker):
         return False
 
 
-def get_current_currency_exposure(new_ticker):
-    """Counts how many times base/quote currencies of new_ticker appear in open trades."""
-    positions = mt5.positions_get()
-    if not positions:
+def get_current_currency_exposure(new_ticker, pending=()):
+    """
+    Counts how many times base/quote currencies of new_ticker appear in open
+    trades and in `pending` (symbols queued in the same execution batch).
+    """
+    symbols = [p.symbol for p in get_position_book().positions] + list(pending)
+    if not symbols:
         return 0
 
     if get_symbol_category(new_ticker) != "FOREX":
         return 0
 
-    new_base, new_quote = get_base_quote(new_ticker)
-    new_currencies = [c for c in [new_base, new_quote] if c]
-    exposure_count = 0
-
-    for pos in positions:
-        if get_symbol_category(pos.symbol) != "FOREX":
-            continue
-        # Extract base and quote from open position symbols
-        base, quote = get_base_quote(pos.symbol)
-        active_currencies = [c for c in [base, quote] if c]
-        for cur in new_currencies:
-            if cur in active_currencies:
-                exposure_count += 1
-
-    return exposure_count
+    # Extract base and quote from open position symbols
+    open_pairs = [get_base_quote(symbol) for symbol in symbols if get_symbol_category(symbol) == "FOREX"]
+    return count_currency_exposure(get_base_quote(new_ticker), open_pairs)
 
 
 def is_drawdown_safe(limit=None):  # Add 'limit=None' to accept the argument from main.py
-    """Checks if the current daily drawdown exceeds the allowed limit using MT5 history."""
+    """Checks if the current daily drawdown exceeds the allowed limit using the P&L ledger."""
     try:
         # Use the passed limit (0.047) if available, otherwise fall back to config
         drawdown_limit = limit if limit is not None else MAX_DAILY_DRAWDOWN_PCT
 
-        account = mt5.account_info()
-        if account is None:
+        # Start-of-day balance is kept incrementally from new deals only
+        pnl = get_pnl_snapshot()
+        if pnl is None:
             logger.error("❌ Could not retrieve account info for drawdown check.")
             return False
 
-        current_equity = account.equity
-
-        # Calculate Start-of-Day Balance
-        today_start = datetime.combine(datetime.now().date(), time.min)
-        history_deals = mt5.history_deals_get(today_start, datetime.now())
-
-        today_realized_pl = 0
-        if history_deals:
-            for deal in history_deals:
-                today_realized_pl += (deal.profit + deal.commission + deal.fee + deal.swap)
-
-        start_of_day_balance = account.balance - today_realized_pl
-
-        if start_of_day_balance <= 0:
+        if pnl.start_balance <= 0:
             return True
 
         # Calculate current drawdown percentage
-        current_drawdown = (start_of_day_balance - current_equity) / start_of_day_balance
+        current_drawdown = pnl.drawdown
 
         # --- KEEP THIS UPDATED BLOCK ---
         # It now compares against the dynamic 'drawdown_limit'
@@ -140,4 +123,4 @@ def is_drawdown_safe(limit=None):  # Add 'limit=None' to accept the argument fro
 
     except Exception as e:
         logger.error(f"❌ Error checking drawdown: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,418 @@
+"""
+Session record and replay for main.py.
+
+record: runs the bot live with a recording proxy installed as the terminal
+behind mt5_gateway (whichever MT5_BACKEND is configured, so a fake_mt5
+session records too). Every terminal call (rates, ticks, positions,
+account info, order results, ...) and every news-feed fetch is appended to
+a JSONL file together with the terminal's constants.
+
+replay: installs a replaying terminal as the gateway backend and drives
+main.main() on an event loop with a virtual clock. Sleeps complete
+instantly, and time.time/monotonic and datetime.now follow the virtual clock,
+so a full trading day runs in seconds without a terminal. Worker threads
+run inline so the replay is deterministic. Discord, email, the earnings
+download, the trade CSV, the history store and the indicator state file are
+all redirected away from the live ones.
+
+Responses are matched per call signature (function plus arguments, with
+datetimes and order prices ignored) in recorded order; once a signature's
+responses run out, the last one is repeated.
+
+Usage:
+    python session_replay.py record session.jsonl
+    python session_replay.py replay session.jsonl [--hours 8]
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("MT5MasterControl")
+
+# order_send/order_check requests are matched on these fields only
+_ORDER_KEY_FIELDS = ("action", "symbol", "type", "position", "order")
+
+
+# -------------------------------
+# Serialisation
+# -------------------------------
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        if value.dtype.names:
+            return {"__rates__": [list(d) for d in value.dtype.descr],
+                    "columns": {name: value[name].tolist() for name in value.dtype.names}}
+        return {"__array__": value.tolist()}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if hasattr(value, "_asdict"):
+        return {"__record__": type(value).__name__,
+                "fields": {k: _encode(v) for k, v in value._asdict().items()}}
+    if isinstance(value, dict):
+        return {"__dict__": {str(k): _encode(v) for k, v in value.items()}}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return repr(value)
+
+
+_RECORD_TYPES = {}
+
+
+def _record_type(name, fields):
+    key = (name, tuple(fields))
+    if key not in _RECORD_TYPES:
+        _RECORD_TYPES[key] = collections.namedtuple(name, fields)
+    return _RECORD_TYPES[key]
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__rates__" in value:
+        dtype = np.dtype([tuple(d) for d in value["__rates__"]])
+        columns = value["columns"]
+        rates = np.empty(len(next(iter(columns.values()), [])), dtype=dtype)
+        for name in dtype.names:
+            rates[name] = columns[name]
+        return rates
+    if "__array__" in value:
+        return np.array(value["__array__"])
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__record__" in value:
+        fields = {k: _decode(v) for k, v in value["fields"].items()}
+        return _record_type(value["__record__"], fields)(**fields)
+    if "__dict__" in value:
+        return {k: _decode(v) for k, v in value["__dict__"].items()}
+    if "__tuple__" in value:
+        return tuple(_decode(v) for v in value["__tuple__"])
+    return value
+
+
+def call_key(fn, args, kwargs):
+    """Signature used to match a replayed call to its recorded responses."""
+    def normalise(value):
+        if isinstance(value, datetime):
+            return "<datetime>"
+        if isinstance(value, (list, tuple)):
+            return [normalise(v) for v in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    if fn in ("order_send", "order_check") and args and isinstance(args[0], dict):
+        args = ({k: args[0].get(k) for k in _ORDER_KEY_FIELDS},)
+    return json.dumps([fn, normalise(list(args)), {k: normalise(v) for k, v in sorted(kwargs.items())}],
+                      default=repr)
+
+
+def _install_backend(backend):
+    """Puts `backend` behind mt5_gateway.mt5; returns the backend it replaced."""
+    from config import MT5_BACKEND
+    if MT5_BACKEND != "fake" and "mt5_gateway" not in sys.modules:
+        try:
+            import MetaTrader5  # noqa: F401
+        except ImportError:
+            # Replaying on a machine without the terminal package: let the gateway import resolve
+            sys.modules["MetaTrader5"] = backend
+    from mt5_gateway import gateway
+    previous, gateway.backend = gateway.backend, backend
+    return previous
+
+
+# -------------------------------
+# Recording
+# -------------------------------
+class RecordingMT5:
+    """Proxy for the terminal backend (MetaTrader5 or fake_mt5) that journals every call."""
+
+    def __init__(self, real, path, indicator_state=None):
+        self._real = real
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+        constants = {name: getattr(real, name) for name in dir(real)
+                     if name.isupper() and isinstance(getattr(real, name), (int, float, str))}
+        self._write({"type": "header", "started": time.time(), "constants": constants,
+                     "indicator_state": indicator_state})
+
+    def _write(self, entry):
+        line = json.dumps(entry)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record(self, fn, args, kwargs, result):
+        self._write({"type": "call", "t": time.time(), "fn": fn, "key": call_key(fn, args, kwargs),
+                     "result": _encode(result)})
+
+    def wrap(self, fn, func):
+        def call(*args, **kwargs):
+            result = func(*args, **kwargs)
+            self.record(fn, args, kwargs, result)
+            return result
+        return call
+
+    def __getattr__(self, name):
+        attr = getattr(self._real, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        call = self.wrap(name, attr)
+        setattr(self, name, call)  # Later lookups skip __getattr__
+        return call
+
+
+# -------------------------------
+# Replay
+# -------------------------------
+def load_recording(path):
+    header, calls = None, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["type"] == "header":
+                header = entry
+            else:
+                calls.append(entry)
+    if header is None:
+        raise ValueError(f"{path} has no session header")
+    return header, calls
+
+
+class ReplayMT5:
+    """Stands in for the terminal backend, answering calls from a recording."""
+
+    def __init__(self, header, calls):
+        for name, value in header["constants"].items():
+            setattr(self, name, value)
+        self._responses = collections.defaultdict(collections.deque)
+        for entry in calls:
+            self._responses[entry["key"]].append(entry["result"])
+        self._last = {}
+        self.served = collections.Counter()
+        self.unmatched = collections.Counter()
+
+    def respond(self, fn, args, kwargs):
+        key = call_key(fn, args, kwargs)
+        queue = self._responses.get(key)
+        if queue:
+            self._last[key] = queue.popleft()
+        elif key not in self._last:
+            if not self.unmatched[fn]:
+                logger.warning(f"⚠️ Replay: no recorded response for {fn}{tuple(args)}")
+            self.unmatched[fn] += 1
+            return None
+        self.served[fn] += 1
+        return _decode(self._last[key])
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self.respond(name, args, kwargs)
+        return call
+
+
+class _InstantSelector:
+    """Selector wrapper that advances the virtual clock instead of blocking."""
+
+    def __init__(self, selector, loop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if not events and timeout:
+            self._loop.advance(timeout)
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop whose clock jumps straight to the next scheduled callback."""
+
+    def __init__(self, start):
+        super().__init__()
+        self._now = float(start)
+        self._selector = _InstantSelector(self._selector, self)
+        # Epoch-sized clock values cannot resolve the default nanosecond step
+        self._clock_resolution = 1e-3
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        # Land exactly on the next timer so it is due on this iteration
+        target = self._scheduled[0]._when if self._scheduled else self._now + seconds
+        self._now = max(self._now, target)
+
+
+def _virtual_datetime(clock):
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock(), tz)
+
+        @classmethod
+        def utcnow(cls):
+            return datetime.fromtimestamp(clock(), timezone.utc).replace(tzinfo=None)
+    return VirtualDatetime
+
+
+async def _inline_to_thread(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def _repo_modules():
+    root = Path(__file__).resolve().parent
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and Path(path).resolve().parent == root:
+            yield module
+
+
+def _redirect_side_effects(workdir, news):
+    """Points every live side effect of the bot at the replay work directory."""
+    import data_provider, fetch_earnings, history_store, indicators, main, prop_sid_advisor, trade_executor
+    import mt5_news_filter
+
+    data_provider.HISTORY_STORE_ENABLED = False
+    history_store.HISTORY_STORE_DIR = str(workdir / "history")
+    indicators.INDICATOR_STATE_PATH = str(workdir / "indicator_state.json")
+
+    async def notify_discord(message):
+        logger.info(f"📣 (replay) Discord: {message}")
+    main.notify_discord = notify_discord
+    prop_sid_advisor.resend.Emails.send = lambda params: logger.info(f"📧 (replay) Email: {params.get('subject')}")
+    fetch_earnings.update_earnings_cache = lambda: logger.info("📅 (replay) Earnings download skipped")
+    fetch_earnings.cleanup_old_files = lambda: None
+    trade_executor.log_event = lambda event: logger.info(f"🧾 (replay) Trade event: {event}")
+
+    def fetch_high_impact_news():
+        if news:
+            fetch_high_impact_news.last = news.popleft()
+        return _decode(getattr(fetch_high_impact_news, "last", []))
+    mt5_news_filter.fetch_high_impact_news = fetch_high_impact_news
+
+    main.logger.removeHandler(main.file_handler)
+    handler = logging.FileHandler(workdir / "replay.log", encoding="utf-8")
+    handler.setFormatter(main.file_handler.formatter)
+    main.logger.addHandler(handler)
+
+
+def start_replay(path):
+    """Installs a ReplayMT5 for the recording as the gateway backend; returns (header, calls, terminal)."""
+    header, calls = load_recording(path)
+    terminal = ReplayMT5(header, [c for c in calls if not c["fn"].startswith("news.")])
+    _install_backend(terminal)
+    return header, calls, terminal
+
+
+def replay(path, hours=None, workdir=None):
+    """Replays a recorded session; returns (virtual seconds, wall seconds, ReplayMT5)."""
+    header, calls, terminal = start_replay(path)
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="replay_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    if header.get("indicator_state"):
+        (workdir / "indicator_state.json").write_text(json.dumps(header["indicator_state"]))
+
+    news = collections.deque(c["result"] for c in calls if c["fn"] == "news.fetch_high_impact_news")
+
+    loop = VirtualClockLoop(header["started"])
+    time.time = loop.time
+    time.monotonic = loop.time
+    asyncio.to_thread = _inline_to_thread
+
+    import main
+    _redirect_side_effects(workdir, news)
+    virtual_datetime = _virtual_datetime(loop.time)
+    for module in _repo_modules():
+        if getattr(module, "datetime", None) is datetime:
+            module.datetime = virtual_datetime
+
+    span = (calls[-1]["t"] - header["started"]) if calls else 0
+    duration = hours * 3600 if hours else span
+
+    async def run():
+        task = asyncio.ensure_future(main.main())
+        done, _ = await asyncio.wait({task}, timeout=duration)
+        if not done:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    wall_start = time.perf_counter()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+    wall = time.perf_counter() - wall_start
+    virtual = loop.time() - header["started"]
+    logger.info(f"⏩ Replayed {virtual / 3600:.1f}h of session in {wall:.1f}s: "
+                f"{sum(terminal.served.values())} MT5 calls served, "
+                f"{sum(terminal.unmatched.values())} unmatched. Output in {workdir}")
+    return virtual, wall, terminal
+
+
+def start_recording(path):
+    """Wraps the current gateway backend in a RecordingMT5 journalling to `path`; returns the recorder."""
+    from config import INDICATOR_STATE_PATH
+    from mt5_gateway import gateway
+
+    state_path = Path(INDICATOR_STATE_PATH)
+    indicator_state = json.loads(state_path.read_text()) if state_path.exists() else None
+    recorder = RecordingMT5(gateway.backend, path, indicator_state)
+    _install_backend(recorder)
+    return recorder
+
+
+def record(path):
+    """Runs the bot live while journalling every terminal and news response."""
+    recorder = start_recording(path)
+
+    import data_provider, main, mt5_news_filter
+    # The replay cannot reproduce the store's contents, so both start cold
+    data_provider.HISTORY_STORE_ENABLED = False
+    mt5_news_filter.fetch_high_impact_news = recorder.wrap("news.fetch_high_impact_news",
+                                                           mt5_news_filter.fetch_high_impact_news)
+    logger.info(f"⏺️ Recording session to {path}")
+    try:
+        asyncio.run(main.main())
+    except KeyboardInterrupt:
+        logger.info("⏹️ Recording stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record or replay a bot session.")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    rec = sub.add_parser("record")
+    rec.add_argument("path")
+    rep = sub.add_parser("replay")
+    rep.add_argument("path")
+    rep.add_argument("--hours", type=float, help="Virtual hours to run (default: the recorded span)")
+    rep.add_argument("--workdir", help="Where replay output goes (default: a temp directory)")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record(args.path)
+    else:
+        replay(args.path, args.hours, args.workdir)
@@ -0,0 +1,315 @@
+"""
+Sid signal engine shared by the live bot (strategies.run_entry_scan) and the
+daily advisor (prop_sid_advisor.run_advisor_scan).
+
+The universe is evaluated once per cycle and the result is kept, so the
+advisor can reuse the bot's most recent scan instead of redoing it.
+Consumer-specific gates (open positions, news, earnings, ALLOW_SHORTS) are
+applied by the callers on the returned candidates.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Mapping
+
+from mt5_gateway import mt5
+import numpy as np
+import pandas as pd
+
+from config import *
+from data_provider import get_data_many
+from indicators import IndicatorSet, compute_indicators, weekly_rsi
+from instruments import get_instrument
+from utils import get_symbol_category
+from trading_rules import MIN_BARS, SignalParams, stop_distance, dynamic_stop, sid_rules, sid_score
+
+logger = logging.getLogger("MT5MasterControl")
+
+# D1 bars evaluated per ticker (at least trading_rules.MIN_BARS are needed)
+SCAN_BARS = 250
+
+
+@dataclass(frozen=True)
+class Candidate:
+    ticker: str
+    category: str
+    is_long: bool
+    rsi: float
+    score: float  # Lower is better: RSI for longs, 100 - RSI for shorts
+    price: float
+    stop_price: float
+    atr: float
+    bar_time: int
+
+    @property
+    def order_type(self):
+        return mt5.ORDER_TYPE_BUY if self.is_long else mt5.ORDER_TYPE_SELL
+
+    def to_pick(self) -> dict:
+        """The pick dict consumed by trade_executor.execute_mt5_trade."""
+        return {
+            'ticker': self.ticker, 'type': self.order_type,
+            'score': self.score, 'price': self.price, 'stop_price': self.stop_price,
+            'is_long': self.is_long
+        }
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    scanned_at: datetime
+    created: float
+    tickers: tuple
+    evaluated: tuple
+    candidates: tuple
+    indicators: IndicatorSet = field(repr=False)
+    rates: Mapping[str, np.ndarray] = field(repr=False)
+    skipped: int = 0  # Symbols served from the signal memo
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+    def covers(self, tickers) -> bool:
+        return set(tickers) <= set(self.tickers)
+
+    @property
+    def longs(self):
+        return sorted((c for c in self.candidates if c.is_long), key=lambda c: c.score)
+
+    @property
+    def shorts(self):
+        return sorted((c for c in self.candidates if not c.is_long), key=lambda c: c.score)
+
+    def frame(self, ticker) -> pd.DataFrame:
+        """Bars for a ticker with pandas_ta-named indicator columns attached."""
+        df = pd.DataFrame(self.rates[ticker])
+        df['timestamp'] = pd.to_datetime(df['time'], unit='s')
+        # Memo hits were not in this scan's indicator pass
+        ind = self.indicators if ticker in self.indicators.symbols else \
+            compute_indicators({ticker: self.rates[ticker]})
+        for column, values in ind.frame_columns(ticker).items():
+            df[column] = values
+        return df
+
+
+_LAST_SCAN = {"value": None}
+_LAST_SCAN_LOCK = threading.Lock()
+
+# symbol -> (memo key, Candidate or None) from the last time it was evaluated
+_SIGNAL_MEMO = {}
+_SIGNAL_MEMO_LOCK = threading.Lock()
+
+
+def evaluate_signals(ind, rates_by_symbol, params=None, categories=None):
+    """
+    Applies the Sid long/short rules to every symbol in an IndicatorSet.
+    `categories` (symbol -> category) avoids terminal lookups in worker processes.
+    """
+    params = params or SignalParams()
+    candidates = []
+    # (previous, current) weekly RSI for every symbol, bucketed without resampling
+    weekly = weekly_rsi({t: rates_by_symbol[t] for t in ind.symbols})
+
+    for ticker in ind.symbols:
+        rates = rates_by_symbol[ticker]
+        if ticker not in weekly: continue
+        wk_prev, wk_curr = weekly[ticker]
+
+        rsi = ind.series('rsi', ticker)
+        macd_line = ind.series('macd', ticker)
+        atr = ind.series('atr', ticker)[-1]
+        if np.isnan(atr): continue
+
+        curr_rsi, prev_rsi = rsi[-1], rsi[-2]
+        rsi_history = rsi[-params.signal_days:]
+        category = categories[ticker] if categories is not None else get_symbol_category(ticker)
+        close = float(rates['close'][-1])
+
+        long, short = sid_rules(curr_rsi, prev_rsi, macd_line[-1], macd_line[-2], wk_curr, wk_prev,
+                                (rsi_history < params.oversold).any(), (rsi_history > params.overbought).any(),
+                                params)
+        if not (long or short):
+            continue
+        is_long, score = bool(long), float(sid_score(curr_rsi, long))
+
+        stop = dynamic_stop(close, rates['low'], rates['high'], atr, category, is_long, params)
+        candidates.append(Candidate(
+            ticker=ticker, category=category, is_long=is_long, rsi=float(curr_rsi),
+            score=float(score), price=close, stop_price=float(stop), atr=float(atr),
+            bar_time=int(rates['time'][-1]),
+        ))
+
+    return candidates
+
+
+# -------------------------------
+# Parallel Evaluation
+# -------------------------------
+# The bot process fetches bars over its single MT5 connection and publishes
+# them as right-aligned matrices in shared memory; workers attach, rebuild
+# their rows and run the same kernel and rules as the serial path.
+_SHARED_FIELDS = (('time', np.int64, 0), ('high', np.float64, np.nan),
+                  ('low', np.float64, np.nan), ('close', np.float64, np.nan))
+_POOL = {"executor": None}
+
+
+def _get_pool():
+    if _POOL["executor"] is None:
+        _POOL["executor"] = ProcessPoolExecutor(max_workers=SCAN_WORKERS)
+    return _POOL["executor"]
+
+
+def shutdown_scan_pool():
+    if _POOL["executor"] is not None:
+        _POOL["executor"].shutdown(wait=False, cancel_futures=True)
+        _POOL["executor"] = None
+
+
+def _scan_rows(shm_names, shape, rows, symbols, lengths, categories, params):
+    """Worker: evaluates matrix rows [rows[0], rows[1]) from shared memory."""
+    blocks = {name: shared_memory.SharedMemory(name=shm) for name, shm in shm_names.items()}
+    try:
+        matrices = {name: np.ndarray(shape, dtype=dtype, buffer=blocks[name].buf)
+                    for name, dtype, _ in _SHARED_FIELDS}
+        rates_by_symbol = {}
+        for row in range(*rows):
+            length = lengths[row]
+            rates = np.empty(length, dtype=[(name, dtype) for name, dtype, _ in _SHARED_FIELDS])
+            for name, _, _ in _SHARED_FIELDS:
+                rates[name] = matrices[name][row, shape[1] - length:]
+            rates_by_symbol[symbols[row]] = rates
+        del matrices
+    finally:
+        for block in blocks.values():
+            block.close()
+
+    ind = compute_indicators(rates_by_symbol)
+    return evaluate_signals(ind, rates_by_symbol, params, categories)
+
+
+def evaluate_parallel(rates_by_symbol, params=None):
+    """
+    Same result as evaluate_signals(compute_indicators(rates), rates), computed
+    across SCAN_WORKERS processes. Row chunks are gathered in order, so the
+    output is deterministic.
+    """
+    params = params or SignalParams()
+    symbols = tuple(rates_by_symbol)
+    lengths = [len(rates_by_symbol[s]) for s in symbols]
+    shape = (len(symbols), max(lengths, default=0))
+    categories = {s: get_symbol_category(s) for s in symbols}
+
+    blocks = {}
+    try:
+        for name, dtype, fill in _SHARED_FIELDS:
+            block = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * np.dtype(dtype).itemsize))
+            blocks[name] = block
+            matrix = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            matrix.fill(fill)
+            for row, symbol in enumerate(symbols):
+                matrix[row, shape[1] - lengths[row]:] = rates_by_symbol[symbol][name]
+            del matrix
+
+        chunk = -(-len(symbols) // SCAN_WORKERS)
+        bounds = [(start, min(start + chunk, len(symbols))) for start in range(0, len(symbols), chunk)]
+        shm_names = {name: block.name for name, block in blocks.items()}
+        futures = [
+            _get_pool().submit(_scan_rows, shm_names, shape, rows, symbols, lengths, categories, params)
+            for rows in bounds
+        ]
+        return [cand for future in futures for cand in future.result()]
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _memo_key(ticker, rates, params_tag):
+    """(last bar time, close bucket, params) or None if the pip size is unknown."""
+    instrument = get_instrument(ticker)
+    if instrument is None or not instrument.pip_unit:
+        return None
+    bucket = int(np.floor(rates['close'][-1] / (instrument.pip_unit * SIGNAL_MEMO_BUCKET_PIPS)))
+    return int(rates['time'][-1]), bucket, params_tag
+
+
+def _reprice(cand, rates, params):
+    """Refreshes a memoised candidate's price and stop from the latest bar."""
+    close = float(rates['close'][-1])
+    stop = dynamic_stop(close, rates['low'], rates['high'], cand.atr, cand.category, cand.is_long, params)
+    return replace(cand, price=close, stop_price=float(stop))
+
+
+def clear_signal_memo():
+    with _SIGNAL_MEMO_LOCK:
+        _SIGNAL_MEMO.clear()
+
+
+def scan_universe(tickers, params=None, count=SCAN_BARS) -> ScanResult:
+    """
+    Fetches, computes and evaluates the whole universe once; keeps the result.
+    Symbols whose last bar and close bucket are unchanged since their previous
+    evaluation reuse the memoised outcome instead of being recomputed.
+    """
+    params = params or SignalParams()
+    params_tag = repr(params)
+    snapshot = get_data_many(tickers, mt5.TIMEFRAME_D1, count)
+    eligible = {}
+    for ticker in tickers:
+        rates = snapshot.rates.get(ticker)
+        if rates is None or len(rates) < MIN_BARS: continue
+        eligible[ticker] = rates[-count:]
+
+    fresh, memo_keys, reused = {}, {}, []
+    with _SIGNAL_MEMO_LOCK:
+        for ticker, rates in eligible.items():
+            key = _memo_key(ticker, rates, params_tag)
+            entry = _SIGNAL_MEMO.get(ticker)
+            if key is not None and entry is not None and entry[0] == key:
+                reused.append(entry[1])
+            else:
+                fresh[ticker] = rates
+                memo_keys[ticker] = key
+
+    if SCAN_WORKERS > 1 and len(fresh) >= SCAN_PARALLEL_MIN_SYMBOLS:
+        # Indicators are computed in the workers; charts compute them on demand
+        ind = compute_indicators({})
+        evaluated = evaluate_parallel(fresh, params)
+    else:
+        # Technical Analysis (RSI, MACD, ATR) for every changed symbol in one pass
+        ind = compute_indicators(fresh)
+        evaluated = evaluate_signals(ind, fresh, params)
+
+    by_ticker = {c.ticker: c for c in evaluated}
+    with _SIGNAL_MEMO_LOCK:
+        for ticker, key in memo_keys.items():
+            if key is not None:
+                _SIGNAL_MEMO[ticker] = (key, by_ticker.get(ticker))
+
+    candidates = evaluated + [_reprice(c, eligible[c.ticker], params) for c in reused if c is not None]
+    order = {t: i for i, t in enumerate(eligible)}
+    candidates.sort(key=lambda c: order[c.ticker])
+
+    result = ScanResult(
+        scanned_at=datetime.now(), created=time.monotonic(), tickers=tuple(tickers),
+        evaluated=tuple(eligible), candidates=tuple(candidates), indicators=ind, rates=eligible,
+        skipped=len(reused),
+    )
+    with _LAST_SCAN_LOCK:
+        _LAST_SCAN["value"] = result
+
+    logger.info(f"🔎 Signal scan: {len(fresh)} evaluated, {len(reused)} skipped (unchanged), "
+                f"{len(tickers) - len(eligible)} without data, {len(candidates)} candidates")
+    return result
+
+
+def get_last_scan(max_age=None):
+    """Most recent ScanResult, or None if there is none or it is older than max_age seconds."""
+    with _LAST_SCAN_LOCK:
+        result = _LAST_SCAN["value"]
+    if result is None or (max_age is not None and result.age() > max_age):
+        return None
+    return result
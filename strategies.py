@@ -1,55 +1,37 @@
-import pandas_ta as ta
-import MetaTrader5 as mt5
-import pandas as pd
+from mt5_gateway import mt5
 import logging
 from datetime import datetime, time
 
 from config import *
 from risk_management import is_drawdown_safe, is_earnings_safe, get_current_currency_exposure, is_instrument_enabled
 from mt5_news_filter import is_trading_blocked
-from utils import get_symbol_category
-from data_provider import get_data, get_universe
-from trade_executor import execute_mt5_trade, close_position_and_orders
+from utils import get_symbol_category, get_symbol_info_stats
+from data_provider import get_data_many, get_universe, get_cache_stats
+from trade_executor import execute_batch, close_position_and_orders
+from instruments import refresh_instrument_index
+from position_book import get_position_book
+from indicators import sync_stream, prune_streams, save_streams
+from signal_engine import scan_universe
 
 logger = logging.getLogger("MT5MasterControl")
 
 
-def calculate_dynamic_stop(df, ticker, order_type):
-    """Calculates SL using unified VOLATILITY_MULT from config."""
-    df.ta.atr(length=14, append=True)
-    atr_cols = [col for col in df.columns if 'ATR' in col.upper()]
-    if not atr_cols: return None
-
-    atr = df[atr_cols[-1]].iloc[-1]
-    curr_price = df['close'].iloc[-1]
-
-    category = get_symbol_category(ticker)
-    multiplier = VOLATILITY_MULT.get(category, 2.0)
-    dist = atr * multiplier
-
-    if order_type == mt5.ORDER_TYPE_BUY:
-        return min(curr_price - dist, df['low'].tail(3).min())
-    else:
-        return max(curr_price + dist, df['high'].tail(3).max())
-
-
 def run_exit_scan():
     """Checks positions and closes only if RSI 50 is hit AND momentum stalls."""
     try:
-        positions = mt5.positions_get()
-        if not positions: return
+        book = get_position_book()
+        if not book: return
 
-        for pos in positions:
-            if pos.magic != MAGIC_NUMBER: continue  # Use constant from config
+        positions = book.for_magic(MAGIC_NUMBER)  # Use constant from config
 
-            rates = mt5.copy_rates_from_pos(pos.symbol, mt5.TIMEFRAME_D1, 0, 50)
-            if rates is None or len(rates) < 2: continue
+        snapshot = get_data_many([p.symbol for p in positions], mt5.TIMEFRAME_D1, STREAM_SEED_BARS)
 
-            df = pd.DataFrame(rates)
-            df.ta.rsi(length=14, append=True)
+        for pos in positions:
+            rates = snapshot.rates.get(pos.symbol)
+            if rates is None or len(rates) < 2: continue
 
-            curr_rsi = df['RSI_14'].iloc[-1]
-            prev_rsi = df['RSI_14'].iloc[-2]
+            # Streaming RSI: only bars closed since the last scan are folded in
+            curr_rsi, prev_rsi, _ = sync_stream(pos.symbol, rates)
 
             # LONG EXIT: RSI hit 50, but only exit if RSI is no longer rising
             if pos.type == mt5.POSITION_TYPE_BUY:
@@ -62,6 +44,9 @@ def run_exit_scan():
                 if curr_rsi <= 50 and curr_rsi >= prev_rsi:
                     logger.info(f"💰 EXIT SHORT: {pos.symbol} RSI {curr_rsi:.1f} (Momentum Stalled)")
                     close_position_and_orders(pos.symbol)
+
+        prune_streams({p.symbol for p in positions})
+        save_streams()
     except Exception as e:
         logger.error(f"Error in exit scan: {e}")
 
@@ -85,24 +70,29 @@ def run_entry_scan():
     """Scans universe and enters positions using MT5."""
     run_exit_scan()
 
-    positions = mt5.positions_get()
-    existing_symbols = {p.symbol for p in positions} if positions else set()
+    # Re-read only if the exit scan closed something
+    existing_symbols = get_position_book().symbols
 
     slots_available = MAX_POSITIONS - len(existing_symbols)
     if slots_available <= 0:
         return
 
-    universe = get_universe()
+    # Cheap unless the broker symbol set or the watchlist changed
+    refresh_instrument_index()
+
+    # Check if this instrument type is currently enabled
+    universe = [t for t in get_universe() if is_instrument_enabled(t)]
+    # Whole-universe evaluation; the result is also reused by the daily advisor
+    scan = scan_universe(universe)
     candidates = []
 
-    for ticker in universe:
-        # Check if this instrument type is currently enabled
-        if not is_instrument_enabled(ticker):
-            continue
+    for cand in scan.candidates:
+        ticker = cand.ticker
+        if ticker in existing_symbols: continue
+        if not cand.is_long and not ALLOW_SHORTS: continue
 
         # --- News Filter Integration ---
-        category = get_symbol_category(ticker)
-        if category == "FOREX":
+        if cand.category == "FOREX":
             # Extract currency components (e.g., 'EURUSD' -> ['EUR', 'USD'])
             currencies = [ticker[:3], ticker[3:]]
             blocked, reason = is_trading_blocked(currencies)
@@ -110,63 +100,24 @@ def run_entry_scan():
                 logger.warning(f"🛑 NEWS BLOCK: Skipping {ticker} due to {reason}")
                 continue
 
-        if ticker in existing_symbols: continue
-
-        df = get_data(ticker)
-        if df.empty or len(df) < 50: continue
-
-        # Technical Analysis (RSI, MACD, Weekly RSI)
-        df.ta.rsi(length=14, append=True)
-        df.ta.macd(fast=12, slow=26, signal=9, append=True)
-        macd_col = df.columns[-3]
-
-        weekly = df.resample('W-FRI', on='timestamp').agg({'close': 'last'}).dropna()
-        if len(weekly) < 2: continue
-        weekly.ta.rsi(length=14, append=True)
-
-        curr, prev = df.iloc[-1], df.iloc[-2]
-        wk_rising = weekly.iloc[-1]['RSI_14'] > weekly.iloc[-2]['RSI_14']
-        wk_falling = weekly.iloc[-1]['RSI_14'] < weekly.iloc[-2]['RSI_14']
-        rsi_history = df['RSI_14'].tail(SIGNAL_DAYS)
-
-        # LONG Logic
-        if (curr['RSI_14'] <= 45 and curr['RSI_14'] > prev['RSI_14'] and
-                curr[macd_col] > prev[macd_col] and wk_rising and (rsi_history < 30).any()):
-
-            # Earnings check for stocks
-            if category == "STOCKS" and not is_earnings_safe(ticker):
-                continue
-
-            # Use the dynamic stop loss
-            stop_price = calculate_dynamic_stop(df, ticker, mt5.ORDER_TYPE_BUY)
-
-            candidates.append({
-                'ticker': ticker, 'type': mt5.ORDER_TYPE_BUY,
-                'score': curr['RSI_14'], 'price': curr['close'], 'stop_price': stop_price,
-                'is_long': True
-            })
-
-        # SHORT Logic
-        elif ALLOW_SHORTS and (curr['RSI_14'] >= 55 and curr['RSI_14'] < prev['RSI_14'] and
-                               curr[macd_col] < prev[macd_col] and wk_falling and (rsi_history > 70).any()):
-
-            # Earnings check for stocks
-            if category == "STOCKS" and not is_earnings_safe(ticker):
-                continue
+        # Earnings check for stocks
+        if cand.category == "STOCKS" and not is_earnings_safe(ticker):
+            continue
 
-            # Use the dynamic stop loss
-            stop_price = calculate_dynamic_stop(df, ticker, mt5.ORDER_TYPE_SELL)
+        candidates.append(cand.to_pick())
 
-            candidates.append({
-                'ticker': ticker, 'type': mt5.ORDER_TYPE_SELL,
-                'score': 100 - curr['RSI_14'], 'price': curr['close'], 'stop_price': stop_price,
-                'is_long': False
-            })
+    stats = get_cache_stats()
+    logger.info(f"📦 Bar cache: {stats['hits']} hits / {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%}), {stats['bars_fetched']} bars fetched total")
+    info_stats = get_symbol_info_stats()
+    logger.info(f"📦 Symbol info cache: {info_stats['hits']} hits / {info_stats['misses']} terminal calls "
+                f"({info_stats['hit_rate']:.0%})")
 
     # --- SORTING LOGIC ---
     # Sort by score: Best Longs (lowest RSI) and Best Shorts (highest RSI) first
     candidates.sort(key=lambda x: x['score'])
     top_picks = candidates[:slots_available]
+    batch = []
 
     for pick in top_picks:
         ticker = pick['ticker']
@@ -174,7 +125,7 @@ def run_entry_scan():
 
         # Apply risk correlation logic only to Forex pairs
         if category == "FOREX":
-            exposure = get_current_currency_exposure(ticker)
+            exposure = get_current_currency_exposure(ticker, pending=[p['ticker'] for p in batch])
 
             if exposure >= MAX_CURRENCY_EXPOSURE:
                 if CORRELATION_MODE == 'BLOCK':
@@ -189,7 +140,10 @@ def run_entry_scan():
             pick['risk_modifier'] = 1.0
 
         if TRADE_ALLOWED:
-            execute_mt5_trade(pick)
+            batch.append(pick)
         else:
             # Still logs the "would-be" trade for your review
             logger.info(f"🔍 SIGNAL ONLY: {pick['ticker']} setup identified (RSI: {pick['score']:.1f})")
+
+    # Sized from one snapshot, validated with order_check, sent back-to-back
+    execute_batch(batch, signal_time=scan.created)
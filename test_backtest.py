@@ -0,0 +1,97 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import history_store
+from backtest import RiskSettings, compute_signals, load_history, offline_instrument, run_backtest
+from indicators import compute_indicators
+from signal_engine import evaluate_signals
+
+FOREX = ("EURUSD", "GBPUSD", "AUDUSD", "NZDUSD")
+
+
+def store_universe(symbols=FOREX, days=400, seed=21):
+    """Random-walk D1 bars for `symbols` in the (temporary) history store; returns the loaded history."""
+    rng = np.random.default_rng(seed)
+    times = pd.bdate_range('2021-01-04', periods=days).values.astype('datetime64[s]').astype('int64')
+    for symbol in symbols:
+        close = 1.2 * np.exp(np.cumsum(rng.normal(0, 0.006, days)))
+        rates = np.zeros(days, dtype=history_store.RATES_DTYPE)
+        rates['time'] = times
+        rates['open'] = np.concatenate(([close[0]], close[:-1]))
+        rates['high'] = np.maximum(rates['open'], close) * (1 + rng.random(days) * 0.003)
+        rates['low'] = np.minimum(rates['open'], close) * (1 - rng.random(days) * 0.003)
+        rates['close'] = close
+        rates['spread'] = 8
+        history_store.append_rates(symbol, 16408, rates)
+    return load_history(symbols, 16408, instruments={s: offline_instrument(s) for s in symbols})
+
+
+def overlapping_pairs(trades):
+    """Trades held at the same time by another trade sharing a currency."""
+    rows = trades.to_dict('records')
+    return sum(
+        1 for a in rows for b in rows
+        if a is not b and a['entry_time'] < b['entry_time'] < a['exit_time']
+        and {a['symbol'][:3], a['symbol'][3:]} & {b['symbol'][:3], b['symbol'][3:]}
+    )
+
+
+def test_compute_signals_matches_the_live_rules_bar_by_bar():
+    history = store_universe()
+    signals = compute_signals(history)
+    fired = 0
+    for symbol, h in history.symbols.items():
+        direction, score, stop = signals[symbol]
+        # Every bar the backtest trades on, plus a sample of the quiet ones
+        for i in sorted(set(np.flatnonzero(direction)) | set(range(60, len(h.time), 20))):
+            window = np.zeros(i + 1, dtype=[('time', 'i8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8')])
+            for column in window.dtype.names:
+                window[column] = getattr(h, column)[:i + 1]
+            live = evaluate_signals(compute_indicators({symbol: window}), {symbol: window},
+                                    categories={symbol: h.instrument.category})
+            assert (direction[i] != 0) == bool(live), f"{symbol} bar {i}"
+            if live:
+                fired += 1
+                assert (direction[i] > 0) == live[0].is_long
+                assert score[i] == pytest.approx(live[0].score)
+                assert stop[i] == pytest.approx(live[0].stop_price)
+    assert fired > 0
+
+
+def test_run_backtest_respects_max_positions_and_correlation_mode():
+    history = store_universe()
+    blocked = run_backtest(history, settings=RiskSettings(max_positions=2, correlation_mode='BLOCK',
+                                                          max_currency_exposure=1))
+    reduced = run_backtest(history, settings=RiskSettings(max_positions=2, correlation_mode='REDUCE',
+                                                          max_currency_exposure=1))
+
+    for result in (blocked, reduced):
+        assert len(result.trades) > 0
+        assert result.equity['positions'].max() <= 2
+        assert set(result.trades['reason']) <= {'STOP', 'KILL', 'RSI_EXIT', 'END'}
+
+    # Every pair shares USD: BLOCK never holds two at once, REDUCE does
+    assert overlapping_pairs(blocked.trades) == 0
+    assert overlapping_pairs(reduced.trades) > 0
+    assert len(reduced.trades) > len(blocked.trades)
+
+
+def test_backtest_imports_without_metatrader5():
+    code = ("import sys; sys.modules['MetaTrader5'] = None\n"
+            "import backtest\n"
+            "assert 'mt5_gateway' not in sys.modules\n"
+            "assert backtest.resolve_instrument('EURUSD') == backtest.offline_instrument('EURUSD')")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                   env={**os.environ, "MT5_BACKEND": "terminal"})
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
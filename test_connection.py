@@ -0,0 +1,63 @@
+import collections
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import utils
+from config import CONNECTION_BACKOFF_BASE, CONNECTION_BREAKER_THRESHOLD
+from connection import ConnectionManager
+
+TerminalInfo = collections.namedtuple('TerminalInfo', 'connected')
+
+
+class FlakyTerminal:
+    def __init__(self):
+        self.up = True
+        self.initialize_calls = 0
+
+    def initialize(self, **kwargs):
+        self.initialize_calls += 1
+        return self.up
+
+    def terminal_info(self):
+        return TerminalInfo(True) if self.up else None
+
+    def last_error(self):
+        return (-10004, "No IPC connection")
+
+    def shutdown(self):
+        self.up = False
+
+
+def test_backoff_and_circuit_breaker():
+    now = [0.0]
+    terminal = FlakyTerminal()
+    manager = ConnectionManager(terminal, clock=lambda: now[0])
+    assert manager.connect() and manager.stats()['samples'] == 1
+
+    terminal.up = False
+    assert not manager.ensure_connected()  # Probe fails, reconnect fails
+    calls = terminal.initialize_calls
+    assert not manager.ensure_connected()  # Backing off: terminal untouched
+    assert terminal.initialize_calls == calls
+
+    for attempt in range(1, CONNECTION_BREAKER_THRESHOLD):
+        now[0] = manager.retry_at
+        manager.ensure_connected()
+    assert manager.failures == CONNECTION_BREAKER_THRESHOLD
+    assert manager.retry_at - now[0] == CONNECTION_BACKOFF_BASE * 2 ** (CONNECTION_BREAKER_THRESHOLD - 1)
+    assert not manager.scans_allowed()
+
+    # Emergencies skip the backoff; recovery closes the circuit and drops cached symbol specs
+    utils._SYMBOL_INFO_CACHE["EURUSD"] = (0.0, object())
+    terminal.up = True
+    assert manager.ensure_connected(force=True)
+    assert "EURUSD" not in utils._SYMBOL_INFO_CACHE
+    assert manager.scans_allowed()
+    stats = manager.stats()
+    assert stats['reconnects'] == 1 and stats['failures'] == 0 and stats['p95_ms'] >= 0
+
+
+if __name__ == "__main__":
+    test_backoff_and_circuit_breaker()
+    print("✅ Connection manager checks passed")
@@ -0,0 +1,120 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+import data_provider
+import fake_mt5
+import history_store
+from data_provider import INCREMENTAL_WINDOW, begin_scan_cycle, get_cache_stats, get_data_many, get_rates, clear_cache
+
+D1 = fake_mt5.TIMEFRAME_D1
+WEDNESDAY = datetime(2026, 10, 14, 12, tzinfo=timezone.utc).timestamp()
+
+
+def start_terminal(at, seed=3):
+    terminal = fake_mt5.reset(seed=seed, clock=at if callable(at) else lambda: at)
+    terminal.initialize()
+    clear_cache()  # A fresh process: only the store survives
+    return terminal
+
+
+def test_gap_wider_than_the_request_resets_the_store():
+    start_terminal(WEDNESDAY)
+    get_rates('EURUSD', D1, 20)
+    assert history_store.last_time('EURUSD', D1) // 86400 == WEDNESDAY // 86400
+
+    # Down for 8 weeks: the 20 newest bars no longer reach the stored ones
+    start_terminal(WEDNESDAY + 56 * 86400)
+    rates = get_rates('EURUSD', D1, 20)
+    stored = history_store.load_rates('EURUSD', D1)
+    assert np.array_equal(stored['time'], rates['time'])
+    assert np.diff(stored['time']).max() <= 3 * 86400  # Weekends only, no hole
+
+
+def test_short_downtime_appends_to_the_store():
+    start_terminal(WEDNESDAY)
+    first = get_rates('EURUSD', D1, 20)
+
+    start_terminal(WEDNESDAY + 7 * 86400)
+    get_rates('EURUSD', D1, 20)
+    stored = history_store.load_rates('EURUSD', D1)
+    assert stored['time'][0] == first['time'][0] and len(stored) == 25
+    assert np.diff(stored['time']).max() <= 3 * 86400
+
+
+def test_tail_refresh_fetches_only_the_newest_bars():
+    now = [WEDNESDAY]
+    terminal = start_terminal(lambda: now[0])
+    before = get_cache_stats()
+    get_rates('EURUSD', D1, 250)
+    stats = get_cache_stats()
+    assert stats['misses'] - before['misses'] == 1 and stats['bars_fetched'] - before['bars_fetched'] == 250
+
+    # The forming bar moves, a bar prints, then one after the weekend: each is a hit that pulls only the tail
+    for step in (3600, 86400, 4 * 86400):
+        now[0] += step
+        before = get_cache_stats()
+        rates = get_rates('EURUSD', D1, 250)
+        stats = get_cache_stats()
+        assert stats['hits'] - before['hits'] == 1 and stats['misses'] == before['misses']
+        assert stats['bars_fetched'] - before['bars_fetched'] == INCREMENTAL_WINDOW
+        assert np.array_equal(rates, terminal.copy_rates_from_pos('EURUSD', D1, 0, 250))
+
+
+def test_one_snapshot_is_shared_across_a_scan_cycle():
+    terminal = start_terminal(WEDNESDAY)
+    begin_scan_cycle()
+    snap = get_data_many(['EURUSD', 'GBPUSD'], D1, 50)
+    assert snap.symbols == ('EURUSD', 'GBPUSD') and not snap.rates['EURUSD'].flags.writeable
+    fetches = terminal.calls['copy_rates_from_pos']
+
+    # Later readers in the cycle get the same arrays; only symbols it did not hold are fetched
+    assert get_data_many(['GBPUSD'], D1, 50) is snap
+    wider = get_data_many(['EURUSD', 'USDJPY'], D1, 50)
+    assert wider.cycle == snap.cycle and wider.rates['EURUSD'] is snap.rates['EURUSD']
+    assert terminal.calls['copy_rates_from_pos'] == fetches + 1
+
+    # The next cycle starts from a fresh snapshot
+    begin_scan_cycle()
+    fresh = get_data_many(['EURUSD'], D1, 50)
+    assert fresh.cycle > snap.cycle and fresh.symbols == ('EURUSD',)
+    assert terminal.calls['copy_rates_from_pos'] == fetches + 2
+
+
+def test_a_symbol_in_flight_is_awaited_not_fetched_twice():
+    terminal = start_terminal(WEDNESDAY)
+    begin_scan_cycle()
+    fetching, release = threading.Event(), threading.Event()
+    fetch, fetches = terminal.copy_rates_from_pos, []
+
+    def slow_fetch(*args):
+        fetches.append(args)
+        fetching.set()
+        release.wait(5)
+        return fetch(*args)
+
+    terminal.copy_rates_from_pos = slow_fetch
+    results = {}
+    first = threading.Thread(target=lambda: results.setdefault('first', get_data_many(['EURUSD'], D1, 50)))
+    first.start()
+    assert fetching.wait(5)
+    second = threading.Thread(target=lambda: results.setdefault('second', get_data_many(['EURUSD'], D1, 50)))
+    second.start()
+    second.join(0.1)  # Parked on the first thread's fetch
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results['first'].rates['EURUSD'] is results['second'].rates['EURUSD']
+    assert len(fetches) == 1
+    assert not data_provider._PENDING
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,74 @@
+import time
+
+import fake_mt5
+from fake_mt5 import FakeTerminal
+
+NOW = 1_760_000_000.0  # A Thursday
+
+
+def make_terminal(**options):
+    terminal = FakeTerminal(seed=3, clock=lambda: NOW, **options)
+    terminal.initialize()
+    return terminal
+
+
+def test_calls_fail_before_initialize():
+    terminal = FakeTerminal(clock=lambda: NOW)
+    assert terminal.account_info() is None
+    assert terminal.last_error()[0] == fake_mt5.RES_E_FAIL
+
+
+def test_rates_are_deterministic_daily_bars():
+    rates = make_terminal().copy_rates_from_pos('EURUSD', fake_mt5.TIMEFRAME_D1, 0, 250)
+    assert len(rates) == 250
+    assert rates['time'][-1] == NOW // 86400 * 86400  # Forming bar last
+    assert (rates['high'] >= rates['low']).all()
+    # No weekend bars outside crypto
+    assert not ((rates['time'] // 86400 + 3) % 7 >= 5).any()
+    again = make_terminal().copy_rates_from_pos('EURUSD', fake_mt5.TIMEFRAME_D1, 1, 10)
+    assert (again == rates[-11:-1]).all()
+
+
+def test_fill_stop_and_deal_history():
+    terminal = make_terminal()
+    tick = terminal.symbol_info_tick('EURUSD')
+    result = terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 1.0,
+                                  'type': fake_mt5.ORDER_TYPE_BUY, 'price': tick.ask, 'sl': tick.bid - 0.01,
+                                  'magic': 999})
+    assert result.retcode == fake_mt5.TRADE_RETCODE_DONE and result.price == tick.ask
+    position, = terminal.positions_get(symbol='EURUSD')
+
+    # Invalid stop above the bid is rejected, a valid one is applied
+    bad = terminal.order_send({'action': fake_mt5.TRADE_ACTION_SLTP, 'position': position.ticket,
+                               'sl': tick.bid + 0.01, 'tp': 0.0})
+    assert bad.retcode == fake_mt5.TRADE_RETCODE_INVALID_STOPS
+    terminal.order_send({'action': fake_mt5.TRADE_ACTION_SLTP, 'position': position.ticket,
+                         'sl': tick.bid - 0.005, 'tp': 0.0})
+
+    terminal.set_price('EURUSD', tick.bid - 0.006)
+    assert terminal.positions_get() == ()
+    deals = terminal.history_deals_get(0, NOW + 1)
+    assert [d.entry for d in deals] == [fake_mt5.DEAL_ENTRY_IN, fake_mt5.DEAL_ENTRY_OUT]
+    # Stopped out at the SL: (sl - ask) * 1 lot * 100000
+    assert deals[-1].profit == round((tick.bid - 0.005 - tick.ask) * 100000, 2)
+    assert terminal.account_info().balance == round(100000 + deals[-1].profit, 2)
+
+
+def test_requotes_and_latency():
+    terminal = make_terminal(requote_probability=1.0, latency={'order_send': 0.02})
+    tick = terminal.symbol_info_tick('XAUUSD')
+    started = time.perf_counter()
+    result = terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': 'XAUUSD', 'volume': 0.1,
+                                  'type': fake_mt5.ORDER_TYPE_SELL, 'price': tick.bid})
+    assert time.perf_counter() - started >= 0.02
+    assert result.retcode == fake_mt5.TRADE_RETCODE_REQUOTE
+    assert terminal.positions_get() == ()
+    assert terminal.calls['order_send'] == 1
+
+
+if __name__ == "__main__":
+    test_calls_fail_before_initialize()
+    test_rates_are_deterministic_daily_bars()
+    test_fill_stop_and_deal_history()
+    test_requotes_and_latency()
+    print("✅ Fake MT5 checks passed")
@@ -0,0 +1,60 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import fake_mt5
+from flatten_engine import FlattenReport, flatten
+
+
+def open_book(terminal):
+    for symbol, order_type in (('EURUSD', fake_mt5.ORDER_TYPE_BUY), ('USDJPY', fake_mt5.ORDER_TYPE_SELL),
+                               ('XAUUSD', fake_mt5.ORDER_TYPE_BUY)):
+        terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': symbol, 'volume': 0.1,
+                             'type': order_type, 'magic': 999})
+    terminal.order_send({'action': fake_mt5.TRADE_ACTION_PENDING, 'symbol': 'GBPUSD', 'volume': 0.1,
+                         'type': fake_mt5.ORDER_TYPE_BUY_LIMIT, 'price': 1.0})
+
+
+def test_flattens_through_requotes():
+    terminal = fake_mt5.reset(seed=2)
+    terminal.initialize()
+    open_book(terminal)
+    terminal.requote_probability = 0.5
+
+    report = flatten(deadline=10, retry_delay=0)
+    assert report.flat and report.closed == 3 and report.cancelled == 1
+    assert report.rejections > 0 and report.passes > 1  # Requoted closes were retried
+    assert terminal.positions_get() == () and terminal.orders_get() == ()
+    # The short was closed with a buy
+    closes = [d for d in terminal.history_deals_get(0, 2 ** 31) if d.entry == fake_mt5.DEAL_ENTRY_OUT]
+    assert {d.symbol: d.type for d in closes}['USDJPY'] == fake_mt5.DEAL_TYPE_BUY
+
+
+def test_reports_what_is_left_at_the_deadline():
+    terminal = fake_mt5.reset(seed=2)
+    terminal.initialize()
+    open_book(terminal)
+    terminal.requote_probability = 1.0
+
+    report = flatten(deadline=0.05, retry_delay=0.01)
+    assert not report.flat and report.closed == 0 and report.cancelled == 1
+    assert len(report.remaining) == 3 and report.seconds >= 0.05
+
+
+def test_an_unreadable_book_is_not_reported_as_flat():
+    terminal = fake_mt5.reset(seed=2)
+    terminal.initialize()
+    open_book(terminal)
+    terminal.positions_get = lambda **kwargs: None  # The terminal never answers
+
+    report = flatten(deadline=0.05, retry_delay=0.01)
+    assert not report.flat and report.passes == 0 and report.book_unread
+    assert "unreadable" in report.summary()
+    assert not FlattenReport(flat=True).book_unread
+
+
+if __name__ == "__main__":
+    test_flattens_through_requotes()
+    test_reports_what_is_left_at_the_deadline()
+    test_an_unreadable_book_is_not_reported_as_flat()
+    print("✅ Flatten engine checks passed")
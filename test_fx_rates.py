@@ -0,0 +1,33 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import fake_mt5
+from fx_rates import build_rate_matrix
+from instruments import build_instrument_index
+
+
+def test_matrix_matches_quoted_pairs_and_triangulates():
+    terminal = fake_mt5.reset(seed=4)
+    terminal.initialize()
+    build_instrument_index()
+    calls = terminal.calls.get('symbol_info_tick', 0)
+
+    matrix = build_rate_matrix()
+    # One tick per leg, fetched once
+    assert terminal.calls['symbol_info_tick'] - calls == len(matrix.pairs)
+    bid = lambda symbol: terminal.symbol_info_tick(symbol).bid
+    assert {'USD', 'EUR', 'GBP', 'JPY', 'CHF', 'CAD', 'AUD', 'NZD'} <= set(matrix.currencies)
+    assert matrix.to_usd('USD') == 1.0
+    assert matrix.to_usd('GBP') == bid('GBPUSD')
+    assert matrix.to_usd('JPY') == 1.0 / bid('USDJPY')
+    # A quoted cross is used as is; an unquoted one goes through USD
+    assert matrix.rate('EUR', 'JPY') == bid('EURJPY')
+    assert matrix.rate('JPY', 'EUR') == 1.0 / bid('EURJPY')
+    assert matrix.rate('EUR', 'GBP') == matrix.to_usd('EUR') / matrix.to_usd('GBP')
+    assert matrix.to_usd('SEK') is None
+
+
+if __name__ == "__main__":
+    test_matrix_matches_quoted_pairs_and_triangulates()
+    print("✅ Conversion matrix checks passed")
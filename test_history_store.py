@@ -0,0 +1,49 @@
+import numpy as np
+
+import history_store
+
+
+def make_rates(start_day, days, close_offset=0.0):
+    rates = np.zeros(days, dtype=history_store.RATES_DTYPE)
+    rates['time'] = (np.arange(days) + start_day) * 86400
+    rates['close'] = np.arange(days) + start_day + close_offset
+    return rates
+
+
+def test_append_and_patch_forming_bar(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_STORE_DIR", str(tmp_path))
+
+    history_store.append_rates("EURUSD", 16408, make_rates(0, 10))
+    # Overlapping tail: bar 9 was still forming, bar 10 is new
+    history_store.append_rates("EURUSD", 16408, make_rates(9, 2, close_offset=0.5))
+
+    rates = history_store.load_rates("EURUSD", 16408)
+    assert len(rates) == 11
+    assert rates['close'][8] == 8.0
+    assert rates['close'][9] == 9.5
+    assert history_store.last_time("EURUSD", 16408) == 10 * 86400
+    assert history_store.list_series() == [("EURUSD", 16408)]
+
+    # A warm start reads only the tail it needs
+    tail = history_store.load_rates("EURUSD", 16408, count=3)
+    assert list(tail['close']) == [8.0, 9.5, 10.5]
+    assert len(history_store.load_rates("EURUSD", 16408, count=50)) == 11
+
+
+def test_replace_drops_the_old_series(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_STORE_DIR", str(tmp_path))
+    history_store.append_rates("EURUSD", 16408, make_rates(0, 10))
+    history_store.replace_rates("EURUSD", 16408, make_rates(100, 3))
+    rates = history_store.load_rates("EURUSD", 16408)
+    assert list(rates['time'] // 86400) == [100, 101, 102]
+
+
+def test_missing_series(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_STORE_DIR", str(tmp_path))
+    assert history_store.load_rates("GBPUSD", 16408) is None
+    assert history_store.load_frame("GBPUSD", 16408).empty
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
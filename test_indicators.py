@@ -0,0 +1,150 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+
+def make_universe():
+    rng = np.random.default_rng(7)
+    universe = {}
+    for i, length in enumerate([250, 120, 60]):
+        close = 100 + np.cumsum(rng.normal(0, 1, length))
+        rates = np.zeros(length, dtype=[('high', 'f8'), ('low', 'f8'), ('close', 'f8')])
+        rates['close'] = close
+        rates['high'] = close + rng.random(length)
+        rates['low'] = close - rng.random(length)
+        universe[f"SYM{i}"] = rates
+    return universe
+
+
+def test_matches_pandas_ta_classic():
+    ta = pytest.importorskip("pandas_ta_classic")
+    universe = make_universe()
+    ind = indicators.compute_indicators(universe)
+
+    for symbol, rates in universe.items():
+        close, high, low = (pd.Series(rates[c]) for c in ('close', 'high', 'low'))
+        macd = ta.macd(close, 12, 26, 9)
+        expected = {
+            'rsi': ta.rsi(close, 14), 'macd': macd['MACD_12_26_9'], 'macd_hist': macd['MACDh_12_26_9'],
+            'macd_signal': macd['MACDs_12_26_9'], 'atr': ta.atr(high, low, close, 14),
+        }
+        for name, ref in expected.items():
+            ours = ind.series(name, symbol)
+            assert np.array_equal(np.isnan(ours), ref.isna().values), f"{symbol} {name} NaN layout"
+            assert np.allclose(ours, ref.values, rtol=1e-10, atol=1e-10, equal_nan=True), f"{symbol} {name}"
+
+
+def test_padding_does_not_change_results():
+    universe = make_universe()
+    together = indicators.compute_indicators(universe)
+    for symbol, rates in universe.items():
+        alone = indicators.compute_indicators({symbol: rates})
+        assert np.array_equal(together.series('rsi', symbol), alone.series('rsi', symbol), equal_nan=True)
+        assert np.array_equal(together.series('macd', symbol), alone.series('macd', symbol), equal_nan=True)
+
+
+def test_stream_matches_kernel_and_round_trips():
+    rates = make_universe()["SYM0"]
+    timed = np.zeros(len(rates), dtype=[('time', 'i8')] + rates.dtype.descr)
+    timed['time'] = np.arange(len(rates)) * 86400
+    for column in rates.dtype.names:
+        timed[column] = rates[column]
+    batch = indicators.compute_indicators({"SYM0": timed})
+
+    stream = indicators.SymbolStream()
+    stream.sync(timed[:150])
+    for end in range(151, len(timed) + 1):
+        # Each pass sees a short tail whose last bar is still forming
+        stream.sync(timed[max(0, end - 50):end])
+
+    assert np.isclose(stream.rsi, batch.rsi[0, -1], rtol=1e-12)
+    assert np.isclose(stream.prev_rsi, batch.rsi[0, -2], rtol=1e-12)
+    assert np.isclose(stream.atr, batch.atr[0, -1], rtol=1e-12)
+
+    restored = indicators.SymbolStream.from_dict(json.loads(json.dumps(stream.to_dict())))
+    assert restored == stream
+
+
+def test_stream_seed_depth_does_not_depend_on_the_caller():
+    rng = np.random.default_rng(12)
+    timed = np.zeros(400, dtype=[('time', 'i8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8')])
+    timed['time'] = np.arange(400) * 86400
+    timed['close'] = 100 + np.cumsum(rng.normal(0, 1, 400))
+    timed['high'], timed['low'] = timed['close'] + rng.random(400), timed['close'] - rng.random(400)
+
+    # The exit scan hands over a deep snapshot, the trailing engine exactly STREAM_SEED_BARS
+    deep, exact = indicators.SymbolStream(), indicators.SymbolStream()
+    deep.sync(timed)
+    exact.sync(timed[-indicators.STREAM_SEED_BARS:])
+    assert deep == exact
+
+
+def test_saved_streams_reload_and_older_formats_reseed(monkeypatch):
+    rates = np.zeros(40, dtype=[('time', 'i8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8')])
+    rates['time'] = np.arange(40) * 86400
+    rates['close'] = 100 + np.sin(np.arange(40))
+    rates['high'], rates['low'] = rates['close'] + 1, rates['close'] - 1
+    monkeypatch.setattr(indicators, "_STREAMS", {})
+    monkeypatch.setattr(indicators, "_STREAMS_LOADED", {"value": True})
+    expected = indicators.sync_stream("EURUSD", rates)
+    indicators.save_streams()
+
+    monkeypatch.setattr(indicators, "_STREAMS", {})
+    monkeypatch.setattr(indicators, "_STREAMS_LOADED", {"value": False})
+    indicators._load_streams_locked()
+    assert indicators._STREAMS["EURUSD"].rsi == expected[0]
+
+    # A file written before the SMA-seeded RMA holds num/den recurrences: ignored, not misread
+    with open(indicators.INDICATOR_STATE_PATH, 'w') as f:
+        json.dump({"EURUSD": {"rsi_state": {"gain": {"length": 14, "num": 1.0, "den": 2.0, "obs": 3}}}}, f)
+    monkeypatch.setattr(indicators, "_STREAMS", {})
+    monkeypatch.setattr(indicators, "_STREAMS_LOADED", {"value": False})
+    indicators._load_streams_locked()
+    assert indicators._STREAMS == {}
+
+
+def test_weekly_rsi_matches_resample():
+    ta = pytest.importorskip("pandas_ta_classic")
+    rng = np.random.default_rng(11)
+    days = pd.bdate_range('2022-01-03', periods=300)
+    rates = np.zeros(len(days), dtype=[('time', 'i8'), ('close', 'f8')])
+    rates['time'] = days.values.astype('datetime64[s]').astype('int64')
+    rates['close'] = 100 + np.cumsum(rng.normal(0, 1, len(days)))
+
+    def resampled(r):
+        df = pd.DataFrame({'timestamp': pd.to_datetime(r['time'], unit='s'), 'close': r['close']})
+        weekly = df.resample('W-FRI', on='timestamp').agg({'close': 'last'}).dropna()
+        return ta.rsi(weekly['close'], 14)
+
+    prev, curr = indicators.weekly_rsi({"WK": rates})["WK"]
+    expected = resampled(rates)
+    assert np.isclose(prev, expected.iloc[-2], rtol=1e-12)
+    assert np.isclose(curr, expected.iloc[-1], rtol=1e-12)
+
+    # Same window and week: served from the cached state with only the forming close changed
+    rates['close'][-1] += 2.5
+    _, curr = indicators.weekly_rsi({"WK": rates})["WK"]
+    assert np.isclose(curr, resampled(rates).iloc[-1], rtol=1e-12)
+
+
+def test_weekly_rsi_series_matches_weekly_rsi():
+    rng = np.random.default_rng(13)
+    days = pd.bdate_range('2021-01-04', periods=260)
+    rates = np.zeros(len(days), dtype=[('time', 'i8'), ('close', 'f8')])
+    rates['time'] = days.values.astype('datetime64[s]').astype('int64')
+    rates['close'] = 50 + np.cumsum(rng.normal(0, 1, len(days)))
+
+    prev, curr = indicators.weekly_rsi_series(rates['time'], rates['close'])
+    for t in (80, 81, 150, 259):
+        indicators._WEEKLY_CACHE.clear()
+        expected = indicators.weekly_rsi({"WK": rates[:t + 1]})["WK"]
+        assert np.allclose((prev[t], curr[t]), expected, rtol=1e-12)
+    assert np.isnan(curr[0])
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,78 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+from types import SimpleNamespace
+
+import pytest
+
+import fake_mt5
+import instruments
+
+
+def test_refresh_rebuilds_on_a_symbol_swap_with_the_same_count():
+    terminal = fake_mt5.reset(seed=1)
+    terminal.initialize()
+    assert instruments.build_instrument_index()
+    builds = terminal.calls['symbols_get']
+
+    # Nothing changed: one filtered symbols_get for the fingerprint, no rebuild
+    assert instruments.refresh_instrument_index()
+    assert terminal.calls['symbols_get'] == builds + 1
+    assert instruments.get_instrument('EURUSD') is not None
+
+    # The broker renames EURUSD: same symbol count, different names
+    total = terminal.symbols_total()
+    terminal._specs['EURUSD.r'] = terminal._specs.pop('EURUSD')
+    try:
+        assert terminal.symbols_total() == total
+        assert instruments.refresh_instrument_index()
+        assert instruments.get_instrument('EURUSD') is None
+        assert instruments.get_instrument('EURUSD.r').category == 'FOREX'
+    finally:
+        # Later tests share the module-level index
+        fake_mt5.reset(seed=1).initialize()
+        instruments.build_instrument_index()
+
+
+def test_a_failed_build_is_retried_by_the_next_lookup(monkeypatch):
+    terminal = fake_mt5.reset(seed=1)
+    terminal.initialize()
+    monkeypatch.setitem(instruments._FINGERPRINT, "value", None)
+    attempts = []
+    monkeypatch.setattr(terminal, "symbols_get", lambda group=None: attempts.append(group))  # Always None
+    instruments.get_instrument('EURUSD')
+    instruments.get_instrument('GBPUSD')
+    assert len(attempts) == 2 and instruments._FINGERPRINT["value"] is None
+
+    # The terminal answers again: the very next lookup builds the index
+    monkeypatch.undo()
+    monkeypatch.setitem(instruments._FINGERPRINT, "value", None)
+    assert instruments.get_instrument('EURUSD').category == 'FOREX'
+    assert instruments._FINGERPRINT["value"] is not None
+
+
+@pytest.mark.parametrize("symbol, path, expected", [
+    # Not in CATEGORY_MAP, no telling path: the watchlist sector decides
+    ('SP500', 'CFD\\SP500', 'INDICES'),
+    ('JPN225', 'CFD\\JPN225', 'INDICES'),
+    ('DAX40', 'CFD\\DAX40', 'INDICES'),
+    ('AAPL', 'CFD\\AAPL', 'STOCKS'),
+    # The map and the MT5 path still win over the sector
+    ('US30', 'CFD\\US30', 'INDICES'),
+    ('XAUUSD', 'CFD\\XAUUSD', 'METALS'),
+    ('EURUSD', 'Forex\\EURUSD', 'FOREX'),
+])
+def test_category_falls_back_to_the_watchlist_sector(symbol, path, expected):
+    sector = instruments.get_watchlist_sector(symbol)
+    assert instruments.classify_category(symbol, SimpleNamespace(path=path), sector) == expected
+    assert instruments.classify_category(symbol, None, sector) == expected
+
+
+def test_symbols_in_no_map_path_or_sector_stay_forex():
+    assert instruments.classify_category('ABCDEF', SimpleNamespace(path='CFD\\ABCDEF'), None) == 'FOREX'
+
+
+if __name__ == "__main__":
+    test_refresh_rebuilds_on_a_symbol_swap_with_the_same_count()
+    print("✅ Instrument index checks passed")
@@ -0,0 +1,68 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import numpy as np
+import pandas as pd
+
+import fake_mt5
+import monte_carlo
+from config import MAGIC_NUMBER
+
+
+def test_certain_outcomes():
+    # One +1R trade every day at 1% risk: the 8% target is reached on day 8 on every path
+    stats = monte_carlo.simulate_challenge([1.0], 50, risk_pct=0.01, paths=200, days=30,
+                                           max_positions=1, target=0.08, seed=1)
+    assert stats.pass_probability == 1.0
+    assert np.all(stats.days_to_target == 8)
+
+    # Three -1R stop-outs in a day at 2% risk breach the 4.7% daily limit on day 1
+    stats = monte_carlo.simulate_challenge([-1.0], 50, risk_pct=0.02, paths=200, days=30,
+                                           max_positions=3, daily_limit=0.047, seed=1)
+    assert stats.breach_probability == 1.0
+    assert stats.daily_breach_probability == 1.0
+
+
+def test_backtest_outcomes_and_probabilities_sum_to_one():
+    trades = pd.DataFrame({
+        'exit_time': [86400 * d for d in (4, 5, 6, 7, 8)],  # Mon..Fri, 5 Jan 1970
+        'r_multiple': [2.0, -1.0, -1.0, 1.5, -0.5],
+        'reason': ['RSI_EXIT', 'STOP', 'STOP', 'RSI_EXIT', 'END'],
+    })
+    r, frequency = monte_carlo.outcomes_from_backtest(trades)
+    assert list(r) == [2.0, -1.0, -1.0, 1.5]
+    assert frequency == 1.0
+
+    stats = monte_carlo.simulate_challenge(r, frequency, paths=12000, days=60, seed=7)
+    total = stats.pass_probability + stats.breach_probability + stats.unresolved_probability
+    assert np.isclose(total, 1.0)
+    assert len(stats.days_to_target) == round(stats.pass_probability * stats.paths)
+
+
+def test_samples_the_bots_deals_through_the_gateway():
+    terminal = fake_mt5.reset(seed=3)
+    terminal.initialize()
+    for move in (0.004, -0.002, 0.001):
+        opened = terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 1.0,
+                                      'type': fake_mt5.ORDER_TYPE_BUY, 'magic': MAGIC_NUMBER})
+        terminal.set_price('EURUSD', terminal.symbol_info_tick('EURUSD').bid + move)
+        terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 1.0,
+                             'type': fake_mt5.ORDER_TYPE_SELL, 'position': opened.order, 'magic': MAGIC_NUMBER})
+
+    # No --trades: the connection manager attaches to the terminal and shuts it down afterwards
+    terminal.shutdown()
+    table = monte_carlo.main(["--paths", "200", "--days", "20", "--seed", "1"])
+    assert len(table) == 1
+    assert terminal.calls['initialize'] == 2 and not terminal.connected
+
+    terminal.initialize()
+    r, frequency = monte_carlo.outcomes_from_mt5(days=30)
+    assert len(r) == 3 and (r > 0).sum() == 2 and frequency > 0
+
+
+if __name__ == "__main__":
+    test_certain_outcomes()
+    test_backtest_outcomes_and_probabilities_sum_to_one()
+    test_samples_the_bots_deals_through_the_gateway()
+    print("✅ Monte Carlo simulator checks passed")
@@ -1,4 +1,4 @@
-import MetaTrader5 as mt5
+from mt5_gateway import mt5
 import pandas_ta_classic
 
 from config import MT5_LOGIN, MT5_PASSWORD, MT5_SERVER
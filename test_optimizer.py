@@ -0,0 +1,81 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import optimizer
+from backtest import RiskSettings, run_backtest
+from test_backtest import store_universe
+
+
+def equity_curve(days, values, daily_drawdown=None):
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(days),
+        'equity': values,
+        'daily_drawdown': daily_drawdown if daily_drawdown is not None else np.zeros(len(values)),
+    })
+
+
+def test_prop_pass_rate_counts_resolved_monthly_attempts():
+    equity = equity_curve(
+        ['2024-01-02', '2024-01-20', '2024-02-01', '2024-02-15', '2024-03-01', '2024-03-15'],
+        [100.0, 109.0, 109.0, 109.0, 98.0, 98.5],
+        daily_drawdown=[0.0, 0.0, 0.0, 0.0, 0.10, 0.0],
+    )
+    # January reaches +8% first; February and March hit the daily limit on 1 March first
+    rate, attempts = optimizer.prop_pass_rate(equity)
+    assert attempts == 3 and rate == pytest.approx(1 / 3)
+
+    # Flat equity never resolves
+    assert optimizer.prop_pass_rate(equity_curve(['2024-01-02', '2024-02-01'], [100.0, 100.0])) == (0.0, 0)
+
+
+def test_rank_results_orders_by_mean_metric_rank():
+    results = pd.DataFrame({
+        'total_return': [0.05, 0.20, 0.10],
+        'max_daily_drawdown': [0.01, 0.04, 0.02],
+        'pass_rate': [0.2, 0.6, 0.5],
+    })
+    ranked = optimizer.rank_results(results)
+    assert list(ranked['total_return']) == [0.20, 0.10, 0.05]
+    assert list(ranked['rank']) == pytest.approx([5 / 3, 2.0, 7 / 3])
+
+
+def test_two_point_sweep_matches_direct_backtests_and_falls_back_to_csv(tmp_path, monkeypatch):
+    history = store_universe()
+    grid = {'risk_per_trade_pct': [0.0025, 0.01]}
+    results = optimizer.run_sweep(grid, history=history, workers=2)
+
+    assert sorted(results['risk_per_trade_pct']) == grid['risk_per_trade_pct']
+    assert list(results['rank']) == sorted(results['rank'])
+    for row in results.to_dict('records'):
+        direct = run_backtest(history, settings=RiskSettings(risk_per_trade_pct=row['risk_per_trade_pct']))
+        assert row['total_return'] == pytest.approx(direct.summary()['total_return'])
+        assert (row['pass_rate'], row['attempts']) == pytest.approx(optimizer.prop_pass_rate(direct.equity))
+
+    def no_parquet_engine(*args, **kwargs):
+        raise ImportError("Unable to find a usable engine")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", no_parquet_engine)
+    path = optimizer.write_results(results, str(tmp_path / "sweep.parquet"))
+    assert path == str(tmp_path / "sweep.csv")
+    pd.testing.assert_frame_equal(pd.read_csv(path), results, check_dtype=False)
+
+
+def test_optimizer_imports_without_metatrader5():
+    # Sweeps run on workers that have the history store but no terminal
+    code = ("import sys; sys.modules['MetaTrader5'] = None\n"
+            "import optimizer\n"
+            "assert 'mt5_gateway' not in sys.modules")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                   env={**os.environ, "MT5_BACKEND": "terminal"})
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
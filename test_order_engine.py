@@ -0,0 +1,98 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import fake_mt5
+from instruments import build_instrument_index
+from order_engine import Histogram, send_order, get_order_stats, reset_order_stats
+
+
+def buy(terminal, symbol='EURUSD'):
+    tick = terminal.symbol_info_tick(symbol)
+    return {'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': symbol, 'volume': 0.1,
+            'type': fake_mt5.ORDER_TYPE_BUY, 'price': tick.ask, 'magic': 999}
+
+
+def setup_terminal(**options):
+    terminal = fake_mt5.reset(seed=9, **options)
+    terminal.initialize()
+    build_instrument_index()
+    reset_order_stats()
+    return terminal
+
+
+def test_requotes_are_repriced_until_filled():
+    terminal = setup_terminal(requote_probability=0.8, slippage_points=3)
+    results = [send_order(buy(terminal), max_retries=30) for _ in range(5)]
+    assert all(r.retcode == fake_mt5.TRADE_RETCODE_DONE for r in results)
+    assert all(r.request.deviation == 20 for r in results)  # FOREX default
+
+    stats = get_order_stats('FOREX')
+    assert stats['retries'] > 0 and stats['failed'] == 0
+    assert stats['latency_ms']['count'] == terminal.calls['order_send']
+    assert stats['slippage_points']['count'] == 5
+    assert 0 <= stats['slippage_points']['max'] <= 3
+
+
+def test_retry_budget_is_bounded():
+    terminal = setup_terminal(requote_probability=1.0)
+    result = send_order(buy(terminal, 'XAUUSD'), max_retries=2)
+    assert result.retcode == fake_mt5.TRADE_RETCODE_REQUOTE
+    assert result.request.deviation == 50  # METALS
+    assert terminal.calls['order_send'] == 3
+    assert get_order_stats()['failed'] == 1
+
+
+def test_lost_replies_are_reconciled_not_resent():
+    terminal = setup_terminal(lost_reply_probability=1.0)
+    request = dict(buy(terminal), comment="Sid Bot Entry")
+    result = send_order(request)
+    assert result.retcode == fake_mt5.TRADE_RETCODE_DONE and result.comment == "Reconciled"
+    assert terminal.calls['order_send'] == 1
+    assert len(terminal.positions_get(symbol='EURUSD')) == 1  # Opened once, not once per retry
+
+    # The stop move and the close also executed before their replies were lost
+    ticket = terminal.positions_get(symbol='EURUSD')[0].ticket
+    sl = round(terminal.symbol_info_tick('EURUSD').bid - 0.01, 5)
+    assert send_order({'action': fake_mt5.TRADE_ACTION_SLTP, 'symbol': 'EURUSD', 'position': ticket,
+                       'sl': sl, 'tp': 0.0}).comment == "Reconciled"
+    close = dict(request, type=fake_mt5.ORDER_TYPE_SELL, position=ticket,
+                 price=terminal.symbol_info_tick('EURUSD').bid)
+    assert send_order(close).retcode == fake_mt5.TRADE_RETCODE_DONE
+    assert terminal.calls['order_send'] == 3 and terminal.positions_get() == ()
+    assert get_order_stats()['reconciled'] == 3
+
+
+def test_unexecuted_requests_are_resent_after_a_lost_reply():
+    terminal = setup_terminal()
+    real_send = terminal.order_send
+    dropped = []
+
+    def drop_first(request):
+        # The first send never reaches the server: nothing executes and no reply comes back
+        if not dropped:
+            dropped.append(request)
+            return None
+        return real_send(request)
+
+    terminal.order_send = drop_first
+    result = send_order(buy(terminal))
+    assert result.retcode == fake_mt5.TRADE_RETCODE_DONE and result.comment != "Reconciled"
+    assert len(terminal.positions_get()) == 1 and get_order_stats()['retries'] == 1
+
+
+def test_histogram_quantiles():
+    hist = Histogram((1, 5, 10))
+    for value in (0.5, 2, 3, 4, 7, 50):
+        hist.add(value)
+    assert hist.to_dict()['buckets'] == {'<=1': 1, '<=5': 3, '<=10': 1, '>10': 1}
+    assert hist.quantile(0.5) == 5 and hist.quantile(1.0) == 50
+
+
+if __name__ == "__main__":
+    test_requotes_are_repriced_until_filled()
+    test_retry_budget_is_bounded()
+    test_lost_replies_are_reconciled_not_resent()
+    test_unexecuted_requests_are_resent_after_a_lost_reply()
+    test_histogram_quantiles()
+    print("✅ Order engine checks passed")
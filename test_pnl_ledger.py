@@ -0,0 +1,97 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+from datetime import datetime, timezone
+
+import pytest
+
+import fake_mt5
+import pnl_ledger
+import risk_management
+from pnl_ledger import PnLLedger
+
+
+def round_trip(terminal, symbol, move):
+    """Opens a long, moves the bid by `move` and closes it; returns the realised profit."""
+    opened = terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': symbol, 'volume': 1.0,
+                                  'type': fake_mt5.ORDER_TYPE_BUY})
+    terminal.set_price(symbol, terminal.symbol_info_tick(symbol).bid + move)
+    closed = terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': symbol, 'volume': 1.0,
+                                  'type': fake_mt5.ORDER_TYPE_SELL, 'position': opened.order})
+    return terminal.history_deals_get(ticket=closed.order)[-1].profit
+
+
+def test_tracks_the_day_incrementally_and_rolls_over():
+    now = [datetime(2026, 10, 13, 20, tzinfo=timezone.utc).timestamp()]  # Tuesday 20:00 server time
+    terminal = fake_mt5.reset(seed=6, clock=lambda: now[0])
+    terminal.initialize()
+    ledger = PnLLedger(terminal=terminal, clock=lambda: now[0], rollover_hour=22)
+
+    yesterday = round_trip(terminal, 'EURUSD', -0.004)
+    now[0] += 3 * 3600  # 23:00: a new trading day since 22:00
+    today = round_trip(terminal, 'EURUSD', 0.006)
+
+    pnl = ledger.refresh()
+    assert pnl.deals == 2 and pnl.realized == pytest.approx(today)
+    assert pnl.start_balance == pytest.approx(100000.0 + yesterday)
+    assert pnl.drawdown == pytest.approx(-today / pnl.start_balance)
+
+    # Only deals after the last ticket are pulled
+    loss = round_trip(terminal, 'GBPUSD', -0.01)
+    pnl = ledger.refresh()
+    assert ledger.stats()['deals_pulled'] == 4
+    assert pnl.deals == 4 and pnl.realized == pytest.approx(today + loss)
+    assert pnl.start_balance == pytest.approx(100000.0 + yesterday)
+    assert pnl.peak_equity == pytest.approx(100000.0 + yesterday + today)
+    assert pnl.drawdown_from_peak > 0
+    assert ledger.snapshot(max_age=60) is pnl
+
+    # The next 22:00 re-bases the day on the current balance
+    now[0] += 86400
+    pnl = ledger.refresh()
+    assert pnl.deals == 0 and pnl.realized == 0.0
+    assert pnl.start_balance == pytest.approx(terminal.account_info().balance)
+
+
+def test_reads_the_server_offset_off_the_tick_clock_across_dst():
+    now = [datetime(2026, 10, 13, 18, tzinfo=timezone.utc).timestamp()]  # Tuesday 18:00 UTC
+    offset = [3 * 3600]  # Server on UTC+3 (summer)
+    terminal = fake_mt5.reset(seed=6, clock=lambda: now[0] + offset[0] + 7)  # A tick 7s old
+    terminal.initialize()
+    ledger = PnLLedger(terminal=terminal, clock=lambda: now[0], rollover_hour=22, utc_offset_hours=None)
+
+    round_trip(terminal, 'EURUSD', -0.004)  # 21:00 server time: still yesterday
+    now[0] += 2 * 3600  # 23:00 server time
+    today = round_trip(terminal, 'EURUSD', 0.006)
+    pnl = ledger.refresh()
+    assert ledger.offset == 3 * 3600
+    assert pnl.deals == 2 and pnl.realized == pytest.approx(today)
+
+    # Winter time: the broker moves to UTC+2 and the ledger follows
+    offset[0] = 2 * 3600
+    now[0] += 60
+    ledger.refresh()
+    assert ledger.offset == 2 * 3600
+
+
+def test_a_stale_tick_without_a_configured_offset_is_not_a_breach(monkeypatch, caplog):
+    now = [datetime(2026, 10, 17, 12, tzinfo=timezone.utc).timestamp()]  # Saturday: no fresh ticks
+    terminal = fake_mt5.reset(seed=6, clock=lambda: now[0] + 3 * 3600 - 900)  # Stale: 15 min off the grid
+    terminal.initialize()
+    ledger = PnLLedger(terminal=terminal, clock=lambda: now[0], utc_offset_hours=None)
+    monkeypatch.setattr(pnl_ledger, "ledger", ledger)
+
+    assert risk_management.is_drawdown_safe(limit=0.047)
+    assert ledger.offset is None and "assuming UTC" in caplog.text
+    pnl = ledger.refresh()
+    assert pnl.deals == 0 and pnl.drawdown == 0
+
+    # A configured offset needs no tick at all
+    pnl = PnLLedger(terminal=terminal, clock=lambda: now[0], utc_offset_hours=3).refresh()
+    assert pnl.deals == 0
+
+if __name__ == "__main__":
+    test_tracks_the_day_incrementally_and_rolls_over()
+    test_reads_the_server_offset_off_the_tick_clock_across_dst()
+    print("✅ P&L ledger checks passed")
@@ -0,0 +1,45 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import fake_mt5
+from config import MAGIC_NUMBER
+from mt5_gateway import mt5
+from position_book import get_position_book, get_position_book_stats
+
+
+def open_position(symbol, magic):
+    tick = mt5.symbol_info_tick(symbol)
+    return mt5.order_send({'action': mt5.TRADE_ACTION_DEAL, 'symbol': symbol, 'volume': 0.1,
+                           'type': mt5.ORDER_TYPE_BUY, 'price': tick.ask, 'magic': magic})
+
+
+def test_book_is_shared_until_an_order_is_sent():
+    terminal = fake_mt5.reset(seed=5)
+    terminal.initialize()
+    open_position('EURUSD', MAGIC_NUMBER)
+    open_position('GBPUSD', 1)
+
+    book = get_position_book()
+    assert get_position_book() is book
+    assert terminal.calls['positions_get'] == 1
+    assert book.symbols == {'EURUSD', 'GBPUSD'}
+    assert [p.symbol for p in book.for_magic(MAGIC_NUMBER)] == ['EURUSD']
+    assert book.for_symbol('USDJPY') == ()
+
+    # A fill invalidates the snapshot without waiting for the TTL
+    open_position('USDJPY', MAGIC_NUMBER)
+    book = get_position_book()
+    assert terminal.calls['positions_get'] == 2
+    assert len(book.for_magic(MAGIC_NUMBER)) == 2
+    assert book.by_ticket[book.for_symbol('USDJPY')[0].ticket].symbol == 'USDJPY'
+
+    # An expired snapshot is re-read
+    get_position_book(max_age=0)
+    assert terminal.calls['positions_get'] == 3
+    assert get_position_book_stats()['hits'] >= 1
+
+
+if __name__ == "__main__":
+    test_book_is_shared_until_an_order_is_sent()
+    print("✅ Position book checks passed")
@@ -0,0 +1,49 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+os.environ.setdefault("EMAIL_RECEIVER", "advisor@example.com")
+
+import pytest
+
+pytest.importorskip("plotly")
+pytest.importorskip("resend")
+
+import fake_mt5
+import prop_sid_advisor
+import signal_engine
+from data_provider import clear_cache
+from config import TRADE_SETTINGS
+from prop_watchlist import WATCHLIST, WATCHLIST_SECTORS
+
+
+def test_reuses_the_bots_scan_and_skips_unknown_instruments(monkeypatch):
+    fake_mt5.reset(seed=1).initialize()
+    clear_cache()
+    signal_engine.clear_signal_memo()
+    bot_scan = signal_engine.scan_universe(list(dict.fromkeys(WATCHLIST)))
+    assert bot_scan.candidates
+
+    def no_rescan(tickers):
+        raise AssertionError("the advisor should reuse the bot's scan")
+
+    emails = []
+    unknown = bot_scan.candidates[0].ticker
+    real_get_instrument = prop_sid_advisor.get_instrument
+    monkeypatch.setattr(prop_sid_advisor, "scan_universe", no_rescan)
+    monkeypatch.setattr(prop_sid_advisor, "is_earnings_safe", lambda ticker: True)
+    monkeypatch.setattr(prop_sid_advisor, "get_instrument",
+                        lambda ticker: None if ticker == unknown else real_get_instrument(ticker))
+    monkeypatch.setattr(prop_sid_advisor, "send_advisor_email", lambda *args: emails.append(args))
+
+    prop_sid_advisor.run_advisor_scan()
+
+    enabled = {t for sector, tickers in WATCHLIST_SECTORS.items() if TRADE_SETTINGS.get(sector.upper())
+               for t in tickers}
+    longs, shorts, _ = emails[0]
+    listed = {c['ticker'] for c in longs + shorts}
+    assert listed and unknown not in listed
+    assert listed == {c.ticker for c in bot_scan.candidates if c.ticker in enabled} - {unknown}
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
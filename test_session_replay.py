@@ -0,0 +1,109 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import asyncio
+import collections
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import fake_mt5
+import session_replay
+from config import MAGIC_NUMBER
+from mt5_gateway import gateway, mt5
+
+AccountInfo = collections.namedtuple('AccountInfo', 'balance equity')
+OrderSendResult = collections.namedtuple('OrderSendResult', 'retcode price')
+
+
+class FakeTerminal:
+    TIMEFRAME_D1 = 16408
+
+    def account_info(self):
+        return AccountInfo(1000.0, 990.5)
+
+    def copy_rates_from_pos(self, symbol, timeframe, pos, count):
+        rates = np.zeros(count, dtype=[('time', '<i8'), ('close', '<f8')])
+        rates['time'] = np.arange(count)
+        rates['close'] = 1.25
+        return rates
+
+    def history_deals_get(self, date_from, date_to):
+        return ()
+
+    def order_send(self, request):
+        return OrderSendResult(10009, request['price'])
+
+
+def test_record_then_replay():
+    path = Path(tempfile.mkdtemp()) / "session.jsonl"
+    recorder = session_replay.RecordingMT5(FakeTerminal(), path)
+    recorder.account_info()
+    recorder.copy_rates_from_pos('EURUSD', 16408, 0, 3)
+    recorder.history_deals_get(datetime(2024, 1, 1), datetime(2024, 1, 2))
+    recorder.order_send({'action': 1, 'symbol': 'EURUSD', 'type': 0, 'price': 1.1})
+
+    terminal = session_replay.ReplayMT5(*session_replay.load_recording(path))
+    assert terminal.TIMEFRAME_D1 == 16408
+    assert terminal.account_info().equity == 990.5
+    assert list(terminal.copy_rates_from_pos('EURUSD', 16408, 0, 3)['close']) == [1.25] * 3
+    # Datetimes and order prices do not take part in matching
+    assert terminal.history_deals_get(datetime(2025, 5, 5), datetime(2025, 5, 6)) == ()
+    assert terminal.order_send({'action': 1, 'symbol': 'EURUSD', 'type': 0, 'price': 1.3}).retcode == 10009
+    # Exhausted signatures repeat their last response; unknown ones return None
+    assert terminal.account_info().balance == 1000.0
+    assert terminal.symbol_info('GBPUSD') is None
+
+
+def trading_session():
+    """A few bot-level terminal round trips through the gateway proxy."""
+    tick = mt5.symbol_info_tick('EURUSD')
+    result = mt5.order_send({'action': mt5.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 0.1,
+                             'type': mt5.ORDER_TYPE_BUY, 'price': tick.ask, 'magic': MAGIC_NUMBER})
+    return {
+        'closes': list(mt5.copy_rates_from_pos('EURUSD', mt5.TIMEFRAME_D1, 0, 20)['close']),
+        'ask': tick.ask,
+        'fill': (result.retcode, result.price, result.volume),
+        'positions': [(p.symbol, p.volume, p.price_open) for p in mt5.positions_get(symbol='EURUSD')],
+        'equity': mt5.account_info().equity,
+    }
+
+
+def test_records_the_fake_terminal_through_the_gateway_and_replays_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(gateway, "backend", gateway.backend)  # Restored after the test
+    fake_mt5.reset(seed=8).initialize()
+    path = tmp_path / "session.jsonl"
+
+    session_replay.start_recording(path)
+    recorded = trading_session()
+    assert recorded['positions'] and recorded['fill'][0] == fake_mt5.TRADE_RETCODE_DONE
+
+    # A fresh simulator with nothing open: every answer below must come from the recording
+    simulator = fake_mt5.reset(seed=99)
+    _, _, terminal = session_replay.start_replay(path)
+    assert gateway.backend is terminal
+    assert trading_session() == recorded
+    assert sum(simulator.calls.values()) == 0
+    assert not terminal.unmatched
+
+
+def test_virtual_clock_runs_a_day_instantly():
+    loop = session_replay.VirtualClockLoop(1_700_000_000)
+
+    async def minute_loop():
+        for _ in range(1440):
+            await asyncio.sleep(60)
+
+    try:
+        loop.run_until_complete(minute_loop())
+    finally:
+        loop.close()
+    assert loop.time() - 1_700_000_000 == 86400
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
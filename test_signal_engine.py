@@ -0,0 +1,100 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import pytest
+
+import fake_mt5
+import signal_engine
+from data_provider import begin_scan_cycle, clear_cache
+from indicators import compute_indicators
+from instruments import get_instrument
+from prop_watchlist import WATCHLIST
+
+UNIVERSE = list(dict.fromkeys(WATCHLIST))
+WEDNESDAY = datetime(2026, 10, 14, 12, tzinfo=timezone.utc).timestamp()
+
+
+def start_terminal(seed=1, clock=time.time):
+    terminal = fake_mt5.reset(seed=seed, clock=clock)
+    terminal.initialize()
+    clear_cache()
+    begin_scan_cycle()
+    signal_engine.clear_signal_memo()
+    return terminal
+
+
+def test_parallel_scan_matches_serial(monkeypatch):
+    start_terminal()
+    serial = signal_engine.scan_universe(UNIVERSE)
+    assert serial.candidates
+
+    rates = {t: serial.rates[t] for t in serial.evaluated}
+    monkeypatch.setattr(signal_engine, "SCAN_WORKERS", 3)
+    monkeypatch.setattr(signal_engine, "SCAN_PARALLEL_MIN_SYMBOLS", 2)
+    try:
+        assert signal_engine.evaluate_parallel(rates) == \
+            signal_engine.evaluate_signals(compute_indicators(rates), rates)
+
+        signal_engine.clear_signal_memo()
+        parallel = signal_engine.scan_universe(UNIVERSE)
+    finally:
+        signal_engine.shutdown_scan_pool()
+    assert parallel.candidates == serial.candidates
+    assert parallel.evaluated == serial.evaluated
+
+
+def test_last_scan_is_kept_until_it_is_too_old():
+    start_terminal()
+    tickers = UNIVERSE[:12]
+    scan = signal_engine.scan_universe(tickers)
+    assert signal_engine.get_last_scan() is scan
+    assert signal_engine.get_last_scan(max_age=60) is scan
+    assert scan.covers(tickers[:5]) and not scan.covers(UNIVERSE)
+
+    signal_engine._LAST_SCAN["value"] = replace(scan, created=time.monotonic() - 120)
+    assert signal_engine.get_last_scan(max_age=60) is None
+    assert signal_engine.get_last_scan() is not None
+
+
+def rescan(tickers):
+    """Scans again in a new cycle, so the rates are topped up from the terminal."""
+    begin_scan_cycle()
+    return signal_engine.scan_universe(tickers)
+
+
+def test_signal_memo_matches_a_fresh_evaluation_until_the_bar_or_bucket_changes():
+    now = [WEDNESDAY]
+    terminal = start_terminal(clock=lambda: now[0])
+    first = signal_engine.scan_universe(UNIVERSE)
+    assert first.candidates and first.skipped == 0
+
+    # Same bar, same close: everything is served from the memo and equals a fresh evaluation
+    memo = rescan(UNIVERSE)
+    assert memo.skipped == len(memo.evaluated)
+    signal_engine.clear_signal_memo()
+    fresh = rescan(UNIVERSE)
+    assert fresh.skipped == 0
+    assert memo.candidates == fresh.candidates == first.candidates
+
+    # A close moved out of its bucket is evaluated again; the rest stay memoised
+    moved = first.candidates[0].ticker
+    bucket_size = get_instrument(moved).pip_unit * signal_engine.SIGNAL_MEMO_BUCKET_PIPS
+    terminal.set_price(moved, terminal.symbol_info_tick(moved).bid + 3 * bucket_size)
+    bucket = rescan(UNIVERSE)
+    assert bucket.skipped == len(bucket.evaluated) - 1
+    rates = {moved: bucket.rates[moved]}
+    expected = signal_engine.evaluate_signals(compute_indicators(rates), rates)
+    assert [c for c in bucket.candidates if c.ticker == moved] == expected
+
+    # A new daily bar invalidates every entry
+    now[0] += 86400
+    assert rescan(UNIVERSE).skipped == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,60 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import fake_mt5
+import trade_executor
+from instruments import build_instrument_index
+
+
+def pick(ticker, is_long, price, stop):
+    order_type = fake_mt5.ORDER_TYPE_BUY if is_long else fake_mt5.ORDER_TYPE_SELL
+    return {'ticker': ticker, 'type': order_type, 'score': 40.0, 'price': price, 'stop_price': stop,
+            'is_long': is_long, 'risk_modifier': 1.0}
+
+
+def test_batch_is_checked_then_sent_back_to_back(monkeypatch):
+    events = []
+    monkeypatch.setattr(trade_executor, "log_event", events.append)
+    terminal = fake_mt5.reset(seed=11)
+    terminal.initialize()
+    build_instrument_index()
+
+    eurusd = terminal.symbol_info_tick('EURUSD')
+    usdjpy = terminal.symbol_info_tick('USDJPY')
+    picks = [
+        pick('EURUSD', True, eurusd.ask, eurusd.ask - 0.0050),
+        pick('USDJPY', False, usdjpy.bid, usdjpy.ask + 0.50),
+        pick('GBPUSD', True, 1.30, 5.0),  # Stop above the market: rejected by order_check
+    ]
+    results = trade_executor.execute_batch(picks)
+
+    assert [p['ticker'] for p, _ in results] == ['EURUSD', 'USDJPY']
+    assert all(r.retcode == fake_mt5.TRADE_RETCODE_DONE for _, r in results)
+    assert {p.symbol for p in terminal.positions_get()} == {'EURUSD', 'USDJPY'}
+    # One account read for the batch; every request validated before sending
+    assert terminal.calls['account_info'] == 1
+    assert terminal.calls['order_check'] == 3 and terminal.calls['order_send'] == 2
+    assert [e['status'] for e in events] == ['CHECK_10016', 'SUCCESS', 'SUCCESS']
+
+    # Risk is sized in USD: 0.5% of 100k over a 50 pip stop on EURUSD is 1 lot
+    eur = next(r for p, r in results if p['ticker'] == 'EURUSD')
+    assert eur.volume == round(100000 * trade_executor.RISK_PER_TRADE_PCT / (0.0050 * 100000), 2)
+    assert trade_executor.get_execution_stats()['fills'] >= 2
+
+
+def test_unknown_instruments_are_logged_and_skipped(caplog):
+    terminal = fake_mt5.reset(seed=11)
+    terminal.initialize()
+    build_instrument_index()
+    tick = terminal.symbol_info_tick('EURUSD')
+    with caplog.at_level("WARNING", logger="MT5MasterControl"):
+        order = trade_executor.prepare_order(pick('NOTLISTED', True, 1.0, 0.9), 100000.0,
+                                             {'NOTLISTED': tick}, None)
+    assert order is None
+    assert "NOTLISTED is not in the instrument index" in caplog.text
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
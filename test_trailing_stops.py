@@ -0,0 +1,91 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+from datetime import datetime, timezone
+
+import fake_mt5
+import mt5_trailing_stops
+import position_book
+from config import MAGIC_NUMBER
+from data_provider import clear_cache
+from mt5_trailing_stops import apply_trailing_stop, get_trailing_stats
+
+
+def open_book(symbols):
+    now = [datetime(2026, 10, 14, 12, tzinfo=timezone.utc).timestamp()]  # A Wednesday
+    terminal = fake_mt5.reset(seed=4, clock=lambda: now[0])
+    terminal.initialize()
+    clear_cache()
+    for state in (mt5_trailing_stops._ATR_CACHE, mt5_trailing_stops._LAST_SEEN, mt5_trailing_stops._BACKOFF):
+        state.clear()
+    for symbol in symbols:
+        tick = terminal.symbol_info_tick(symbol)
+        terminal.order_send({'action': fake_mt5.TRADE_ACTION_DEAL, 'symbol': symbol, 'volume': 0.1,
+                             'type': fake_mt5.ORDER_TYPE_BUY, 'price': tick.ask, 'magic': MAGIC_NUMBER})
+    position_book.invalidate()  # Sent around the gateway: drop any book from an earlier terminal
+    return terminal, now
+
+
+def test_trails_on_price_moves_with_atr_cached_for_the_day():
+    terminal, now = open_book(('EURUSD', 'XAUUSD'))
+
+    # No stop yet: both positions get one, ATR is fetched once per symbol
+    assert apply_trailing_stop() == 2
+    assert terminal.calls['copy_rates_from_pos'] == 2
+    assert all(p.sl > 0 for p in terminal.positions_get())
+
+    # Nothing moved: one quote call for both symbols, no bars, no order_send
+    sends, quotes, unchanged = (terminal.calls['order_send'], terminal.calls['symbols_get'],
+                                get_trailing_stats()['unchanged'])
+    assert apply_trailing_stop() == 0
+    assert terminal.calls['order_send'] == sends
+    assert terminal.calls['symbols_get'] == quotes + 1
+    assert get_trailing_stats()['unchanged'] == unchanged + 2
+
+    # EURUSD rallies: only its stop moves, with the cached ATR
+    eurusd = next(p for p in terminal.positions_get() if p.symbol == 'EURUSD')
+    terminal.set_price('EURUSD', round(terminal.symbol_info_tick('EURUSD').bid + 0.02, 5))
+    assert apply_trailing_stop() == 1
+    assert terminal.calls['copy_rates_from_pos'] == 2
+    assert terminal.positions_get(ticket=eurusd.ticket)[0].sl > eurusd.sl
+
+    # A new server day refreshes ATR
+    now[0] += 86400
+    apply_trailing_stop()
+    assert terminal.calls['copy_rates_from_pos'] > 2
+
+
+def test_rejected_moves_back_off():
+    terminal, _ = open_book(('EURUSD',))
+    rejected = []
+
+    def freeze_level(request):
+        # The broker refuses every SL change, e.g. inside its freeze level
+        rejected.append(request)
+        return terminal._result(fake_mt5.TRADE_RETCODE_INVALID_STOPS, request, comment="Invalid stops")
+
+    terminal.order_send = freeze_level
+    assert apply_trailing_stop() == 0
+    assert len(rejected) == 1
+
+    # Price keeps moving, but the ticket is not resent while it backs off
+    backed_off = get_trailing_stats()['backed_off']
+    for _ in range(5):
+        terminal.set_price('EURUSD', round(terminal.symbol_info_tick('EURUSD').bid + 0.001, 5))
+        apply_trailing_stop()
+    assert len(rejected) == 1
+    assert get_trailing_stats()['backed_off'] == backed_off + 5
+
+    # Once the backoff expires it is tried again, and the next delay doubles
+    ticket = terminal.positions_get()[0].ticket
+    mt5_trailing_stops._BACKOFF[ticket] = (1, 0.0)
+    apply_trailing_stop()
+    assert len(rejected) == 2
+    assert mt5_trailing_stops._BACKOFF[ticket][0] == 2
+
+
+if __name__ == "__main__":
+    test_trails_on_price_moves_with_atr_cached_for_the_day()
+    test_rejected_moves_back_off()
+    print("✅ Trailing stop checks passed")
@@ -0,0 +1,47 @@
+import os
+
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+import fake_mt5
+import utils
+from risk_management import is_market_open
+
+
+def start_terminal():
+    terminal = fake_mt5.reset(seed=2)
+    terminal.initialize()
+    utils.invalidate_symbol_info()
+    return terminal
+
+
+def test_unknown_symbols_are_not_cached():
+    terminal = start_terminal()
+    assert utils.get_symbol_info("NOSUCH") is None
+    assert utils.get_symbol_info("NOSUCH") is None
+    assert terminal.calls['symbol_info'] == 2
+    assert "NOSUCH" not in utils._SYMBOL_INFO_CACHE
+
+    utils.get_symbol_info("EURUSD")
+    utils.get_symbol_info("EURUSD")
+    assert terminal.calls['symbol_info'] == 3
+
+
+def test_market_state_is_not_served_from_the_spec_cache():
+    terminal = start_terminal()
+    assert is_market_open("EURUSD")
+
+    # The session closes; specs stay cached for SYMBOL_INFO_TTL, the trade mode may not
+    real_symbol_info = terminal.symbol_info
+    terminal.symbol_info = lambda symbol: real_symbol_info(symbol)._replace(
+        trade_mode=fake_mt5.SYMBOL_TRADE_MODE_DISABLED)
+    fetched_at, info = utils._SYMBOL_INFO_CACHE["EURUSD"]
+    utils._SYMBOL_INFO_CACHE["EURUSD"] = (fetched_at - 10, info)  # Ten seconds later
+
+    assert utils.get_symbol_info("EURUSD").trade_mode == fake_mt5.SYMBOL_TRADE_MODE_FULL
+    assert not is_market_open("EURUSD")
+
+
+if __name__ == "__main__":
+    test_unknown_symbols_are_not_cached()
+    test_market_state_is_not_served_from_the_spec_cache()
+    print("✅ Symbol info cache checks passed")
@@ -1,30 +1,47 @@
-import MetaTrader5 as mt5
+from mt5_gateway import mt5, gateway, with_priority, PRIORITY_RISK
 import logging
+import time
+from collections import deque
+
+import numpy as np
+
 from config import *
-from utils import log_event, get_base_quote
+from utils import log_event, invalidate_symbol_info
+from instruments import get_instrument
+from fx_rates import get_rate_matrix
+from order_engine import send_order, send_orders
+from trading_rules import lot_size
 
 logger = logging.getLogger("MT5MasterControl")
 
 
-def execute_mt5_trade(pick):
+# -------------------------------
+# Entry Execution
+# -------------------------------
+# Signal-to-fill seconds of recent entries
+_FILL_LATENCIES = deque(maxlen=500)
+
+
+def prepare_order(pick, equity, ticks, rates):
+    """
+    Builds the entry request for a pick from a shared snapshot (account
+    equity, a {symbol: tick} map and the cycle's fx_rates.RateMatrix).
+    Returns (request, spread_pips) or None if the pick is filtered out.
+    """
     symbol = pick['ticker']
-    info = mt5.symbol_info(symbol)
-    if info is None: return
+    instrument = get_instrument(symbol)
+    if instrument is None:
+        logger.warning(f"⚠️ {symbol} is not in the instrument index; pick skipped")
+        return None
 
-    # 1. Filling Mode Logic
-    if info.filling_mode & 1:
-        filling_type = mt5.ORDER_FILLING_FOK
-    elif info.filling_mode & 2:
-        filling_type = mt5.ORDER_FILLING_IOC
-    else:
-        filling_type = mt5.ORDER_FILLING_RETURN
+    # 1. Filling Mode Logic (resolved once when the instrument index is built)
+    filling_type = instrument.filling_type
 
     # 2. Spread Calculation
-    tick = mt5.symbol_info_tick(symbol)
-    if tick is None: return
+    tick = ticks.get(symbol)
+    if tick is None: return None
 
-    pip_unit = 10 ** - (info.digits - 1)
-    current_spread = (tick.ask - tick.bid) / pip_unit
+    current_spread = (tick.ask - tick.bid) / instrument.pip_unit
 
     if current_spread > MAX_SPREAD_PIPS:
         logger.warning(f"⚠️ Spread too high for {symbol}: {current_spread:.1f}")
@@ -32,55 +49,32 @@ def execute_mt5_trade(pick):
             "symbol": symbol, "action": "SKIP", "status": "HIGH_SPREAD",
             "spread_pips": round(current_spread, 2), "comment": "Spread Filter"
         })
-        return
+        return None
 
     # 3. Dynamic Risk and Equity
     effective_risk_pct = RISK_PER_TRADE_PCT * pick.get('risk_modifier', 1.0)
-    equity = mt5.account_info().equity
     risk_cash = equity * effective_risk_pct
 
     # 4. CROSS-PAIR CONVERSION LOGIC
     # The risk per pip is natively in the quote currency (e.g., GBP for EURGBP)
     price_dist = abs(pick['price'] - pick['stop_price'])
-    if price_dist == 0: return
+    if price_dist == 0: return None
 
-    base_risk_per_lot = price_dist * info.trade_contract_size
-    _, quote_currency = get_base_quote(symbol)
-
-    conversion_rate = 1.0
-    if quote_currency and quote_currency != "USD":
-        # Search for a conversion pair (e.g., if quote is GBP, we need GBPUSD)
-        conv_symbol = f"{quote_currency}USD"
-        conv_tick = mt5.symbol_info_tick(conv_symbol)
-
-        if conv_tick is not None:
-            conversion_rate = conv_tick.bid
-        else:
-            # Try the inverse (e.g., if quote is JPY, we need USDJPY)
-            conv_symbol = f"USD{quote_currency}"
-            conv_tick = mt5.symbol_info_tick(conv_symbol)
-            if conv_tick is not None and conv_tick.bid != 0:
-                conversion_rate = 1.0 / conv_tick.bid
-            else:
-                logger.error(f"❌ Conversion failed for {symbol}. Blocking trade.")
-                return
+    conversion_rate = rates.to_usd(instrument.quote)
+    if conversion_rate is None:
+        logger.error(f"❌ Conversion failed for {symbol}. Blocking trade.")
+        return None
 
     # 5. Final Lot Sizing
-    # raw_lots = USD Risk / (Quote Risk per Lot * Quote-to-USD rate)
-    raw_lots = risk_cash / (base_risk_per_lot * conversion_rate)
+    lot = lot_size(risk_cash, price_dist, instrument, conversion_rate)
 
-    # Step-size normalization
-    lot = round(raw_lots / info.volume_step) * info.volume_step
-    lot = max(info.volume_min, min(info.volume_max, lot))
-
-    # 6. Send Order
     order_type = pick['type']
     price = tick.ask if order_type == mt5.ORDER_TYPE_BUY else tick.bid
 
     request = {
         "action": mt5.TRADE_ACTION_DEAL,
         "symbol": symbol,
-        "volume": round(lot, 2),
+        "volume": lot,
         "type": order_type,
         "price": price,
         "sl": float(pick['stop_price']),
@@ -89,24 +83,108 @@ def execute_mt5_trade(pick):
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": filling_type,
     }
+    return request, current_spread
 
-    result = mt5.order_send(request)
 
-    # 7. Log Result
-    status = "SUCCESS" if result.retcode == mt5.TRADE_RETCODE_DONE else f"FAIL_{result.retcode}"
+def _log_result(pick, request, spread, result, status=None):
+    symbol = pick['ticker']
+    if status is None:
+        status = "SUCCESS" if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE else \
+            f"FAIL_{result.retcode if result is not None else 'NONE'}"
     log_event({
-        "symbol": symbol, "action": "BUY" if order_type == 0 else "SELL",
-        "status": status, "lots": round(lot, 2), "price": price,
-        "sl": pick['stop_price'], "spread_pips": round(current_spread, 2),
+        "symbol": symbol, "action": "BUY" if request['type'] == 0 else "SELL",
+        "status": status, "lots": request['volume'], "price": request['price'],
+        "sl": pick['stop_price'], "spread_pips": round(spread, 2),
         "comment": result.comment if result else "No Result"
     })
 
-    if result.retcode == mt5.TRADE_RETCODE_DONE:
-        logger.info(f"✅ Trade executed: {symbol} ({lot} lots) at {price}")
-    else:
-        logger.error(f"❌ Trade failed: {result.comment}")
 
+def _gather(name, args_list):
+    """Queues one gateway call per argument tuple back-to-back and waits for all of them."""
+    futures = [gateway.submit(name, *args) for args in args_list]
+    return [f.result() for f in futures]
+
+
+def execute_batch(picks, signal_time=None):
+    """
+    Executes several picks as one batch:
+    1. one account_info and one tick per symbol; quote-to-USD rates come from
+       the cycle's conversion matrix,
+    2. every request sized from that snapshot and validated with order_check,
+    3. the valid ones sent together through the order engine, so they fill
+       back-to-back (requotes are re-priced and retried).
+    `signal_time` (time.monotonic() when the signal was computed, e.g.
+    ScanResult.created) is used to log signal-to-fill latency per order.
+    Returns [(pick, OrderSendResult or None)] for the orders sent.
+    """
+    if not picks: return []
+    signal_time = time.monotonic() if signal_time is None else signal_time
+
+    account = mt5.account_info()
+    if account is None:
+        logger.error(f"❌ Could not retrieve account info for execution: {mt5.last_error()}")
+        return []
+
+    symbols = sorted({p['ticker'] for p in picks})
+    ticks = dict(zip(symbols, _gather("symbol_info_tick", [(s,) for s in symbols])))
+    rates = get_rate_matrix()
+
+    prepared = []
+    for pick in picks:
+        order = prepare_order(pick, account.equity, ticks, rates)
+        if order is not None:
+            prepared.append((pick, *order))
+
+    # Validate everything before sending anything
+    checks = _gather("order_check", [(request,) for _, request, _ in prepared])
+    batch = []
+    for (pick, request, spread), check in zip(prepared, checks):
+        # order_check reports success as retcode 0
+        if check is None or check.retcode not in (0, mt5.TRADE_RETCODE_DONE):
+            reason = check.comment if check is not None else mt5.last_error()
+            logger.error(f"❌ Order check failed for {pick['ticker']}: {reason}")
+            _log_result(pick, request, spread, check, status=f"CHECK_{check.retcode if check else 'NONE'}")
+            continue
+        batch.append((pick, request, spread))
+
+    # Requotes are re-priced and re-sent by the order engine
+    replies = send_orders([request for _, request, _ in batch])
+    results = []
+    fill_times = []
+    for (pick, request, spread), (result, acked_at) in zip(batch, replies):
+        latency = acked_at - signal_time
+        _log_result(pick, request, spread, result)
+        results.append((pick, result))
+        if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
+            _FILL_LATENCIES.append(latency)
+            fill_times.append(latency)
+            logger.info(f"✅ Trade executed: {pick['ticker']} ({request['volume']} lots) at {result.price} "
+                        f"({latency * 1000:.0f} ms signal-to-fill)")
+        else:
+            logger.error(f"❌ Trade failed: {result.comment if result else mt5.last_error()}")
+            if result is not None and result.retcode == mt5.TRADE_RETCODE_MARKET_CLOSED:
+                invalidate_symbol_info(pick['ticker'])  # Let is_market_open see the new session state
+
+    if len(fill_times) > 1:
+        spread_ms = (fill_times[-1] - fill_times[0]) * 1000
+        logger.info(f"⚡ Batch filled {len(fill_times)} orders within {spread_ms:.0f} ms")
+    return results
+
+
+def execute_mt5_trade(pick):
+    return execute_batch([pick])
 
+
+def get_execution_stats() -> dict:
+    """Signal-to-fill latency of recent entries, in milliseconds."""
+    samples = np.array(_FILL_LATENCIES) * 1000
+    if not len(samples):
+        return {'fills': 0}
+    return {'fills': len(samples), 'avg_ms': float(samples.mean()), 'p50_ms': float(np.percentile(samples, 50)),
+            'p95_ms': float(np.percentile(samples, 95)), 'max_ms': float(samples.max())}
+
+
+@with_priority(PRIORITY_RISK)
 def close_position_and_orders(symbol):
     """Closes all positions and cancels pending orders for a symbol."""
     # 1. Cancel Pending Orders
@@ -118,26 +196,20 @@ def close_position_and_orders(symbol):
                 "action": mt5.TRADE_ACTION_REMOVE,
                 "order": order.ticket
             }
-            mt5.order_send(cancel_req)
+            send_order(cancel_req)
 
     # 2. Close Active Positions
     positions = mt5.positions_get(symbol=symbol)
     if positions:
-        info = mt5.symbol_info(symbol)
-        if info is None:
+        instrument = get_instrument(symbol)
+        if instrument is None:
             logger.error(f"❌ Could not get symbol info for {symbol} during close.")
             return
+        filling_type = instrument.filling_type
 
         for pos in positions:
             if pos.magic != MAGIC_NUMBER: continue  # Skip manual trades
 
-            if info.filling_mode & 1:
-                filling_type = mt5.ORDER_FILLING_FOK
-            elif info.filling_mode & 2:
-                filling_type = mt5.ORDER_FILLING_IOC
-            else:
-                filling_type = mt5.ORDER_FILLING_RETURN
-
             tick = mt5.symbol_info_tick(symbol)
             if tick is None:
                 logger.error(f"❌ Could not get tick info for {symbol} during close.")
@@ -154,14 +226,14 @@ def close_position_and_orders(symbol):
                 "type": order_type,
                 "position": pos.ticket,  # MUST link to the original position
                 "price": price,
-                "deviation": 20,
                 "magic": MAGIC_NUMBER,
                 "comment": "Bot Exit",
                 "type_time": mt5.ORDER_TIME_GTC,
                 "type_filling": filling_type,  # Immediate or Cancel
             }
-            result = mt5.order_send(request)
+            # Deviation per category; requotes are re-priced and retried
+            result = send_order(request)
             if result is None:
-                logger.error(f"❌ order_send returned None for {symbol}")
+                logger.error(f"❌ order_send returned None for {symbol}: {mt5.last_error()}")
             elif result.retcode != mt5.TRADE_RETCODE_DONE:
                 logger.error(f"❌ Failed to close {symbol}: {result.comment} (retcode: {result.retcode})")
@@ -0,0 +1,114 @@
+"""
+Sid trading rules shared by the live bot and the offline backtester.
+
+Entry rules, stop distance, lot sizing, currency exposure count and the
+trailing step are pure functions here, with no terminal access. The live
+modules (signal_engine, trade_executor, risk_management,
+mt5_trailing_stops) and backtest.py/optimizer.py call the same code, and
+the offline tools import it without the MetaTrader5 package.
+"""
+from dataclasses import dataclass, field
+from typing import Mapping
+
+import numpy as np
+
+from config import SIGNAL_DAYS, VOLATILITY_MULT
+
+# Minimum D1 bars needed to evaluate a symbol at all
+MIN_BARS = 50
+
+
+# -------------------------------
+# Signal rules
+# -------------------------------
+@dataclass(frozen=True)
+class SignalParams:
+    """Rule thresholds; defaults mirror config.py."""
+    signal_days: int = SIGNAL_DAYS
+    long_rsi_max: float = 45
+    short_rsi_min: float = 55
+    oversold: float = 30
+    overbought: float = 70
+    volatility_mult: Mapping[str, float] = field(default_factory=lambda: dict(VOLATILITY_MULT))
+
+
+def stop_distance(atr, category, params=None):
+    """ATR multiple behind price for a category (VOLATILITY_MULT)."""
+    params = params or SignalParams()
+    return atr * params.volatility_mult.get(category, 2.0)
+
+
+def dynamic_stop(close, lows, highs, atr, category, is_long, params=None):
+    """ATR stop using VOLATILITY_MULT, widened to the last 3 bars' extreme."""
+    dist = stop_distance(atr, category, params)
+    if is_long:
+        return min(close - dist, np.min(lows[-3:]))
+    return max(close + dist, np.max(highs[-3:]))
+
+
+def sid_rules(rsi, prev_rsi, macd, prev_macd, weekly_curr, weekly_prev, was_oversold, was_overbought, params=None):
+    """
+    (long, short) for the Sid rules. Works on scalars for one symbol's last
+    bar and on aligned arrays for every bar of a history (backtest.py).
+    """
+    params = params or SignalParams()
+    with np.errstate(invalid='ignore'):
+        # LONG: RSI <= 45 turning up, MACD rising, weekly RSI rising, oversold within SIGNAL_DAYS
+        long = np.logical_and.reduce([rsi <= params.long_rsi_max, rsi > prev_rsi, macd > prev_macd,
+                                      weekly_curr > weekly_prev, was_oversold])
+        # SHORT: mirrored rules
+        short = np.logical_and.reduce([np.logical_not(long), rsi >= params.short_rsi_min, rsi < prev_rsi,
+                                       macd < prev_macd, weekly_curr < weekly_prev, was_overbought])
+    return long, short
+
+
+def sid_score(rsi, is_long):
+    """Lower is better: RSI for longs, 100 - RSI for shorts."""
+    return np.where(is_long, rsi, 100 - rsi)
+
+
+# -------------------------------
+# Sizing, exposure and trailing
+# -------------------------------
+def lot_size(risk_cash, price_dist, instrument, conversion_rate):
+    """
+    Lots risking `risk_cash` USD over a stop `price_dist` away, normalised to
+    the instrument's volume step and limits.
+    """
+    # raw_lots = USD Risk / (Quote Risk per Lot * Quote-to-USD rate)
+    raw_lots = risk_cash / (price_dist * instrument.contract_size * conversion_rate)
+
+    # Step-size normalization
+    lot = round(raw_lots / instrument.volume_step) * instrument.volume_step
+    return round(max(instrument.volume_min, min(instrument.volume_max, lot)), 2)
+
+
+def count_currency_exposure(new_pair, open_pairs):
+    """
+    How many times the currencies of `new_pair` (base, quote) appear in
+    `open_pairs`.
+    """
+    new_currencies = [c for c in new_pair if c]
+    exposure_count = 0
+    for pair in open_pairs:
+        active_currencies = [c for c in pair if c]
+        for cur in new_currencies:
+            if cur in active_currencies:
+                exposure_count += 1
+    return exposure_count
+
+
+def trailed_stop(is_long, bid, ask, sl, current_atr, trail_dist):
+    """
+    New stop `trail_dist` behind price, or None unless it tightens the stop by
+    more than 10% of ATR.
+    """
+    # LONG: SL moves UP as Bid price rises
+    if is_long:
+        potential_sl = bid - trail_dist
+        moved = potential_sl > sl + (current_atr * 0.1)
+    # SHORT: SL moves DOWN as Ask price falls
+    else:
+        potential_sl = ask + trail_dist
+        moved = sl == 0 or potential_sl < sl - (current_atr * 0.1)
+    return potential_sl if moved and potential_sl > 0 else None
@@ -1,50 +1,77 @@
-import MetaTrader5 as mt5
-from config import CATEGORY_MAP
+from mt5_gateway import mt5
+from config import SYMBOL_INFO_TTL
+from instruments import get_instrument, get_watchlist_sector, classify_category, split_base_quote
 import csv
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
+# symbol -> (fetched_at, SymbolInfo)
+_SYMBOL_INFO_CACHE = {}
+_SYMBOL_INFO_LOCK = threading.Lock()
+_SYMBOL_INFO_STATS = {"hits": 0, "misses": 0}
 
-def get_symbol_category(symbol):
-    """Identifies category using unified config map and MT5 path."""
-    for key, category in CATEGORY_MAP.items():
-        if key in symbol:
-            return category
+
+def get_symbol_info(symbol, ttl=None):
+    """
+    Cached mt5.symbol_info. Results are reused for `ttl` (default
+    SYMBOL_INFO_TTL) seconds unless invalidated. None (unknown symbol or a
+    failed call) is never cached, so the next lookup asks again.
+    """
+    ttl = SYMBOL_INFO_TTL if ttl is None else ttl
+    now = time.monotonic()
+    with _SYMBOL_INFO_LOCK:
+        entry = _SYMBOL_INFO_CACHE.get(symbol)
+        if entry is not None and now - entry[0] < ttl:
+            _SYMBOL_INFO_STATS["hits"] += 1
+            return entry[1]
 
     info = mt5.symbol_info(symbol)
-    if info:
-        path = info.path.upper()
-        if "FOREX" in path: return "FOREX"
-        if "STOCK" in path or "EQUITY" in path: return "STOCKS"
-        if "INDEX" in path or "INDICES" in path: return "INDICES"
-        if "COMMODITY" in path or "OIL" in path or "ENERGY" in path: return "COMMODITIES"
-        if "CRYPTO" in path: return "CRYPTO"
-    return "FOREX"
+    with _SYMBOL_INFO_LOCK:
+        _SYMBOL_INFO_STATS["misses"] += 1
+        if info is not None:
+            _SYMBOL_INFO_CACHE[symbol] = (now, info)
+        else:
+            _SYMBOL_INFO_CACHE.pop(symbol, None)
+    return info
+
+
+def invalidate_symbol_info(symbol=None):
+    """Forgets cached info for one symbol, or for every symbol."""
+    with _SYMBOL_INFO_LOCK:
+        if symbol is None:
+            _SYMBOL_INFO_CACHE.clear()
+        else:
+            _SYMBOL_INFO_CACHE.pop(symbol, None)
+
+
+def get_symbol_info_stats():
+    """Hit/miss counts for the symbol info cache; misses are terminal round-trips."""
+    with _SYMBOL_INFO_LOCK:
+        stats = dict(_SYMBOL_INFO_STATS)
+        stats["cached"] = len(_SYMBOL_INFO_CACHE)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def get_symbol_category(symbol):
+    """Identifies category using unified config map and MT5 path."""
+    instrument = get_instrument(symbol)
+    if instrument is not None:
+        return instrument.category
+    return classify_category(symbol, get_symbol_info(symbol), get_watchlist_sector(symbol))
 
 
 def get_base_quote(symbol):
     """Extracts base and quote currencies, handling suffixes and different lengths."""
-    info = mt5.symbol_info(symbol)
-    if info is None:
-        # Fallback for 6-char forex pairs if info not available
-        if len(symbol) >= 6:
-            return symbol[:3], symbol[3:6]
-        return symbol, ""
-
-    if hasattr(info, 'currency_base') and info.currency_base:
-        return info.currency_base, info.currency_profit
-
-    # Fallback to standard Forex logic for 6-char pairs if currency info is missing
-    if len(symbol) >= 6 and get_symbol_category(symbol) == "FOREX":
-        # Handle suffixes like EURUSD.pro by taking first 6 alpha chars if possible
-        import re
-        match = re.match(r'^([A-Z]{3})([A-Z]{3})', symbol.upper())
-        if match:
-            return match.group(1), match.group(2)
-        return symbol[:3], symbol[3:6]
-    
-    # For non-forex, base is usually the symbol itself or currency_base if it exists
-    return symbol, info.currency_profit if hasattr(info, 'currency_profit') else ""
+    instrument = get_instrument(symbol)
+    if instrument is not None:
+        return instrument.base, instrument.quote
+    info = get_symbol_info(symbol)
+    category = classify_category(symbol, info, get_watchlist_sector(symbol))
+    return split_base_quote(symbol, info, category)
 
 
 def log_event(event_data):